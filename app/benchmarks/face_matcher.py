@@ -0,0 +1,93 @@
+"""Recall and latency of the approximate face matchers against the exact one.
+
+Run from the app directory:
+
+    python -m benchmarks.face_matcher [students] [queries]
+
+Encodings are synthetic: every student is a random point with the spread of
+real 128-d face encodings, and each query is a student's encoding plus the
+noise of a second photo of the same face. Recall@1 is the share of queries
+whose nearest match equals the exact matcher's; latency is per single-probe
+query, as the recognition endpoint issues them. The last 1% of students is
+added after the initial load to exercise incremental inserts.
+"""
+import statistics
+import sys
+import time
+
+import numpy as np
+from src.services.face_matcher import ENCODING_SIZE, FaceMatcher, make_matcher
+
+CONFIGURATIONS = [
+    ("ivf", {"nprobe": 4}),
+    ("ivf", {"nprobe": 8}),
+    ("ivf", {"nprobe": 16}),
+    ("ivf", {"nprobe": 32}),
+    ("hnsw", {"ef": 32}),
+    ("hnsw", {"ef": 64}),
+    ("hnsw", {"ef": 128}),
+]
+
+
+def _dataset(students: int, queries: int, seed: int = 0):
+    random = np.random.default_rng(seed)
+    encodings = random.normal(0.0, 0.09, (students, ENCODING_SIZE)).astype(np.float32)
+    targets = random.choice(students, queries)
+    probes = encodings[targets] + random.normal(
+        0.0, 0.03, (queries, ENCODING_SIZE)
+    ).astype(np.float32)
+    return [f"S{row:07d}" for row in range(students)], encodings, probes
+
+
+def _load(matcher, student_ids, encodings) -> float:
+    split = len(student_ids) - len(student_ids) // 100
+    started = time.perf_counter()
+    matcher.load(student_ids[:split], encodings[:split])
+    matcher.add(student_ids[split:], encodings[split:])
+    return time.perf_counter() - started
+
+
+def _query(matcher, probes) -> tuple:
+    nearest, samples = [], []
+    for probe in probes:
+        started = time.perf_counter()
+        matches = matcher.match(probe, k=1, tolerance=float("inf"))
+        samples.append(time.perf_counter() - started)
+        nearest.append(matches[0].student_id if matches else None)
+    return nearest, samples
+
+
+def _report(name: str, build: float, samples: list, recall: float) -> None:
+    samples.sort()
+    p99 = samples[int(len(samples) * 0.99) - 1]
+    print(
+        f"{name:<18} build {build:7.2f} s   recall@1 {recall:6.3f}"
+        f"   p50 {statistics.median(samples) * 1e3:7.3f} ms"
+        f"   p99 {p99 * 1e3:7.3f} ms"
+    )
+
+
+def main(students: int, queries: int) -> None:
+    student_ids, encodings, probes = _dataset(students, queries)
+    exact = FaceMatcher()
+    build = _load(exact, student_ids, encodings)
+    expected, samples = _query(exact, probes)
+    _report("exact", build, samples, 1.0)
+    for kind, options in CONFIGURATIONS:
+        name = kind + " " + " ".join(f"{key}={value}" for key, value in options.items())
+        try:
+            matcher = make_matcher(kind, **options)
+        except ImportError:
+            print(f"{name:<18} not installed")
+            continue
+        build = _load(matcher, student_ids, encodings)
+        found, samples = _query(matcher, probes)
+        recall = sum(a == b for a, b in zip(found, expected)) / len(expected)
+        _report(name, build, samples, recall)
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 100_000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 1000,
+    )
@@ -0,0 +1,177 @@
+"""Query plans and latency of the hot lookups before and after the index pack.
+
+Needs a local Postgres (13+) reachable through DATABASE_URL_FASTAPI. Run
+from the app directory:
+
+    python -m benchmarks.index_plans [students] [check-ins] [repeats]
+
+Everything happens in a scratch ``bench_indexes`` schema that is dropped at
+the end: tables shaped like the real ones are seeded with generate_series,
+every query is explained and timed with primary keys only, then the lookup
+indexes of migrations cc5eda02af71 and d41a7e93c5b8 are built and the same
+queries run again.
+"""
+import asyncio
+import statistics
+import sys
+import time
+from datetime import datetime
+
+import asyncpg
+from src.core.settings import variables
+
+SCHEMA = "bench_indexes"
+
+SEED = """
+CREATE SCHEMA {schema};
+SET search_path = {schema};
+CREATE TABLE users (
+    id uuid PRIMARY KEY, fullname varchar NOT NULL,
+    hashed_password varchar NOT NULL, is_active boolean, roles varchar[] NOT NULL
+);
+INSERT INTO users
+SELECT gen_random_uuid(), 'user ' || g, 'x', true, ARRAY['admin']
+FROM generate_series(1, {users}) g;
+CREATE TABLE students (
+    id uuid PRIMARY KEY, fullname varchar NOT NULL, student_id varchar NOT NULL,
+    qr_code varchar NOT NULL, student_group_id integer
+);
+INSERT INTO students
+SELECT gen_random_uuid(), 'student ' || g, 'S' || lpad(g::text, 8, '0'),
+       md5(g::text), g % 500
+FROM generate_series(1, {students}) g;
+CREATE TABLE general_attendance (
+    id uuid PRIMARY KEY, attended_student_id varchar NOT NULL,
+    attended_student_name varchar NOT NULL, attended_time timestamp NOT NULL,
+    attended_change integer, students_qr_code varchar NOT NULL
+);
+-- check-ins arrive in time order, as they do in production
+INSERT INTO general_attendance
+SELECT gen_random_uuid(),
+       'S' || lpad((1 + (g::bigint * 7919) % {students})::text, 8, '0'),
+       'student', timestamp '2026-01-01' + g * interval '120 days' / {check_ins},
+       1 + g % 3, 'qr'
+FROM generate_series(1, {check_ins}) g;
+ANALYZE;
+"""
+
+INDEXES = [
+    "CREATE UNIQUE INDEX users_fullname_key ON users (fullname)",
+    "CREATE UNIQUE INDEX students_student_id_key ON students (student_id)",
+    "CREATE UNIQUE INDEX students_qr_code_key ON students (qr_code)",
+    "CREATE INDEX ix_general_attendance_attended_student_id_attended_time"
+    " ON general_attendance (attended_student_id, attended_time)",
+    "CREATE INDEX ix_general_attendance_attended_change"
+    " ON general_attendance (attended_change)",
+    "CREATE INDEX brin_general_attendance_attended_time"
+    " ON general_attendance USING brin (attended_time)",
+]
+
+QUERIES = {
+    "login by fullname": (
+        "SELECT * FROM users WHERE fullname = $1",
+        ("user 4242",),
+    ),
+    "student by qr_code": (
+        "SELECT * FROM students WHERE qr_code = $1",
+        ("{qr_code}",),
+    ),
+    "student by student_id": (
+        "SELECT * FROM students WHERE student_id = $1",
+        ("S00004242",),
+    ),
+    "student's term": (
+        "SELECT * FROM general_attendance WHERE attended_student_id = $1"
+        " AND attended_time >= $2 AND attended_time < $3 ORDER BY attended_time",
+        ("S00004242", datetime(2026, 1, 1), datetime(2026, 5, 1)),
+    ),
+    "one day of check-ins": (
+        "SELECT count(*) FROM general_attendance"
+        " WHERE attended_time >= $1 AND attended_time < $2",
+        (datetime(2026, 2, 10), datetime(2026, 2, 11)),
+    ),
+    "check-ins of a change": (
+        "SELECT count(*) FROM general_attendance WHERE attended_change = $1"
+        " AND attended_time >= $2 AND attended_time < $3",
+        (2, datetime(2026, 2, 10), datetime(2026, 2, 11)),
+    ),
+}
+
+
+def _dsn() -> str:
+    return variables.database.replace("postgresql+asyncpg://", "postgresql://")
+
+
+async def _run(connection, label: str, repeats: int, parameters: dict) -> None:
+    print(f"\n=== {label} ===")
+    for name, (sql, arguments) in QUERIES.items():
+        arguments = [
+            argument.format(**parameters) if isinstance(argument, str) else argument
+            for argument in arguments
+        ]
+        statement = await connection.prepare(sql)
+        plan = await connection.fetch(f"EXPLAIN (ANALYZE, BUFFERS) {sql}", *arguments)
+        samples = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            await statement.fetch(*arguments)
+            samples.append(time.perf_counter() - started)
+        samples.sort()
+        p99 = samples[max(int(len(samples) * 0.99) - 1, 0)]
+        print(
+            f"\n{name}: p50 {statistics.median(samples) * 1e3:.3f} ms"
+            f"   p99 {p99 * 1e3:.3f} ms"
+        )
+        for row in plan:
+            print("    " + row[0])
+
+
+async def main(students: int, check_ins: int, repeats: int) -> None:
+    connection = await asyncpg.connect(_dsn())
+    try:
+        await connection.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        started = time.perf_counter()
+        await connection.execute(
+            SEED.format(
+                schema=SCHEMA,
+                users=max(students // 10, 10000),
+                students=students,
+                check_ins=check_ins,
+            )
+        )
+        print(
+            f"seeded {students} students and {check_ins} check-ins"
+            f" in {time.perf_counter() - started:.1f} s"
+        )
+        parameters = {
+            "qr_code": await connection.fetchval(
+                "SELECT qr_code FROM students WHERE student_id = 'S00004242'"
+            )
+        }
+        await _run(connection, "primary keys only", repeats, parameters)
+        started = time.perf_counter()
+        for statement in INDEXES:
+            await connection.execute(statement)
+        await connection.execute("ANALYZE")
+        print(f"\nbuilt indexes in {time.perf_counter() - started:.1f} s")
+        sizes = await connection.fetch(
+            "SELECT indexrelname, pg_size_pretty(pg_relation_size(indexrelid))"
+            " FROM pg_stat_user_indexes WHERE schemaname = $1 ORDER BY 1",
+            SCHEMA,
+        )
+        for name, size in sizes:
+            print(f"    {name:<58} {size}")
+        await _run(connection, "with the index pack", repeats, parameters)
+    finally:
+        await connection.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        await connection.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(
+        main(
+            int(sys.argv[1]) if len(sys.argv) > 1 else 100_000,
+            int(sys.argv[2]) if len(sys.argv) > 2 else 5_000_000,
+            int(sys.argv[3]) if len(sys.argv) > 3 else 50,
+        )
+    )
@@ -0,0 +1,340 @@
+"""Throughput and latency of the auth, user CRUD, check-in and recognition paths.
+
+Needs a database seeded by ``benchmarks.seed``. Run from the app directory:
+
+    python -m benchmarks.load [--scenarios login,users,check-in]
+        [--concurrency 32] [--requests 2000] [--image face.jpg]
+        [--save NAME] [--compare benchmarks/baselines/NAME.json]
+
+The app runs in this process, its lifespan included, and is driven through
+httpx's ASGI transport once /ready reports it ready, so the figures cover
+routing, validation, the handlers and the database but not the HTTP server
+or the network. Each scenario runs ``--requests`` iterations spread over
+``--concurrency`` concurrent clients:
+
+    login       POST /login/token as the seeded bench user
+    users       create a user, log in as it, read, update and delete it
+    check-in    POST /attendance/check-in cycling through seeded students
+    recognize   POST /recognition/identify with --image (skipped without it)
+
+Every step is reported separately with its throughput and p50/p95/p99
+latency. ``--save`` writes the results to benchmarks/baselines/NAME.json;
+``--compare`` prints the change against such a file and exits with status 1
+when a step's p99 or throughput got worse by more than ``--tolerance``.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List
+
+import httpx
+from benchmarks.seed import BENCH_PASSWORD, BENCH_USER
+from sqlalchemy import select
+from src.core.utils import Hasher
+from src.db.models import Student
+from src.db.session import async_session
+from src.main import app
+
+BASELINES = os.path.join(os.path.dirname(__file__), "baselines")
+USER_PASSWORD = "bench-user-password"
+
+
+class Recorder:
+    """Latencies and failures per step of a scenario"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.failures: Dict[str, int] = defaultdict(int)
+
+    async def call(
+        self, step: str, request: Awaitable[httpx.Response], expected: int
+    ) -> httpx.Response:
+        started = time.perf_counter()
+        response = await request
+        self.latencies[step].append(time.perf_counter() - started)
+        if response.status_code != expected:
+            self.failures[step] += 1
+        return response
+
+    def summary(self, elapsed: float) -> Dict[str, dict]:
+        results = {}
+        for step, samples in self.latencies.items():
+            samples.sort()
+            results[step] = {
+                "requests": len(samples),
+                "failures": self.failures[step],
+                "throughput": round(len(samples) / elapsed, 1),
+                "p50_ms": _percentile(samples, 0.50),
+                "p95_ms": _percentile(samples, 0.95),
+                "p99_ms": _percentile(samples, 0.99),
+                "max_ms": round(samples[-1] * 1e3, 3),
+            }
+        return results
+
+
+def _percentile(samples: List[float], share: float) -> float:
+    """Nearest-rank percentile of sorted samples, in milliseconds"""
+    return round(samples[max(math.ceil(share * len(samples)) - 1, 0)] * 1e3, 3)
+
+
+def _bearer(token: str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
+
+
+async def _login(client, recorder, step: str, username: str, password: str) -> str:
+    response = await recorder.call(
+        step,
+        client.post("/login/token", data={"username": username, "password": password}),
+        200,
+    )
+    return response.json().get("access_token", "")
+
+
+async def _wait_until_ready(client, timeout: float = 120.0) -> None:
+    """Wait for the background loads, so check-ins are not answered with 503"""
+    deadline = time.monotonic() + timeout
+    while (await client.get("/ready")).status_code != 200:
+        if time.monotonic() > deadline:
+            sys.exit(f"the app did not become ready within {timeout:.0f} s")
+        await asyncio.sleep(0.1)
+
+
+async def _prepare(client, options) -> dict:
+    response = await client.post(
+        "/login/token", data={"username": BENCH_USER, "password": BENCH_PASSWORD}
+    )
+    if response.status_code != 200:
+        sys.exit(f"cannot log in as {BENCH_USER}; run python -m benchmarks.seed first")
+    async with async_session() as session:
+        qr_codes = list(
+            (await session.execute(select(Student.qr_code).limit(10_000))).scalars()
+        )
+    image = None
+    if options.image:
+        with open(options.image, "rb") as source:
+            image = source.read()
+    return {
+        "headers": _bearer(response.json()["access_token"]),
+        "qr_codes": qr_codes,
+        "image": image,
+        # the update route takes a ready hash, so keep the password the same
+        "password_hash": Hasher.get_password_hash(USER_PASSWORD),
+    }
+
+
+async def login(client, recorder, context, iteration: int) -> None:
+    await _login(client, recorder, "login", BENCH_USER, BENCH_PASSWORD)
+
+
+async def users(client, recorder, context, iteration: int) -> None:
+    fullname = f"bench-{uuid.uuid4().hex[:12]}"
+    password = USER_PASSWORD
+    created = await recorder.call(
+        "user create",
+        client.post("/user/", json={"fullname": fullname, "password": password}),
+        200,
+    )
+    if created.status_code != 200:
+        return
+    user_id = created.json()["id"]
+    token = await _login(client, recorder, "user login", fullname, password)
+    headers = _bearer(token)
+    params = {"user_id": user_id}
+    await recorder.call(
+        "user read", client.get("/user/", params=params, headers=headers), 200
+    )
+    await recorder.call(
+        "user update",
+        client.patch(
+            "/user/",
+            params=params,
+            headers=headers,
+            json={
+                "fullname": fullname + "-renamed",
+                "hashed_password": context["password_hash"],
+            },
+        ),
+        200,
+    )
+    # the rename changed the token subject, so the old token is now invalid
+    token = await _login(
+        client, recorder, "user login", fullname + "-renamed", password
+    )
+    await recorder.call(
+        "user delete",
+        client.delete("/user/", params=params, headers=_bearer(token)),
+        200,
+    )
+
+
+async def check_in(client, recorder, context, iteration: int) -> None:
+    qr_codes = context["qr_codes"]
+    await recorder.call(
+        "check-in",
+        client.post(
+            "/attendance/check-in",
+            headers=context["headers"],
+            json={"qr_code": qr_codes[iteration % len(qr_codes)]},
+        ),
+        202,
+    )
+
+
+async def recognize(client, recorder, context, iteration: int) -> None:
+    await recorder.call(
+        "recognize",
+        client.post(
+            "/recognition/identify",
+            headers=context["headers"],
+            files={"image": ("probe.jpg", context["image"], "image/jpeg")},
+        ),
+        200,
+    )
+
+
+SCENARIOS: Dict[str, Callable] = {
+    "login": login,
+    "users": users,
+    "check-in": check_in,
+    "recognize": recognize,
+}
+
+
+async def run_scenario(client, scenario, context, concurrency: int, requests: int):
+    recorder = Recorder()
+    iterations = itertools.count()
+
+    async def virtual_client() -> None:
+        while True:
+            iteration = next(iterations)
+            if iteration >= requests:
+                return
+            await scenario(client, recorder, context, iteration)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(virtual_client() for _ in range(concurrency)))
+    return recorder.summary(time.perf_counter() - started)
+
+
+def _print(results: Dict[str, dict]) -> None:
+    print(
+        f"{'step':<14}{'requests':>9}{'failed':>8}{'req/s':>10}"
+        f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}"
+    )
+    for step, figures in results.items():
+        print(
+            f"{step:<14}{figures['requests']:>9}{figures['failures']:>8}"
+            f"{figures['throughput']:>10}{figures['p50_ms']:>10}"
+            f"{figures['p95_ms']:>10}{figures['p99_ms']:>10}{figures['max_ms']:>10}"
+        )
+
+
+def _revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(results: Dict[str, dict], path: str, tolerance: float) -> bool:
+    """Print the change against a saved baseline, True if nothing regressed"""
+    with open(path) as source:
+        baseline = json.load(source)["results"]
+    print(f"\ncompared with {path} (tolerance {tolerance:.0%})")
+    healthy = True
+    for step, figures in results.items():
+        before = baseline.get(step)
+        if before is None:
+            print(f"{step:<14} no baseline")
+            continue
+        p99 = figures["p99_ms"] / before["p99_ms"] - 1 if before["p99_ms"] else 0.0
+        throughput = (
+            figures["throughput"] / before["throughput"] - 1
+            if before["throughput"]
+            else 0.0
+        )
+        regressed = p99 > tolerance or throughput < -tolerance
+        healthy = healthy and not regressed
+        print(
+            f"{step:<14} p99 {p99:+7.1%}   req/s {throughput:+7.1%}"
+            + ("   REGRESSION" if regressed else "")
+        )
+    return healthy
+
+
+async def main(options) -> int:
+    names = [name.strip() for name in options.scenarios.split(",") if name.strip()]
+    unknown = set(names) - set(SCENARIOS)
+    if unknown:
+        sys.exit(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    if "recognize" in names and not options.image:
+        print("skipping recognize: pass --image with a photo of a face")
+        names.remove("recognize")
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://bench"
+        ) as client:
+            await _wait_until_ready(client)
+            context = await _prepare(client, options)
+            results = {}
+            for name in names:
+                print(f"\n=== {name} ===")
+                scenario_results = await run_scenario(
+                    client,
+                    SCENARIOS[name],
+                    context,
+                    options.concurrency,
+                    options.requests,
+                )
+                _print(scenario_results)
+                results.update(scenario_results)
+    if options.save:
+        os.makedirs(BASELINES, exist_ok=True)
+        path = os.path.join(BASELINES, f"{options.save}.json")
+        with open(path, "w") as target:
+            json.dump(
+                {
+                    "meta": {
+                        "revision": _revision(),
+                        "created": datetime.now().isoformat(timespec="seconds"),
+                        "python": platform.python_version(),
+                        "cpus": os.cpu_count(),
+                        "concurrency": options.concurrency,
+                        "requests": options.requests,
+                    },
+                    "results": results,
+                },
+                target,
+                indent=2,
+            )
+        print(f"\nsaved {path}")
+    if options.compare and not compare(results, options.compare, options.tolerance):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenarios", default="login,users,check-in,recognize")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--image")
+    parser.add_argument("--save")
+    parser.add_argument("--compare")
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,242 @@
+"""Seed a scratch database with a realistic institution for the benchmarks.
+
+Needs the schema of ``alembic upgrade head`` in the database behind
+DATABASE_URL_FASTAPI. Run from the app directory:
+
+    python -m benchmarks.seed [students] [--reset] [--seed N]
+
+Creates faculties, study years, the three daily shifts (``Change``),
+professions, groups of about 25 students spread over the shifts, the
+students themselves and a ``bench-admin`` user (password
+``bench-password``) the load test logs in as. Students are written with
+COPY; 50k take a few seconds. Generation is driven by one seeded random
+generator, so the same arguments always produce the same rows.
+
+``--reset`` first empties the tables it fills, together with the
+attendance tables that reference students. Only point it at a database you
+can throw away.
+"""
+import argparse
+import asyncio
+import random
+import time
+import uuid
+from datetime import datetime
+from datetime import time as clock
+
+import asyncpg
+from src.core.settings import variables
+from src.core.utils import Hasher
+
+BENCH_USER = "bench-admin"
+BENCH_PASSWORD = "bench-password"
+GROUP_SIZE = 25
+
+FACULTIES = [
+    "Computer Science",
+    "Economics",
+    "Civil Engineering",
+    "Mathematics",
+    "Medicine",
+    "Law",
+    "Foreign Languages",
+    "Architecture",
+]
+PROFESSION_STEMS = [
+    "Software Engineering",
+    "Information Systems",
+    "Applied Mathematics",
+    "Accounting",
+    "Finance",
+    "Construction",
+    "Hydraulics",
+    "General Medicine",
+    "Pharmacy",
+    "International Law",
+    "Translation",
+    "Urban Design",
+]
+PROFESSION_TRACKS = ["", " (evening)", " (dual)"]
+# name, start, end and the share of groups studying in that shift
+SHIFTS = [
+    ("Morning", clock(8, 0), clock(13, 0), 0.6),
+    ("Afternoon", clock(13, 30), clock(18, 30), 0.3),
+    ("Evening", clock(18, 45), clock(21, 45), 0.1),
+]
+FEMALE_NAMES = ["Aylar", "Enejan", "Gulnara", "Jeren", "Leyla", "Nazly", "Selbi"]
+MALE_NAMES = ["Batyr", "Dovlet", "Hemra", "Kerim", "Merdan", "Oraz", "Tahyr", "Wepa"]
+LAST_NAMES = [
+    "Amanov",
+    "Berdiyev",
+    "Charyyev",
+    "Durdyyev",
+    "Gurbanov",
+    "Hojayev",
+    "Jumayev",
+    "Kakayev",
+    "Meredov",
+    "Nurmuhammedov",
+    "Orazov",
+    "Rejepov",
+    "Saparov",
+    "Tachmammedov",
+    "Yazmuradov",
+]
+
+RESET = """
+TRUNCATE general_attendance, attendance_student_days, attendance_daily,
+         students, groups, professions, change, study_year, faculty
+RESTART IDENTITY CASCADE
+"""
+
+
+def _dsn() -> str:
+    return variables.database.replace("postgresql+asyncpg://", "postgresql://")
+
+
+def _person(rng: random.Random) -> tuple:
+    last = rng.choice(LAST_NAMES)
+    if rng.random() < 0.5:
+        # female surnames take the -a ending
+        return f"{last}a {rng.choice(FEMALE_NAMES)}", "female"
+    return f"{last} {rng.choice(MALE_NAMES)}", "male"
+
+
+async def _insert_returning_ids(connection, sql: str, *columns) -> list:
+    rows = await connection.fetch(sql, *columns)
+    return [row["id"] for row in rows]
+
+
+async def seed(connection, students: int, rng: random.Random) -> None:
+    await connection.execute(
+        "INSERT INTO faculty (faculty_name, faculty_dean)"
+        " SELECT * FROM unnest($1::varchar[], $2::varchar[])",
+        FACULTIES,
+        [_person(rng)[0] for _ in FACULTIES],
+    )
+    this_year = datetime.now().year
+    years = [f"{year}-{year + 1}" for year in range(this_year - 3, this_year + 1)]
+    study_year_ids = await _insert_returning_ids(
+        connection,
+        "INSERT INTO study_year (year) SELECT unnest($1::varchar[]) RETURNING id",
+        years,
+    )
+    change_ids = await _insert_returning_ids(
+        connection,
+        "INSERT INTO change (change_name, start_time, end_time)"
+        " SELECT * FROM unnest($1::varchar[], $2::time[], $3::time[]) RETURNING id",
+        [name for name, _, _, _ in SHIFTS],
+        [start for _, start, _, _ in SHIFTS],
+        [end for _, _, end, _ in SHIFTS],
+    )
+    shift_weights = [share for _, _, _, share in SHIFTS]
+    professions = [
+        stem + track for track in PROFESSION_TRACKS for stem in PROFESSION_STEMS
+    ]
+    profession_ids = await _insert_returning_ids(
+        connection,
+        "INSERT INTO professions (profession_name) SELECT unnest($1::varchar[])"
+        " RETURNING id",
+        professions,
+    )
+
+    group_count = max(students // GROUP_SIZE, 1)
+    groups = []
+    for number in range(group_count):
+        course = number % 4 + 1
+        profession = number % len(profession_ids)
+        groups.append(
+            (
+                f"{professions[profession][:3].upper()}-{course}{number // 4 + 1:02d}",
+                str(this_year - course + 1),
+                rng.choices(change_ids, shift_weights)[0],
+                study_year_ids[-course],
+                course,
+                profession_ids[profession],
+            )
+        )
+    group_ids = await _insert_returning_ids(
+        connection,
+        "INSERT INTO groups (group_name, group_year, group_change_id, study_year_id)"
+        " SELECT * FROM unnest($1::varchar[], $2::varchar[], $3::int[], $4::int[])"
+        " RETURNING id",
+        [group[0] for group in groups],
+        [group[1] for group in groups],
+        [group[2] for group in groups],
+        [group[3] for group in groups],
+    )
+
+    now = datetime.now()
+    records = []
+    for number in range(students):
+        group = number % group_count
+        _, group_year, _, _, course, profession_id = groups[group]
+        fullname, gender = _person(rng)
+        records.append(
+            (
+                uuid.UUID(int=rng.getrandbits(128), version=4),
+                fullname,
+                f"{group_year}{number:06d}",
+                gender,
+                "students/placeholder.jpg",
+                course,
+                f"{rng.getrandbits(128):032x}",
+                now,
+                profession_id,
+                group_ids[group],
+            )
+        )
+    await connection.copy_records_to_table(
+        "students",
+        records=records,
+        columns=[
+            "id",
+            "fullname",
+            "student_id",
+            "gender",
+            "student_image",
+            "course",
+            "qr_code",
+            "created_time",
+            "student_profession_id",
+            "student_group_id",
+        ],
+    )
+    await connection.execute(
+        "INSERT INTO users (id, fullname, hashed_password, is_active, roles)"
+        " VALUES ($1, $2, $3, true, $4)"
+        " ON CONFLICT (fullname) DO UPDATE SET hashed_password = EXCLUDED.hashed_password,"
+        " is_active = true, roles = EXCLUDED.roles",
+        uuid.uuid4(),
+        BENCH_USER,
+        Hasher.get_password_hash(BENCH_PASSWORD),
+        ["admin"],
+    )
+    print(
+        f"seeded {len(FACULTIES)} faculties, {len(years)} study years,"
+        f" {len(change_ids)} shifts, {len(professions)} professions,"
+        f" {group_count} groups and {students} students"
+    )
+
+
+async def main(students: int, reset: bool, seed_value: int) -> None:
+    connection = await asyncpg.connect(_dsn())
+    started = time.perf_counter()
+    try:
+        async with connection.transaction():
+            if reset:
+                await connection.execute(RESET)
+            await seed(connection, students, random.Random(seed_value))
+        await connection.execute("ANALYZE")
+    finally:
+        await connection.close()
+    print(f"done in {time.perf_counter() - started:.1f} s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("students", nargs="?", type=int, default=50_000)
+    parser.add_argument("--reset", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    arguments = parser.parse_args()
+    asyncio.run(main(arguments.students, arguments.reset, arguments.seed))
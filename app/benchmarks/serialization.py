@@ -0,0 +1,230 @@
+"""CPU spent turning handler results into response bodies, per request.
+
+No database needed. Run from the app directory:
+
+    python -m benchmarks.serialization [--requests 50]
+
+Serves the same content three ways and drives each route straight through
+ASGI, so the figures are routing, serialization and the response itself:
+
+    model     the handler builds the response models and the app renders
+              them with the stdlib json encoder (how every route worked)
+    orjson    the same handler, rendered by ORJSONResponse, the app default
+    trusted   the handler returns TrustedJSONResponse of plain dicts, which
+              skips response model validation and jsonable_encoder
+
+over a full page of students (500 rows of the list endpoint), a page of
+attendance records (1000 rows), a month of per-group attendance report
+rows and a single check-in. Bodies of the three variants are compared
+before timing, so the fast paths answer exactly what the models did.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from datetime import date, datetime, timedelta
+from typing import Dict, Tuple
+
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, ORJSONResponse
+from src.core.responses import TrustedJSONResponse
+from src.db.schemas import (
+    AttendanceRecord,
+    AttendanceRecordPage,
+    AttendanceReport,
+    AttendanceReportRow,
+    CheckInResponse,
+    Page,
+)
+
+VARIANTS = ("model", "orjson", "trusted")
+
+
+def _payloads(rng: random.Random) -> Tuple[dict, dict]:
+    """(model, builder, status) and the trusted content per payload"""
+    now = datetime(2026, 10, 1, 8, 30)
+    students = [
+        {
+            "id": uuid.UUID(int=rng.getrandbits(128), version=4),
+            "fullname": f"Student Number {row}",
+            "student_id": f"2026{row:06d}",
+            "gender": rng.choice(("female", "male")),
+            "student_image": f"students/{row:06d}.jpg",
+            "course": rng.randint(1, 4),
+            "qr_code": f"{rng.getrandbits(128):032x}",
+            "created_time": now + timedelta(seconds=row),
+            "profession_id": rng.randint(1, 36),
+            "group_id": rng.randint(1, 2000),
+        }
+        for row in range(500)
+    ]
+    records = [
+        {
+            "id": uuid.UUID(int=rng.getrandbits(128), version=4),
+            "student_id": f"2026{row:06d}",
+            "fullname": f"Student Number {row}",
+            "attended_time": now + timedelta(milliseconds=row * 731),
+            "change_id": rng.randint(1, 3),
+            "group_id": rng.randint(1, 2000),
+        }
+        for row in range(1000)
+    ]
+    report_rows = [
+        {
+            "attendance_date": date(2026, 9, 1) + timedelta(days=day),
+            "group_id": group,
+            "group_name": f"GRP-{group}",
+            "study_year": "2026-2027",
+            "change_id": group % 3 + 1,
+            "change_name": ("Morning", "Afternoon", "Evening")[group % 3],
+            "check_ins": 26,
+            "students": 23,
+            "days": 1,
+            "enrolled": 25,
+            "rate": 0.92,
+        }
+        for day in range(30)
+        for group in range(1, 101)
+    ]
+    check_in = {
+        "student_id": "2026000001",
+        "fullname": "Student Number 1",
+        "change_id": 1,
+        "attended_time": now,
+        "persisted": False,
+    }
+    routes = {
+        "students": (Page, lambda: Page(items=students, next_cursor="abc"), 200),
+        "records": (
+            AttendanceRecordPage,
+            lambda: AttendanceRecordPage(
+                items=[AttendanceRecord(**row) for row in records], next_cursor=None
+            ),
+            200,
+        ),
+        "report": (
+            AttendanceReport,
+            lambda: AttendanceReport(
+                date_from=date(2026, 9, 1),
+                date_to=date(2026, 9, 30),
+                rows=[AttendanceReportRow(**row) for row in report_rows],
+            ),
+            200,
+        ),
+        "check-in": (CheckInResponse, lambda: CheckInResponse(**check_in), 202),
+    }
+    # what the handlers now hand to TrustedJSONResponse
+    trusted = {
+        "students": {"items": students, "next_cursor": "abc"},
+        "records": {"items": records, "next_cursor": None},
+        "report": {
+            "date_from": date(2026, 9, 1),
+            "date_to": date(2026, 9, 30),
+            "rows": report_rows,
+        },
+        "check-in": check_in,
+    }
+    return routes, trusted
+
+
+def _apps(routes: dict, trusted_content: dict) -> Dict[str, FastAPI]:
+    apps = {
+        "model": FastAPI(default_response_class=JSONResponse),
+        "orjson": FastAPI(default_response_class=ORJSONResponse),
+    }
+    trusted = FastAPI(default_response_class=ORJSONResponse)
+    for name, (model, build, status) in routes.items():
+        for app in apps.values():
+            app.add_api_route(
+                f"/{name}", _handler(build), response_model=model, status_code=status
+            )
+        content = trusted_content[name]
+        trusted.add_api_route(
+            f"/{name}",
+            _handler(
+                lambda content=content, status=status: TrustedJSONResponse(
+                    content, status_code=status
+                )
+            ),
+            response_model=model,
+            status_code=status,
+        )
+    apps["trusted"] = trusted
+    return apps
+
+
+def _handler(build):
+    async def handler():
+        return build()
+
+    return handler
+
+
+async def _call(app, path: str) -> bytes:
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"host", b"bench")],
+        "client": ("127.0.0.1", 1),
+        "server": ("bench", 80),
+    }
+    body = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            body.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return b"".join(body)
+
+
+async def main(requests: int) -> None:
+    routes, trusted_content = _payloads(random.Random(0))
+    apps = _apps(routes, trusted_content)
+    names = list(routes)
+    for name in names:
+        bodies = [
+            json.loads(await _call(apps[variant], f"/{name}")) for variant in VARIANTS
+        ]
+        if any(body != bodies[0] for body in bodies):
+            raise SystemExit(f"{name}: the variants answer different bodies")
+    print(
+        f"{'payload':<10}{'bytes':>9}"
+        + "".join(f"{v + ' ms':>12}" for v in VARIANTS)
+        + f"{'saved':>8}"
+    )
+    for name in names:
+        size = len(await _call(apps["trusted"], f"/{name}"))
+        figures = []
+        for variant in VARIANTS:
+            app = apps[variant]
+            # warm up, then count CPU time rather than wall time
+            await _call(app, f"/{name}")
+            started = time.process_time()
+            for _ in range(requests):
+                await _call(app, f"/{name}")
+            figures.append((time.process_time() - started) / requests * 1e3)
+        saved = 1 - figures[-1] / figures[0]
+        print(
+            f"{name:<10}{size:>9}"
+            + "".join(f"{figure:>12.3f}" for figure in figures)
+            + f"{saved:>8.0%}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=50)
+    asyncio.run(main(parser.parse_args().requests))
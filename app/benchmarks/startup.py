@@ -0,0 +1,98 @@
+"""Cold start of a worker: importing the app and getting it ready to serve.
+
+Run from the app directory:
+
+    python -m benchmarks.startup [--runs 10] [--top 15] [--ready]
+
+Imports ``src.main`` in ``--runs`` fresh interpreters and reports the
+median and worst wall time, then the modules with the largest cumulative
+import time from one ``python -X importtime`` run. With ``--ready`` it also
+enters the app's lifespan in a fresh interpreter and times how long it takes
+until startup returns (the worker accepts connections) and until /ready
+answers 200; that part needs the database behind DATABASE_URL_FASTAPI.
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+IMPORT = "import src.main"
+
+READY = """
+import asyncio, time
+started = time.perf_counter()
+import httpx
+from src.main import app
+imported = time.perf_counter()
+
+async def main():
+    async with app.router.lifespan_context(app):
+        serving = time.perf_counter()
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://bench"
+        ) as client:
+            while (await client.get("/ready")).status_code != 200:
+                await asyncio.sleep(0.01)
+        ready = time.perf_counter()
+    print(imported - started, serving - started, ready - started)
+
+asyncio.run(main())
+"""
+
+
+def _run(*args: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *args], capture_output=True, text=True, check=True
+    )
+
+
+def import_times(runs: int) -> list:
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        _run("-c", IMPORT)
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def heaviest_imports(top: int) -> list:
+    """(cumulative seconds, module) of the slowest imports, nested ones included"""
+    report = _run("-X", "importtime", "-c", IMPORT).stderr
+    modules = []
+    for line in report.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        modules.append((int(cumulative) / 1e6, name.rstrip()))
+    modules.sort(reverse=True)
+    return modules[:top]
+
+
+def main(options) -> None:
+    # the first run pays for cold file caches, it is not what a restart sees
+    _run("-c", IMPORT)
+    samples = import_times(options.runs)
+    print(
+        f"import src.main: median {statistics.median(samples) * 1e3:.0f} ms,"
+        f" max {max(samples) * 1e3:.0f} ms over {options.runs} interpreters"
+        " (interpreter start included)"
+    )
+    print("\nslowest imports (cumulative ms):")
+    for seconds, name in heaviest_imports(options.top):
+        print(f"{seconds * 1e3:>9.1f}  {name}")
+    if options.ready:
+        imported, serving, ready = map(float, _run("-c", READY).stdout.split())
+        print(
+            f"\nimported after {imported * 1e3:.0f} ms,"
+            f" serving after {serving * 1e3:.0f} ms,"
+            f" ready after {ready * 1e3:.0f} ms"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--ready", action="store_true")
+    main(parser.parse_args())
@@ -0,0 +1,72 @@
+"""attendance daily summaries
+
+Revision ID: 3f9a1c7d2b64
+Revises: cc5eda02af71
+Create Date: 2026-10-18 14:05:12.481930
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9a1c7d2b64'
+down_revision: Union[str, None] = 'cc5eda02af71'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('attendance_student_days',
+    sa.Column('attendance_date', sa.Date(), nullable=False),
+    sa.Column('student_id', sa.String(), nullable=False),
+    sa.Column('group_id', sa.Integer(), nullable=False),
+    sa.Column('change_id', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('attendance_date', 'student_id')
+    )
+    op.create_table('attendance_daily',
+    sa.Column('attendance_date', sa.Date(), nullable=False),
+    sa.Column('group_id', sa.Integer(), nullable=False),
+    sa.Column('change_id', sa.Integer(), nullable=False),
+    sa.Column('check_ins', sa.Integer(), nullable=False),
+    sa.Column('students', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('attendance_date', 'group_id', 'change_id')
+    )
+    # keyset drill-down walks check-ins in (attended_time, id) order
+    op.create_index('ix_general_attendance_attended_time_id', 'general_attendance', ['attended_time', 'id'])
+    # backfill from the check-ins written so far; the first check-in of a
+    # student's day decides its group and change, as the writer does
+    op.execute("""
+        INSERT INTO attendance_student_days (attendance_date, student_id, group_id, change_id)
+        SELECT DISTINCT ON (a.attended_time::date, a.attended_student_id)
+               a.attended_time::date, a.attended_student_id,
+               coalesce(s.student_group_id, 0), coalesce(a.attended_change, 0)
+        FROM general_attendance a
+        JOIN students s ON s.student_id = a.attended_student_id
+        ORDER BY a.attended_time::date, a.attended_student_id, a.attended_time
+    """)
+    op.execute("""
+        INSERT INTO attendance_daily (attendance_date, group_id, change_id, check_ins, students)
+        SELECT c.attendance_date, c.group_id, c.change_id, c.check_ins, coalesce(d.students, 0)
+        FROM (
+            SELECT a.attended_time::date AS attendance_date,
+                   coalesce(s.student_group_id, 0) AS group_id,
+                   coalesce(a.attended_change, 0) AS change_id,
+                   count(*) AS check_ins
+            FROM general_attendance a
+            JOIN students s ON s.student_id = a.attended_student_id
+            GROUP BY 1, 2, 3
+        ) c
+        LEFT JOIN (
+            SELECT attendance_date, group_id, change_id, count(*) AS students
+            FROM attendance_student_days
+            GROUP BY 1, 2, 3
+        ) d USING (attendance_date, group_id, change_id)
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_general_attendance_attended_time_id', table_name='general_attendance')
+    op.drop_table('attendance_daily')
+    op.drop_table('attendance_student_days')
@@ -0,0 +1,95 @@
+"""partition general attendance
+
+Revision ID: 6e0b3f8a9c21
+Revises: d41a7e93c5b8
+Create Date: 2026-10-18 18:10:36.642708
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '6e0b3f8a9c21'
+down_revision: Union[str, None] = 'd41a7e93c5b8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# partitions are created this many months past the current one; the
+# partition manager keeps the window moving once the app runs
+MONTHS_AHEAD = 3
+
+
+def _create_indexes() -> None:
+    op.create_index('ix_general_attendance_attended_time_id', 'general_attendance', ['attended_time', 'id'])
+    op.create_index('ix_general_attendance_attended_student_id_attended_time', 'general_attendance', ['attended_student_id', 'attended_time'])
+    op.create_index('ix_general_attendance_attended_change', 'general_attendance', ['attended_change'])
+    op.create_index('brin_general_attendance_attended_time', 'general_attendance', ['attended_time'], postgresql_using='brin')
+
+
+def _create_foreign_keys() -> None:
+    op.create_foreign_key('general_attendance_attended_student_id_fkey', 'general_attendance', 'students', ['attended_student_id'], ['student_id'])
+    op.create_foreign_key('general_attendance_attended_change_fkey', 'general_attendance', 'change', ['attended_change'], ['id'])
+
+
+def _columns() -> list:
+    return [
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('attended_student_id', sa.String(), nullable=False),
+        sa.Column('attended_student_name', sa.String(), nullable=False),
+        sa.Column('attended_time', sa.DateTime(), nullable=False),
+        sa.Column('attended_change', sa.Integer(), nullable=True),
+        sa.Column('students_qr_code', sa.String(), nullable=False),
+    ]
+
+
+def upgrade() -> None:
+    # the copy holds an exclusive lock on check-ins; stop the writers first
+    op.create_table('general_attendance_new',
+    *_columns(),
+    sa.PrimaryKeyConstraint('id', 'attended_time', name='general_attendance_new_pkey'),
+    postgresql_partition_by='RANGE (attended_time)'
+    )
+    op.execute(f"""
+        DO $$
+        DECLARE
+            month date := date_trunc('month', coalesce(
+                (SELECT min(attended_time) FROM general_attendance), now()))::date;
+            last_month date := (date_trunc('month', now())
+                + interval '{MONTHS_AHEAD} months')::date;
+        BEGIN
+            WHILE month <= last_month LOOP
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF general_attendance_new '
+                    'FOR VALUES FROM (%L) TO (%L)',
+                    'general_attendance_p' || to_char(month, 'YYYYMM'),
+                    month, (month + interval '1 month')::date);
+                month := (month + interval '1 month')::date;
+            END LOOP;
+        END $$
+    """)
+    # catches rows outside every monthly range instead of failing the insert;
+    # the partition manager moves them out when it creates their month
+    op.execute('CREATE TABLE general_attendance_default PARTITION OF general_attendance_new DEFAULT')
+    op.execute('INSERT INTO general_attendance_new SELECT * FROM general_attendance')
+    op.drop_table('general_attendance')
+    op.rename_table('general_attendance_new', 'general_attendance')
+    op.execute('ALTER TABLE general_attendance RENAME CONSTRAINT general_attendance_new_pkey TO general_attendance_pkey')
+    _create_foreign_keys()
+    _create_indexes()
+
+
+def downgrade() -> None:
+    op.create_table('general_attendance_old',
+    *_columns(),
+    sa.PrimaryKeyConstraint('id', name='general_attendance_old_pkey')
+    )
+    op.execute('INSERT INTO general_attendance_old SELECT * FROM general_attendance')
+    # drops every partition along with the parent
+    op.drop_table('general_attendance')
+    op.rename_table('general_attendance_old', 'general_attendance')
+    op.execute('ALTER TABLE general_attendance RENAME CONSTRAINT general_attendance_old_pkey TO general_attendance_pkey')
+    _create_foreign_keys()
+    _create_indexes()
@@ -0,0 +1,38 @@
+"""hot lookup indexes
+
+Revision ID: d41a7e93c5b8
+Revises: 8b2e4d6f0a13
+Create Date: 2026-10-18 16:48:03.275561
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'd41a7e93c5b8'
+down_revision: Union[str, None] = '8b2e4d6f0a13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # CONCURRENTLY keeps logins and check-ins flowing while the indexes
+    # build; it cannot run inside the migration transaction
+    with op.get_context().autocommit_block():
+        op.create_index('users_fullname_key', 'users', ['fullname'], unique=True, postgresql_concurrently=True)
+        op.create_index('students_qr_code_key', 'students', ['qr_code'], unique=True, postgresql_concurrently=True)
+        op.create_index('ix_general_attendance_attended_student_id_attended_time', 'general_attendance', ['attended_student_id', 'attended_time'], postgresql_concurrently=True)
+        op.create_index('ix_general_attendance_attended_change', 'general_attendance', ['attended_change'], postgresql_concurrently=True)
+        op.create_index('brin_general_attendance_attended_time', 'general_attendance', ['attended_time'], postgresql_using='brin', postgresql_concurrently=True)
+    # promote the unique indexes to the constraints the models declare
+    op.execute('ALTER TABLE users ADD CONSTRAINT users_fullname_key UNIQUE USING INDEX users_fullname_key')
+    op.execute('ALTER TABLE students ADD CONSTRAINT students_qr_code_key UNIQUE USING INDEX students_qr_code_key')
+
+
+def downgrade() -> None:
+    op.drop_constraint('students_qr_code_key', 'students', type_='unique')
+    op.drop_constraint('users_fullname_key', 'users', type_='unique')
+    op.drop_index('brin_general_attendance_attended_time', table_name='general_attendance')
+    op.drop_index('ix_general_attendance_attended_change', table_name='general_attendance')
+    op.drop_index('ix_general_attendance_attended_student_id_attended_time', table_name='general_attendance')
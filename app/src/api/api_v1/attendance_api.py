@@ -0,0 +1,286 @@
+import asyncio
+import uuid
+from datetime import date, datetime, time, timedelta
+from logging import getLogger
+from typing import AsyncIterator, List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.api.api_v1.login_api import (
+    get_current_admin_from_token,
+    get_current_user_from_token,
+)
+from src.core.pagination import InvalidCursor, decode_cursor, encode_cursor
+from src.core.responses import TrustedJSONResponse
+from src.core.settings import variables
+from src.core.streaming import CsvEncoder, GzipEncoder, XlsxEncoder
+from src.db.crud import AttendanceDAL
+from src.db.models import UserSnapshot
+from src.db.schemas import (
+    AttendanceRecordPage,
+    AttendanceReport,
+    CheckInRequest,
+    CheckInResponse,
+)
+from src.db.session import get_db, routed_session
+from src.services.attendance import attendance_writer
+from src.services.student_index import student_index
+
+logger = getLogger(__name__)
+attendance_router = APIRouter()
+
+REPORT_DIMENSIONS = ("day", "group", "change")
+MAX_REPORT_DAYS = 366
+EXPORT_ENCODERS = {"csv": CsvEncoder, "xlsx": XlsxEncoder}
+EXPORT_HEADER = (
+    "id",
+    "attended_time",
+    "student_id",
+    "fullname",
+    "group",
+    "study_year",
+    "change",
+)
+
+
+@attendance_router.post(
+    "/check-in", response_model=CheckInResponse, status_code=status.HTTP_202_ACCEPTED
+)
+async def check_in(
+    body: CheckInRequest,
+    durable: bool = False,
+    current_user: UserSnapshot = Depends(get_current_user_from_token),
+) -> TrustedJSONResponse:
+    """Record a student's arrival by QR code or student id.
+
+    The check-in is acknowledged as soon as it is queued; pass durable=true
+    to wait until its batch is committed.
+    """
+    if not student_index.loaded:
+        raise HTTPException(
+            status_code=503,
+            detail="Student index is still loading.",
+            headers={"Retry-After": "5"},
+        )
+    if body.qr_code is not None:
+        student = student_index.by_qr_code(body.qr_code)
+    elif body.student_id is not None:
+        student = student_index.by_student_id(body.student_id)
+    else:
+        raise HTTPException(
+            status_code=422, detail="Either qr_code or student_id should be provided"
+        )
+    if student is None:
+        raise HTTPException(status_code=404, detail="Student not found.")
+    record, written = attendance_writer.submit(student, durable=durable)
+    if written is not None:
+        try:
+            await written
+        except Exception as err:
+            logger.error(err)
+            raise HTTPException(status_code=503, detail="Check-in was not saved.")
+    return TrustedJSONResponse(
+        {
+            "student_id": student.student_id,
+            "fullname": student.fullname,
+            "change_id": student.change_id,
+            "attended_time": record["attended_time"],
+            "persisted": written is not None,
+        },
+        status_code=status.HTTP_202_ACCEPTED,
+    )
+
+
+def _check_date_range(date_from: date, date_to: date) -> None:
+    if date_to < date_from:
+        raise HTTPException(status_code=422, detail="date_to is before date_from.")
+    if (date_to - date_from).days >= MAX_REPORT_DAYS:
+        raise HTTPException(
+            status_code=422, detail=f"Ranges are limited to {MAX_REPORT_DAYS} days."
+        )
+
+
+def _report_row(row: dict) -> dict:
+    """An AttendanceReportRow as a plain dict"""
+    # the summaries store 0 for "no group" / "no change"
+    group_id = row.get("group_id") or None
+    enrolled = rate = None
+    if "group_id" in row and group_id is not None:
+        enrolled = student_index.enrolled(group_id)
+        if enrolled:
+            rate = round(row["students"] / (enrolled * row["days"]), 4)
+    return {
+        "attendance_date": row.get("attendance_date"),
+        "group_id": group_id,
+        "group_name": row.get("group_name"),
+        "study_year": row.get("study_year"),
+        "change_id": row.get("change_id") or None,
+        "change_name": row.get("change_name"),
+        "check_ins": row["check_ins"],
+        "students": row["students"],
+        "days": row["days"],
+        "enrolled": enrolled,
+        "rate": rate,
+    }
+
+
+@attendance_router.get("/reports", response_model=AttendanceReport)
+async def attendance_report(
+    date_from: date,
+    date_to: date,
+    by: List[str] = Query(list(REPORT_DIMENSIONS)),
+    group_id: Optional[int] = None,
+    change_id: Optional[int] = None,
+    study_year_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_admin_from_token),
+) -> TrustedJSONResponse:
+    """Check-ins, distinct students and attendance rate per day, group and
+    change, read from the summaries the attendance writer keeps current.
+
+    ``students`` sums distinct students per day; ``rate`` is that over
+    enrolled students times days with check-ins, and is only given for rows
+    broken down by group.
+    """
+    _check_date_range(date_from, date_to)
+    unknown = set(by) - set(REPORT_DIMENSIONS)
+    if unknown:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Unknown dimensions {sorted(unknown)}, "
+            f"expected any of {list(REPORT_DIMENSIONS)}.",
+        )
+    dimensions = [dimension for dimension in REPORT_DIMENSIONS if dimension in by]
+    rows = await AttendanceDAL(db).get_report(
+        date_from,
+        date_to,
+        dimensions,
+        group_id=group_id,
+        change_id=change_id,
+        study_year_id=study_year_id,
+    )
+    return TrustedJSONResponse(
+        {
+            "date_from": date_from,
+            "date_to": date_to,
+            "rows": [_report_row(row) for row in rows],
+        }
+    )
+
+
+@attendance_router.get("/records", response_model=AttendanceRecordPage)
+async def attendance_records(
+    date_from: date,
+    date_to: date,
+    group_id: Optional[int] = None,
+    change_id: Optional[int] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_admin_from_token),
+) -> TrustedJSONResponse:
+    """Individual check-ins behind a report row, oldest first.
+
+    Pages are keyed on (attended_time, id); pass ``next_cursor`` back as
+    ``cursor`` for the following page.
+    """
+    _check_date_range(date_from, date_to)
+    after = None
+    if cursor is not None:
+        try:
+            attended_time, record_id = decode_cursor(cursor, 2)
+            after = (datetime.fromisoformat(attended_time), uuid.UUID(record_id))
+        except (InvalidCursor, TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor.")
+    rows = await AttendanceDAL(db).get_records(
+        datetime.combine(date_from, time.min),
+        datetime.combine(date_to + timedelta(days=1), time.min),
+        limit + 1,
+        after=after,
+        group_id=group_id,
+        change_id=change_id,
+    )
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].attended_time, rows[-1].id)
+    return TrustedJSONResponse(
+        {
+            "items": [
+                {
+                    "id": row.id,
+                    "student_id": row.attended_student_id,
+                    "fullname": row.attended_student_name,
+                    "attended_time": row.attended_time,
+                    "change_id": row.attended_change,
+                    "group_id": row.student_group_id,
+                }
+                for row in rows
+            ],
+            "next_cursor": next_cursor,
+        }
+    )
+
+
+async def _export_chunks(encoder, chunk_size: int, **filters) -> AsyncIterator[bytes]:
+    # a session of its own: it has to outlive the handler while the body streams
+    async with routed_session() as session:
+        yield encoder.start()
+        async for rows in AttendanceDAL(session).stream_export_rows(
+            chunk_size=chunk_size, **filters
+        ):
+            # encoding and compression stay off the event loop
+            chunk = await asyncio.to_thread(encoder.encode, rows)
+            if chunk:
+                yield chunk
+        yield await asyncio.to_thread(encoder.finish)
+
+
+@attendance_router.get("/export")
+async def export_attendance(
+    request: Request,
+    time_from: datetime,
+    time_to: datetime,
+    format: str = Query("csv", regex="^(csv|xlsx)$"),
+    after_id: Optional[uuid.UUID] = None,
+    group_id: Optional[int] = None,
+    change_id: Optional[int] = None,
+    study_year_id: Optional[int] = None,
+    current_user: UserSnapshot = Depends(get_current_user_from_token),
+) -> StreamingResponse:
+    """Every check-in in [time_from, time_to), streamed as CSV or XLSX.
+
+    Rows come from a server-side cursor in (attended_time, id) order and are
+    encoded chunk by chunk, so memory does not grow with the export. To
+    resume an interrupted export pass the attended_time of the last row
+    received as ``time_from`` and its id as ``after_id``. CSV is gzipped on
+    the fly when the client accepts it.
+    """
+    if not (current_user.is_admin or current_user.is_superadmin):
+        raise HTTPException(status_code=403, detail="Forbidden.")
+    if time_to <= time_from:
+        raise HTTPException(status_code=422, detail="time_to is not after time_from.")
+    encoder = EXPORT_ENCODERS[format](EXPORT_HEADER)
+    headers = {
+        "Content-Disposition": f'attachment; filename="attendance-'
+        f'{time_from:%Y%m%d%H%M%S}-{time_to:%Y%m%d%H%M%S}.{encoder.extension}"'
+    }
+    # an xlsx workbook is already a deflated zip
+    if format == "csv" and "gzip" in request.headers.get("accept-encoding", ""):
+        encoder = GzipEncoder(encoder)
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(
+        _export_chunks(
+            encoder,
+            variables.attendance_export_chunk_size,
+            time_from=time_from,
+            time_to=time_to,
+            after=(time_from, after_id) if after_id is not None else None,
+            group_id=group_id,
+            change_id=change_id,
+            study_year_id=study_year_id,
+        ),
+        media_type=encoder.media_type,
+        headers=headers,
+    )
@@ -0,0 +1,61 @@
+from fastapi import APIRouter
+from src.core.utils import async_hasher, token_cache
+from src.core.shared_cache import invalidation_bus
+from src.db.session import engine, replicas
+from src.services.attendance import attendance_writer
+from src.services.partitions import attendance_partitions
+from src.services.photos import photo_store
+from src.services.recognition import recognition_service
+from src.services.student_index import student_index
+
+internal_router = APIRouter()
+
+
+@internal_router.get("/hasher")
+async def hasher_stats() -> dict:
+    return async_hasher.executor.stats()
+
+
+@internal_router.get("/cache")
+async def cache_stats() -> dict:
+    return invalidation_bus.stats()
+
+
+@internal_router.get("/token-cache")
+async def token_cache_stats() -> dict:
+    return token_cache.stats()
+
+
+@internal_router.get("/db-pool")
+async def db_pool_stats() -> dict:
+    return engine.sync_engine.pool.stats()
+
+
+@internal_router.get("/db-replicas")
+async def db_replicas_stats() -> dict:
+    return replicas.stats()
+
+
+@internal_router.get("/attendance-writer")
+async def attendance_writer_stats() -> dict:
+    return attendance_writer.stats()
+
+
+@internal_router.get("/attendance-partitions")
+async def attendance_partitions_stats() -> dict:
+    return attendance_partitions.stats()
+
+
+@internal_router.get("/student-index")
+async def student_index_stats() -> dict:
+    return student_index.stats()
+
+
+@internal_router.get("/recognition")
+async def recognition_stats() -> dict:
+    return recognition_service.stats()
+
+
+@internal_router.get("/photos")
+async def photo_store_stats() -> dict:
+    return photo_store.stats()
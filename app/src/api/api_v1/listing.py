@@ -0,0 +1,52 @@
+from typing import Awaitable, Callable, List, Optional
+
+from fastapi import HTTPException, Query
+from src.core.pagination import InvalidCursor
+from src.core.responses import TrustedJSONResponse
+from src.db.crud import Keyset
+
+
+class PageParams:
+    """Query parameters shared by every keyset-paginated list"""
+
+    def __init__(
+        self,
+        limit: int = Query(50, ge=1, le=500),
+        cursor: Optional[str] = Query(
+            None, description="next_cursor of the previous page"
+        ),
+        fields: Optional[str] = Query(
+            None, description="Comma separated fields to return, all by default"
+        ),
+    ):
+        self.limit = limit
+        self.cursor = cursor
+        self.fields = fields
+
+    def selected_fields(self, listing: Keyset) -> List[str]:
+        if self.fields is None:
+            return list(listing.fields)
+        fields = [name.strip() for name in self.fields.split(",") if name.strip()]
+        unknown = [name for name in fields if name not in listing.fields]
+        if unknown or not fields:
+            raise HTTPException(
+                status_code=422,
+                detail=f"Unknown fields {unknown}, expected any of {list(listing.fields)}.",
+            )
+        return list(dict.fromkeys(fields))
+
+
+async def fetch_page(
+    list_rows: Callable[..., Awaitable],
+    listing: Keyset,
+    params: PageParams,
+    **filters,
+) -> TrustedJSONResponse:
+    """One page as the route's Page response, rendered without re-validation"""
+    try:
+        items, next_cursor = await list_rows(
+            params.selected_fields(listing), params.cursor, params.limit, **filters
+        )
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+    return TrustedJSONResponse({"items": items, "next_cursor": next_cursor})
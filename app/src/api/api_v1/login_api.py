@@ -1,14 +1,15 @@
 from datetime import timedelta
-from typing import Union
+from typing import List, Union
+from uuid import UUID
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from jose import JWTError, jwt
+from jose import JWTError
 from sqlalchemy.ext.asyncio import AsyncSession
 from src.core.settings import variables
-from src.core.utils import Hasher, create_access_token
+from src.core.utils import async_hasher, create_access_token, decode_access_token
 from src.db.crud import UserDAL
-from src.db.models import AdminRole, User
+from src.db.models import AdminRole, User, UserSnapshot
 from src.db.schemas import Token
 from src.db.session import get_db
 
@@ -16,72 +17,72 @@ login_router = APIRouter()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/login/token")
 
 
-def check_user_permissions(target_user: User, current_user: User) -> bool:
+def get_protected_roles(
+    target_user_id: UUID, current_user: UserSnapshot
+) -> Union[List[str], None]:
+    """Roles the target must not hold for current_user to manage it.
+
+    Passed to UserDAL writes so the permission check runs inside the UPDATE.
+    None means current_user may not manage other users at all.
+    """
     if AdminRole.ROLE_SUPERADMIN in current_user.roles:
         raise HTTPException(
             status_code=406, detail="Superadmin cannot be deleted via API."
         )
-    if target_user.id != current_user.id:
-        # check admin role
-        if not {
-            AdminRole.ROLE_ADMIN,
-            AdminRole.ROLE_SUPERADMIN,
-        }.intersection(current_user.roles):
-            return False
-        # check admin deactivate superadmin attempt
-        if (
-            AdminRole.ROLE_SUPERADMIN in target_user.roles
-            and AdminRole.ROLE_ADMIN in current_user.roles
-        ):
-            return False
-        # check admin deactivate admin attempt
-        if (
-            AdminRole.ROLE_ADMIN in target_user.roles
-            and AdminRole.ROLE_ADMIN in current_user.roles
-        ):
-            return False
-    return True
+    if target_user_id == current_user.id:
+        return []
+    # only admins manage other users, and never other admins / superadmins
+    if AdminRole.ROLE_ADMIN not in current_user.roles:
+        return None
+    return [AdminRole.ROLE_ADMIN.value, AdminRole.ROLE_SUPERADMIN.value]
 
 
 async def _get_user_by_fullname_for_auth(fullname: str, session: AsyncSession):
-    async with session.begin():
-        user_dal = UserDAL(session)
-        return await user_dal.get_user_by_fullname(
-            fullname=fullname,
-        )
+    user_dal = UserDAL(session)
+    return await user_dal.get_user_by_fullname(
+        fullname=fullname,
+    )
 
 
 async def authenticate_user(
     fullname: str, password: str, db: AsyncSession
 ) -> Union[User, None]:
     user = await _get_user_by_fullname_for_auth(fullname=fullname, session=db)
+    # hand the connection back to the pool before spending time in bcrypt
+    await db.close()
     if user is None:
         return
-    if not Hasher.verify_password(password, user.hashed_password):
+    if not await async_hasher.verify_password(password, user.hashed_password):
         return
     return user
 
 
 async def get_current_user_from_token(
     token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)
-):
+) -> UserSnapshot:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
     )
     try:
-        payload = jwt.decode(
-            token, variables.secret_key, algorithms=[variables.algorithm]
-        )
+        payload = decode_access_token(token)
         fullname: str = payload.get("sub")
         if fullname is None:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    user = await _get_user_by_fullname_for_auth(fullname=fullname, session=db)
-    if user is None:
+    snapshot = await UserDAL(db).get_user_snapshot(fullname)
+    if snapshot is None:
         raise credentials_exception
-    return user
+    return snapshot
+
+
+async def get_current_admin_from_token(
+    current_user: UserSnapshot = Depends(get_current_user_from_token),
+) -> UserSnapshot:
+    if not (current_user.is_admin or current_user.is_superadmin):
+        raise HTTPException(status_code=403, detail="Forbidden.")
+    return current_user
 
 
 @login_router.post("/token", response_model=Token)
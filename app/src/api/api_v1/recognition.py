@@ -1 +1,51 @@
-from face_recognition import face_locations
+import asyncio
+from typing import Optional
+
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
+from src.api.api_v1.login_api import get_current_user_from_token
+from src.db.models import UserSnapshot
+from src.db.schemas import RecognitionMatch, RecognitionResponse, RecognizedFace
+from src.services.recognition import recognition_service
+from src.services.student_index import student_index
+
+recognition_router = APIRouter()
+
+
+@recognition_router.post("/identify", response_model=RecognitionResponse)
+async def identify_students(
+    image: UploadFile = File(...),
+    k: int = Query(1, ge=1, le=20),
+    current_user: UserSnapshot = Depends(get_current_user_from_token),
+) -> RecognitionResponse:
+    """Closest enrolled students for every face in the uploaded photo"""
+    if not recognition_service.ready:
+        raise HTTPException(
+            status_code=503,
+            detail="Face encodings are still being built.",
+            headers={"Retry-After": "30"},
+        )
+    try:
+        faces = await recognition_service.identify(await image.read(), k=k)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Face encoding timed out.")
+    return RecognitionResponse(
+        faces=[
+            RecognizedFace(
+                matches=[
+                    RecognitionMatch(
+                        student_id=match.student_id,
+                        fullname=_fullname(match.student_id),
+                        distance=match.distance,
+                    )
+                    for match in matches
+                ]
+            )
+            for matches in faces
+        ]
+    )
+
+
+def _fullname(student_id: str) -> Optional[str]:
+    student = student_index.by_student_id(student_id)
+    if student is not None:
+        return student.fullname
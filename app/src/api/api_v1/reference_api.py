@@ -0,0 +1,66 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.api.api_v1.listing import PageParams, fetch_page
+from src.api.api_v1.login_api import get_current_admin_from_token
+from src.core.responses import TrustedJSONResponse
+from src.db.crud import ChangeDAL, FacultyDAL, GroupDAL, ProfessionDAL
+from src.db.models import UserSnapshot
+from src.db.schemas import Page
+from src.db.session import get_db
+
+group_router = APIRouter()
+faculty_router = APIRouter()
+profession_router = APIRouter()
+change_router = APIRouter()
+
+
+@group_router.get("/list", response_model=Page)
+async def list_groups(
+    study_year_id: Optional[int] = None,
+    change_id: Optional[int] = None,
+    page: PageParams = Depends(),
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_admin_from_token),
+) -> TrustedJSONResponse:
+    group_dal = GroupDAL(db)
+    return await fetch_page(
+        group_dal.list_groups,
+        group_dal.listing,
+        page,
+        study_year_id=study_year_id,
+        change_id=change_id,
+    )
+
+
+@faculty_router.get("/list", response_model=Page)
+async def list_faculties(
+    page: PageParams = Depends(),
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_admin_from_token),
+) -> TrustedJSONResponse:
+    faculty_dal = FacultyDAL(db)
+    return await fetch_page(faculty_dal.list_faculties, faculty_dal.listing, page)
+
+
+@profession_router.get("/list", response_model=Page)
+async def list_professions(
+    page: PageParams = Depends(),
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_admin_from_token),
+) -> TrustedJSONResponse:
+    profession_dal = ProfessionDAL(db)
+    return await fetch_page(
+        profession_dal.list_professions, profession_dal.listing, page
+    )
+
+
+@change_router.get("/list", response_model=Page)
+async def list_changes(
+    page: PageParams = Depends(),
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_admin_from_token),
+) -> TrustedJSONResponse:
+    change_dal = ChangeDAL(db)
+    return await fetch_page(change_dal.list_changes, change_dal.listing, page)
@@ -0,0 +1,277 @@
+import os
+import uuid
+from datetime import datetime
+from logging import getLogger
+from typing import AsyncIterator, List, Optional, Set, Tuple, Union
+
+from asyncpg import PostgresError
+from fastapi import APIRouter, Depends, HTTPException, Request
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.api.api_v1.listing import PageParams, fetch_page
+from src.api.api_v1.login_api import (
+    get_current_admin_from_token,
+    get_current_user_from_token,
+)
+from src.core.responses import TrustedJSONResponse
+from src.core.settings import variables
+from src.core.streaming import RowError, aiter_csv_rows, aiter_ndjson_rows
+from src.db.crud import StudentDAL
+from src.db.models import UserSnapshot
+from src.db.schemas import (
+    Page,
+    StudentBulkCreateResponse,
+    StudentCreate,
+    StudentPhotoResponse,
+    StudentRowError,
+)
+from src.db.session import get_db, pin_to_primary
+from src.services.photos import (
+    PHOTO_TYPES,
+    PHOTO_VARIANTS,
+    PhotoTooLarge,
+    make_variants,
+    photo_store,
+)
+from src.services.recognition import recognition_service
+from src.services.student_index import student_index
+
+logger = getLogger(__name__)
+student_router = APIRouter()
+
+ROW_READERS = {
+    "text/csv": aiter_csv_rows,
+    "application/x-ndjson": aiter_ndjson_rows,
+    "application/jsonlines": aiter_ndjson_rows,
+}
+
+
+def _student_record(student: StudentCreate, created_time: datetime) -> tuple:
+    return (
+        uuid.uuid4(),
+        student.fullname,
+        student.student_id,
+        student.gender,
+        student.student_image,
+        student.course,
+        student.qr_code,
+        created_time,
+        student.profession,
+        student.group,
+    )
+
+
+def _describe_validation_error(err: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in err.errors()
+    )
+
+
+class _ImportReport:
+    """Per-row outcome of a bulk import, keeping only the first errors"""
+
+    def __init__(self, max_errors: int):
+        self.max_errors = max_errors
+        self.inserted = 0
+        self.failed = 0
+        self.errors: List[StudentRowError] = []
+
+    def reject(self, line: int, error: str) -> None:
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append(StudentRowError(line=line, error=error))
+
+
+def _validate_row(
+    line: int,
+    row: Union[dict, RowError],
+    group_ids: Set[int],
+    profession_ids: Set[int],
+    report: _ImportReport,
+) -> Union[StudentCreate, None]:
+    if isinstance(row, RowError):
+        report.reject(line, str(row))
+        return None
+    try:
+        student = StudentCreate.parse_obj(row)
+    except ValidationError as err:
+        report.reject(line, _describe_validation_error(err))
+        return None
+    if student.group is not None and student.group not in group_ids:
+        report.reject(line, f"group: unknown group {student.group}")
+        return None
+    if student.profession is not None and student.profession not in profession_ids:
+        report.reject(line, f"profession: unknown profession {student.profession}")
+        return None
+    return student
+
+
+def _database_error(err: PostgresError) -> str:
+    detail = getattr(err, "detail", None)
+    return f"{err} ({detail})" if detail else str(err)
+
+
+async def _copy_chunk(
+    student_dal: StudentDAL,
+    chunk: List[tuple],
+    lines: List[int],
+    report: _ImportReport,
+) -> None:
+    """COPY a chunk in its own savepoint, reporting the rows left out.
+
+    Rows whose keys are taken are skipped by the DAL. When the database
+    rejects the chunk for anything else, the savepoint is rolled back and
+    the halves are retried, down to the single rows at fault.
+    """
+    try:
+        async with student_dal.db_session.begin_nested():
+            inserted = await student_dal.copy_students(chunk)
+    except PostgresError as err:
+        if len(chunk) == 1:
+            logger.warning("Row %s rejected by the database: %s", lines[0], err)
+            report.reject(lines[0], f"Rejected by the database: {_database_error(err)}")
+            return
+        middle = len(chunk) // 2
+        await _copy_chunk(student_dal, chunk[:middle], lines[:middle], report)
+        await _copy_chunk(student_dal, chunk[middle:], lines[middle:], report)
+        return
+    report.inserted += len(inserted)
+    for record, line in zip(chunk, lines):
+        if record[0] not in inserted:
+            report.reject(line, "student_id or qr_code already exists.")
+
+
+async def _bulk_create_students(
+    rows: AsyncIterator[Tuple[int, Union[dict, RowError]]], session
+) -> StudentBulkCreateResponse:
+    student_dal = StudentDAL(session)
+    group_ids, profession_ids = await student_dal.get_reference_ids()
+    report = _ImportReport(max_errors=variables.student_import_max_errors)
+    created_time = datetime.now()
+    chunk: List[tuple] = []
+    lines: List[int] = []
+    async for line, row in rows:
+        student = _validate_row(line, row, group_ids, profession_ids, report)
+        if student is None:
+            continue
+        chunk.append(_student_record(student, created_time))
+        lines.append(line)
+        if len(chunk) >= variables.student_copy_chunk_size:
+            await _copy_chunk(student_dal, chunk, lines, report)
+            chunk, lines = [], []
+    if chunk:
+        await _copy_chunk(student_dal, chunk, lines, report)
+    await session.commit()
+    if report.inserted:
+        await student_index.refresh(session)
+    return StudentBulkCreateResponse(
+        inserted=report.inserted, failed=report.failed, errors=report.errors
+    )
+
+
+@student_router.post("/bulk", response_model=StudentBulkCreateResponse)
+async def bulk_create_students(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_user_from_token),
+) -> StudentBulkCreateResponse:
+    """Enroll students from a CSV or NDJSON body streamed straight into COPY"""
+    if not (current_user.is_admin or current_user.is_superadmin):
+        raise HTTPException(status_code=403, detail="Forbidden.")
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    read_rows = ROW_READERS.get(content_type)
+    if read_rows is None:
+        raise HTTPException(
+            status_code=415,
+            detail=f"Expected one of: {', '.join(ROW_READERS)}.",
+        )
+    return await _bulk_create_students(read_rows(request.stream()), db)
+
+
+@student_router.put("/{student_id}/photo", response_model=StudentPhotoResponse)
+async def upload_student_photo(
+    student_id: str,
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_user_from_token),
+) -> StudentPhotoResponse:
+    """Store a raw image body as the student's photo, streamed to disk.
+
+    Identical uploads share one file. The downscaled variants the face
+    encoder and thumbnails use are rendered here, once, in the recognition
+    pool; the encoding store picks the new photo up on its next refresh.
+    """
+    if not (current_user.is_admin or current_user.is_superadmin):
+        raise HTTPException(status_code=403, detail="Forbidden.")
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    extension = PHOTO_TYPES.get(content_type)
+    if extension is None:
+        raise HTTPException(
+            status_code=415,
+            detail=f"Expected one of: {', '.join(PHOTO_TYPES)}.",
+        )
+    student_dal = StudentDAL(db)
+    # the student may have been enrolled a moment ago, within a replica's lag
+    pin_to_primary(db)
+    if not await student_dal.student_exists(student_id):
+        raise HTTPException(status_code=404, detail="Student not found.")
+    # hold no connection while the body streams in
+    await db.commit()
+    try:
+        photo = await photo_store.save(request.stream(), extension)
+    except PhotoTooLarge as err:
+        raise HTTPException(status_code=413, detail=str(err))
+    stored = False
+    try:
+        try:
+            variants = await recognition_service.executor.run(
+                "photo_variants",
+                make_variants,
+                photo_store.absolute(photo.path),
+                PHOTO_VARIANTS,
+            )
+        except OSError as err:
+            raise HTTPException(status_code=415, detail=f"Unreadable image: {err}")
+        if not await student_dal.set_student_image(student_id, photo.path):
+            raise HTTPException(status_code=404, detail="Student not found.")
+        stored = True
+    finally:
+        if not stored:
+            # unreadable, pool overloaded or timed out, request cancelled,
+            # or the student deleted meanwhile
+            photo_store.discard(photo, PHOTO_VARIANTS)
+    await db.commit()
+    return StudentPhotoResponse(
+        student_id=student_id,
+        student_image=photo.path,
+        sha256=photo.sha256,
+        size=photo.size,
+        deduplicated=photo.deduplicated,
+        variants={
+            variant: os.path.relpath(path, photo_store.media_root)
+            for variant, path in variants.items()
+        },
+    )
+
+
+@student_router.get("/list", response_model=Page)
+async def list_students(
+    group_id: Optional[int] = None,
+    course: Optional[int] = None,
+    study_year_id: Optional[int] = None,
+    profession_id: Optional[int] = None,
+    page: PageParams = Depends(),
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_admin_from_token),
+) -> TrustedJSONResponse:
+    """Students ordered by student_id, one keyset page at a time"""
+    student_dal = StudentDAL(db)
+    return await fetch_page(
+        student_dal.list_students,
+        student_dal.listing,
+        page,
+        group_id=group_id,
+        course=course,
+        study_year_id=study_year_id,
+        profession_id=profession_id,
+    )
@@ -1,17 +1,20 @@
 import uuid
 from logging import getLogger
-from typing import Union
+from typing import List, Optional, Union
 from uuid import UUID
 
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-from src.api.api_v1.login_api import check_user_permissions, get_current_user_from_token
-from src.core.utils import Hasher
+from src.api.api_v1.listing import PageParams, fetch_page
+from src.api.api_v1.login_api import get_current_user_from_token, get_protected_roles
+from src.core.responses import TrustedJSONResponse
+from src.core.utils import async_hasher
 from src.db.crud import UserDAL
-from src.db.models import AdminRole, User
+from src.db.models import AdminRole, User, UserSnapshot
 from src.db.schemas import (
     DeleteUserResponse,
+    Page,
     ShowUser,
     UpdatedUserResponse,
     UpdateUserRequest,
@@ -24,51 +27,81 @@ user_router = APIRouter()
 
 
 async def _create_new_user(body: UserCreate, session) -> ShowUser:
-    async with session.begin():
-        user_dal = UserDAL(session)
-        user = await user_dal.create_user(
-            user_id=uuid.uuid4(),
-            fullname=body.fullname,
-            hashed_password=Hasher.get_password_hash(body.password),
-            roles=[
-                AdminRole.ROLE_ADMIN.val,
-            ],
-        )
-        return ShowUser(
-            id=user.id,
-            fullname=user.fullname,
-            is_active=user.is_active,
-        )
+    hashed_password = await async_hasher.get_password_hash(body.password)
+    user_dal = UserDAL(session)
+    user = await user_dal.create_user(
+        user_id=uuid.uuid4(),
+        fullname=body.fullname,
+        hashed_password=hashed_password,
+        roles=[
+            AdminRole.ROLE_ADMIN.value,
+        ],
+    )
+    await session.commit()
+    return ShowUser(
+        id=user.id,
+        fullname=user.fullname,
+        is_active=user.is_active,
+    )
 
 
-async def _delete_user(user_id, session) -> Union[UUID, None]:
-    async with session.begin():
-        user_dal = UserDAL(session)
-        deleted_user_id = await user_dal.delete_user(
-            user_id=user_id,
-        )
-        return deleted_user_id
+async def _delete_user(
+    user_id, protected_roles: List[str], session
+) -> Union[UUID, None]:
+    user_dal = UserDAL(session)
+    deleted_user_id = await user_dal.delete_user(
+        user_id=user_id, protected_roles=protected_roles
+    )
+    if deleted_user_id is not None:
+        await session.commit()
+    return deleted_user_id
 
 
 async def _update_user(
-    updated_user_params: dict, user_id: UUID, session
+    updated_user_params: dict, user_id: UUID, protected_roles: List[str], session
 ) -> Union[UUID, None]:
-    async with session.begin():
-        user_dal = UserDAL(session)
-        updated_user_id = await user_dal.update_user(
-            user_id=user_id, **updated_user_params
-        )
-        return updated_user_id
+    user_dal = UserDAL(session)
+    updated_user_id = await user_dal.update_user(
+        user_id=user_id, protected_roles=protected_roles, **updated_user_params
+    )
+    if updated_user_id is not None:
+        await session.commit()
+    return updated_user_id
+
+
+async def _grant_admin_role(user_id: UUID, session) -> Union[UUID, None]:
+    user_dal = UserDAL(session)
+    updated_user_id = await user_dal.grant_admin_role(user_id=user_id)
+    if updated_user_id is not None:
+        await session.commit()
+    return updated_user_id
+
+
+async def _revoke_admin_role(user_id: UUID, session) -> Union[UUID, None]:
+    user_dal = UserDAL(session)
+    updated_user_id = await user_dal.revoke_admin_role(user_id=user_id)
+    if updated_user_id is not None:
+        await session.commit()
+    return updated_user_id
 
 
 async def _get_user_by_id(user_id, session) -> Union[User, None]:
-    async with session.begin():
-        user_dal = UserDAL(session)
-        user = await user_dal.get_user_by_id(
-            user_id=user_id,
+    user_dal = UserDAL(session)
+    user = await user_dal.get_user_by_id(
+        user_id=user_id,
+    )
+    if user is not None:
+        return user
+
+
+async def _get_active_user_or_404(user_id: UUID, session) -> User:
+    """Explains a conditional write that matched no row"""
+    user = await _get_user_by_id(user_id, session)
+    if user is None or not user.is_active:
+        raise HTTPException(
+            status_code=404, detail=f"User with id {user_id} not found."
         )
-        if user is not None:
-            return user
+    return user
 
 
 @user_router.post("/", response_model=ShowUser)
@@ -77,6 +110,10 @@ async def create_user(body: UserCreate, db: AsyncSession = Depends(get_db)) -> S
         return await _create_new_user(body, db)
     except IntegrityError as err:
         logger.error(err)
+        if "users_fullname_key" in str(err.orig):
+            raise HTTPException(
+                status_code=409, detail=f"User {body.fullname} already exists."
+            )
         raise HTTPException(status_code=503, detail=f"Database error: {err}")
 
 
@@ -84,23 +121,17 @@ async def create_user(body: UserCreate, db: AsyncSession = Depends(get_db)) -> S
 async def delete_user(
     user_id: UUID,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user_from_token),
+    current_user: UserSnapshot = Depends(get_current_user_from_token),
 ) -> DeleteUserResponse:
-    user_for_deletion = await _get_user_by_id(user_id, db)
-    if user_for_deletion is None:
-        raise HTTPException(
-            status_code=404, detail=f"User with id {user_id} not found."
-        )
-    if not check_user_permissions(
-        target_user=user_for_deletion,
-        current_user=current_user,
-    ):
-        raise HTTPException(status_code=403, detail="Forbidden.")
-    deleted_user_id = await _delete_user(user_id, db)
+    protected_roles = get_protected_roles(
+        target_user_id=user_id, current_user=current_user
+    )
+    deleted_user_id = None
+    if protected_roles is not None:
+        deleted_user_id = await _delete_user(user_id, protected_roles, db)
     if deleted_user_id is None:
-        raise HTTPException(
-            status_code=404, detail=f"User with id {user_id} not found."
-        )
+        await _get_active_user_or_404(user_id, db)
+        raise HTTPException(status_code=403, detail="Forbidden.")
     return DeleteUserResponse(deleted_user_id=deleted_user_id)
 
 
@@ -108,34 +139,25 @@ async def delete_user(
 async def grant_admin_privilege(
     user_id: UUID,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user_from_token),
+    current_user: UserSnapshot = Depends(get_current_user_from_token),
 ):
     if not current_user.is_superadmin:
         raise HTTPException(status_code=403, detail="Forbidden.")
-    if current_user.user_id == user_id:
+    if current_user.id == user_id:
         raise HTTPException(
             status_code=400, detail="Cannot manage privileges of itself."
         )
-    user_for_promotion = await _get_user_by_id(user_id, db)
-    if user_for_promotion.is_admin or user_for_promotion.is_superadmin:
-        raise HTTPException(
-            status_code=409,
-            detail=f"User with id {user_id} already promoted to admin / superadmin.",
-        )
-    if user_for_promotion is None:
-        raise HTTPException(
-            status_code=404, detail=f"User with id {user_id} not found."
-        )
-    updated_user_params = {
-        "roles": user_for_promotion.enrich_admin_roles_by_admin_role()
-    }
     try:
-        updated_user_id = await _update_user(
-            updated_user_params=updated_user_params, session=db, user_id=user_id
-        )
+        updated_user_id = await _grant_admin_role(user_id=user_id, session=db)
     except IntegrityError as err:
         logger.error(err)
         raise HTTPException(status_code=503, detail=f"Database error: {err}")
+    if updated_user_id is None:
+        await _get_active_user_or_404(user_id, db)
+        raise HTTPException(
+            status_code=409,
+            detail=f"User with id {user_id} already promoted to admin / superadmin.",
+        )
     return UpdatedUserResponse(updated_user_id=updated_user_id)
 
 
@@ -143,41 +165,53 @@ async def grant_admin_privilege(
 async def revoke_admin_privilege(
     user_id: UUID,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user_from_token),
+    current_user: UserSnapshot = Depends(get_current_user_from_token),
 ):
     if not current_user.is_superadmin:
         raise HTTPException(status_code=403, detail="Forbidden.")
-    if current_user.user_id == user_id:
+    if current_user.id == user_id:
         raise HTTPException(
             status_code=400, detail="Cannot manage privileges of itself."
         )
-    user_for_revoke_admin_privileges = await _get_user_by_id(user_id, db)
-    if not user_for_revoke_admin_privileges.is_admin:
-        raise HTTPException(
-            status_code=409, detail=f"User with id {user_id} has no admin privileges."
-        )
-    if user_for_revoke_admin_privileges is None:
-        raise HTTPException(
-            status_code=404, detail=f"User with id {user_id} not found."
-        )
-    updated_user_params = {
-        "roles": user_for_revoke_admin_privileges.remove_admin_privileges_from_model()
-    }
     try:
-        updated_user_id = await _update_user(
-            updated_user_params=updated_user_params, session=db, user_id=user_id
-        )
+        updated_user_id = await _revoke_admin_role(user_id=user_id, session=db)
     except IntegrityError as err:
         logger.error(err)
         raise HTTPException(status_code=503, detail=f"Database error: {err}")
+    if updated_user_id is None:
+        await _get_active_user_or_404(user_id, db)
+        raise HTTPException(
+            status_code=409, detail=f"User with id {user_id} has no admin privileges."
+        )
     return UpdatedUserResponse(updated_user_id=updated_user_id)
 
 
+@user_router.get("/list", response_model=Page)
+async def list_users(
+    is_active: Optional[bool] = None,
+    role: Optional[AdminRole] = None,
+    page: PageParams = Depends(),
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_user_from_token),
+) -> TrustedJSONResponse:
+    """Users ordered by fullname, one keyset page at a time"""
+    if not (current_user.is_admin or current_user.is_superadmin):
+        raise HTTPException(status_code=403, detail="Forbidden.")
+    user_dal = UserDAL(db)
+    return await fetch_page(
+        user_dal.list_users,
+        user_dal.listing,
+        page,
+        is_active=is_active,
+        role=role.value if role is not None else None,
+    )
+
+
 @user_router.get("/", response_model=ShowUser)
 async def get_user_by_id(
     user_id: UUID,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user_from_token),
+    current_user: UserSnapshot = Depends(get_current_user_from_token),
 ) -> ShowUser:
     user = await _get_user_by_id(user_id, db)
     if user is None:
@@ -192,7 +226,7 @@ async def update_user_by_id(
     user_id: UUID,
     body: UpdateUserRequest,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user_from_token),
+    current_user: UserSnapshot = Depends(get_current_user_from_token),
 ) -> UpdatedUserResponse:
     updated_user_params = body.dict(exclude_none=True)
     if updated_user_params == {}:
@@ -200,21 +234,24 @@ async def update_user_by_id(
             status_code=422,
             detail="At least one parameter for user update info should be provided",
         )
-    user_for_update = await _get_user_by_id(user_id, db)
-    if user_for_update is None:
-        raise HTTPException(
-            status_code=404, detail=f"User with id {user_id} not found."
-        )
+    protected_roles = []
     if user_id != current_user.id:
-        if check_user_permissions(
-            target_user=user_for_update, current_user=current_user
-        ):
-            raise HTTPException(status_code=403, detail="Forbidden.")
-    try:
-        updated_user_id = await _update_user(
-            updated_user_params=updated_user_params, session=db, user_id=user_id
+        protected_roles = get_protected_roles(
+            target_user_id=user_id, current_user=current_user
         )
+    updated_user_id = None
+    try:
+        if protected_roles is not None:
+            updated_user_id = await _update_user(
+                updated_user_params=updated_user_params,
+                user_id=user_id,
+                protected_roles=protected_roles,
+                session=db,
+            )
     except IntegrityError as err:
         logger.error(err)
         raise HTTPException(status_code=503, detail=f"Database error: {err}")
+    if updated_user_id is None:
+        await _get_active_user_or_404(user_id, db)
+        raise HTTPException(status_code=403, detail="Forbidden.")
     return UpdatedUserResponse(updated_user_id=updated_user_id)
@@ -0,0 +1,321 @@
+import functools
+import inspect
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+from sqlalchemy import event
+
+# seconds; Prometheus' default buckets extended down to a millisecond
+DEFAULT_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+SQL_OPERATIONS = {"SELECT", "INSERT", "UPDATE", "DELETE", "WITH"}
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: Sequence[str], values: Sequence, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    """Family of samples sharing a name, one child per label combination.
+
+    Children are created on first use and kept, so the hot path is a dict
+    lookup and a few additions. Everything is updated from the event loop
+    thread only, which is what makes the plain integer counters safe.
+    """
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._children: Dict[tuple, object] = {}
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = self._child()
+        return child
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        for values, child in list(self._children.items()):
+            lines.extend(self._samples(values, child))
+        return lines
+
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _child(self) -> _Value:
+        return _Value()
+
+    def _samples(self, values: tuple, child: _Value) -> List[str]:
+        return [f"{self.name}{_labels(self.label_names, values)} {child.value}"]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+
+class _Buckets:
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        # the last slot is the +Inf bucket
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def _child(self) -> _Buckets:
+        return _Buckets(self.buckets)
+
+    def _samples(self, values: tuple, child: _Buckets) -> List[str]:
+        lines = []
+        cumulative = 0
+        counts = list(child.counts)
+        for bound, count in zip((*self.buckets, "+Inf"), counts):
+            cumulative += count
+            labels = _labels(self.label_names, values, f'le="{bound}"')
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _labels(self.label_names, values)
+        lines.append(f"{self.name}_sum{labels} {child.sum}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    """Metrics rendered in the Prometheus text exposition format.
+
+    Collectors are callables run at scrape time that yield
+    ``(name, kind, documentation, [(labels dict, value), ...])``; they turn
+    the counters services already keep into samples without touching their
+    hot paths.
+    """
+
+    def __init__(self):
+        self.metrics: List[_Metric] = []
+        self.collectors: List[Callable[[], Iterable[tuple]]] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def collector(self, func: Callable[[], Iterable[tuple]]) -> Callable:
+        self.collectors.append(func)
+        return func
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        # collectors of several instances may report the same family
+        families: Dict[str, tuple] = {}
+        for collect in self.collectors:
+            for name, kind, documentation, samples in collect():
+                family = families.setdefault(name, (kind, documentation, []))
+                family[2].extend(samples)
+        for name, (kind, documentation, samples) in families.items():
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                rendered = _labels(tuple(labels), tuple(labels.values()))
+                lines.append(f"{name}{rendered} {value}")
+        lines.append("")
+        return "\n".join(lines)
+
+
+registry = Registry()
+
+http_request_duration = registry.register(
+    Histogram(
+        "http_request_duration_seconds",
+        "Time from receiving a request to sending the last body chunk.",
+        ("method", "route"),
+    )
+)
+http_responses = registry.register(
+    Counter("http_responses_total", "Responses sent.", ("method", "route", "status"))
+)
+http_requests_in_flight = registry.register(
+    Gauge("http_requests_in_flight", "Requests being handled.")
+).labels()
+db_query_duration = registry.register(
+    Histogram(
+        "db_query_duration_seconds",
+        "Time spent executing SQL statements, by statement kind.",
+        ("operation",),
+    )
+)
+db_query_rows = registry.register(
+    Counter(
+        "db_query_rows_total",
+        "Rows returned or affected by SQL statements, by statement kind.",
+        ("operation",),
+    )
+)
+dal_call_duration = registry.register(
+    Histogram(
+        "dal_call_duration_seconds",
+        "Time spent in data access layer methods.",
+        ("dal", "method"),
+    )
+)
+executor_call_duration = registry.register(
+    Histogram(
+        "executor_call_duration_seconds",
+        "Time spent in bounded executors (bcrypt, face encoding), queueing included.",
+        ("executor", "operation"),
+    )
+)
+recognition_stage_duration = registry.register(
+    Histogram(
+        "recognition_stage_duration_seconds",
+        "Time spent per face recognition stage.",
+        ("stage",),
+    )
+)
+recognition_faces = registry.register(
+    Counter("recognition_faces_total", "Faces found in recognition probes.")
+).labels()
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing every HTTP request by route template.
+
+    The route is read after the app has handled the request, from the
+    ``route`` FastAPI leaves in the scope, so label cardinality is bounded
+    by the number of routes; anything unmatched is labelled "<unmatched>".
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            http_requests_in_flight.dec()
+            route = scope.get("route")
+            path = route.path if route is not None else "<unmatched>"
+            method = scope["method"]
+            http_request_duration.labels(method, path).observe(elapsed)
+            http_responses.labels(method, path, status).inc()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._metrics_started
+    head = statement.lstrip()[:6].split(None, 1)
+    operation = head[0].upper() if head else ""
+    if operation not in SQL_OPERATIONS:
+        operation = "OTHER"
+    db_query_duration.labels(operation).observe(elapsed)
+    rows = cursor.rowcount
+    if rows < 0:
+        # the asyncpg adapter buffers a plain SELECT's rows before returning
+        rows = len(getattr(cursor, "_rows", ()))
+    db_query_rows.labels(operation).inc(rows)
+
+
+def instrument_engine(engine) -> None:
+    """Time every statement the engine's connections execute"""
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def instrument_dal(cls):
+    """Class decorator timing every public coroutine method of a DAL"""
+    for name, method in list(vars(cls).items()):
+        if name.startswith("_") or not inspect.iscoroutinefunction(method):
+            continue
+        setattr(cls, name, _timed(method, dal_call_duration.labels(cls.__name__, name)))
+    return cls
+
+
+def _timed(method, histogram):
+    @functools.wraps(method)
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await method(*args, **kwargs)
+        finally:
+            histogram.observe(time.perf_counter() - started)
+
+    return wrapper
@@ -0,0 +1,26 @@
+import base64
+import binascii
+import json
+from typing import Any, List
+
+
+class InvalidCursor(ValueError):
+    """A pagination cursor that this API did not hand out"""
+
+
+def encode_cursor(*values: Any) -> str:
+    """Opaque keyset cursor holding the sort key of the last row returned"""
+    raw = json.dumps(values, default=str, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    """Values packed by encode_cursor, raising InvalidCursor if malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (binascii.Error, ValueError) as err:
+        raise InvalidCursor("Malformed cursor.") from err
+    if not isinstance(values, list) or len(values) != size:
+        raise InvalidCursor("Malformed cursor.")
+    return values
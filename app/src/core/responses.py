@@ -0,0 +1,16 @@
+from fastapi.responses import ORJSONResponse
+
+
+class TrustedJSONResponse(ORJSONResponse):
+    """JSON rendered by orjson straight from rows the DAL produced.
+
+    A handler returning a Response is answered with it as is: FastAPI does
+    not validate the value against the route's response_model, does not
+    copy it through jsonable_encoder and does not build model instances on
+    the way. orjson writes dicts, lists, tuples, UUIDs, dates, times and
+    datetimes in the same form those steps would have produced.
+
+    Only for content whose shape the code guarantees; the route's
+    response_model then just documents it. Anything that needs coercion or
+    comes from a client goes through the model.
+    """
@@ -1,4 +1,6 @@
-from decouple import config
+import os
+
+from decouple import Csv, config
 
 
 class EnvironmentSettings:
@@ -8,6 +10,70 @@ class EnvironmentSettings:
         self.port = self.load_port()
         self.algorithm = self.load_algorithm()
         self.token_life = self.load_token_expiry()
+        self.hasher_pool_kind = self.load_hasher_pool_kind()
+        self.hasher_max_workers = self.load_hasher_max_workers()
+        self.hasher_queue_size = self.load_hasher_queue_size()
+        self.hasher_retry_after = self.load_hasher_retry_after()
+        self.user_cache_max_entries = self.load_user_cache_max_entries()
+        self.user_cache_ttl = self.load_user_cache_ttl()
+        self.jwt_backend = self.load_jwt_backend()
+        self.jwt_cache_max_entries = self.load_jwt_cache_max_entries()
+        self.db_pool_size = self.load_db_pool_size()
+        self.db_max_overflow = self.load_db_max_overflow()
+        self.db_pool_timeout = self.load_db_pool_timeout()
+        self.db_pool_recycle = self.load_db_pool_recycle()
+        self.db_pool_pre_ping = self.load_db_pool_pre_ping()
+        self.db_echo = self.load_db_echo()
+        self.student_copy_chunk_size = self.load_student_copy_chunk_size()
+        self.student_import_max_errors = self.load_student_import_max_errors()
+        self.attendance_queue_size = self.load_attendance_queue_size()
+        self.attendance_batch_size = self.load_attendance_batch_size()
+        self.attendance_flush_interval = self.load_attendance_flush_interval()
+        self.attendance_retry_after = self.load_attendance_retry_after()
+        self.attendance_write_retries = self.load_attendance_write_retries()
+        self.attendance_write_backoff = self.load_attendance_write_backoff()
+        self.student_index_refresh_interval = self.load_student_index_refresh_interval()
+        self.student_index_refresh_overlap = self.load_student_index_refresh_overlap()
+        self.student_index_full_reload_interval = (
+            self.load_student_index_full_reload_interval()
+        )
+        self.media_root = self.load_media_root()
+        self.recognition_max_workers = self.load_recognition_max_workers()
+        self.recognition_queue_size = self.load_recognition_queue_size()
+        self.recognition_tolerance = self.load_recognition_tolerance()
+        self.encoding_store_dir = self.load_encoding_store_dir()
+        self.recognition_batch_size = self.load_recognition_batch_size()
+        self.recognition_batch_window = self.load_recognition_batch_window()
+        self.recognition_timeout = self.load_recognition_timeout()
+        self.face_matcher = self.load_face_matcher()
+        self.face_matcher_lists = self.load_face_matcher_lists()
+        self.face_matcher_nprobe = self.load_face_matcher_nprobe()
+        self.face_matcher_ef = self.load_face_matcher_ef()
+        self.recognition_refresh_interval = self.load_recognition_refresh_interval()
+        self.student_photo_dir = self.load_student_photo_dir()
+        self.student_photo_max_bytes = self.load_student_photo_max_bytes()
+        self.photo_encoding_side = self.load_photo_encoding_side()
+        self.photo_thumbnail_side = self.load_photo_thumbnail_side()
+        self.recognition_probe_max_side = self.load_recognition_probe_max_side()
+        self.attendance_export_chunk_size = self.load_attendance_export_chunk_size()
+        self.attendance_partition_months_ahead = (
+            self.load_attendance_partition_months_ahead()
+        )
+        self.attendance_retention_months = self.load_attendance_retention_months()
+        self.attendance_retention_action = self.load_attendance_retention_action()
+        self.attendance_archive_schema = self.load_attendance_archive_schema()
+        self.attendance_partition_check_interval = (
+            self.load_attendance_partition_check_interval()
+        )
+        self.database_replicas = self.load_database_replicas()
+        self.db_replica_max_lag = self.load_db_replica_max_lag()
+        self.db_replica_check_interval = self.load_db_replica_check_interval()
+        self.redis_url = self.load_redis_url()
+        self.cache_prefix = self.load_cache_prefix()
+        self.user_cache_shared_ttl = self.load_user_cache_shared_ttl()
+        self.web_workers = self.load_web_workers()
+        self.web_graceful_timeout = self.load_web_graceful_timeout()
+        self.web_reload_interval = self.load_web_reload_interval()
 
     def load_database(self):
         return config("DATABASE_URL_FASTAPI")
@@ -24,5 +90,184 @@ class EnvironmentSettings:
     def load_token_expiry(self):
         return int(config("ACCESS_TOKEN_EXPIRE_MINUTES"))
 
+    def load_hasher_pool_kind(self):
+        return config("HASHER_POOL_KIND", default="thread")
+
+    def load_hasher_max_workers(self):
+        return config("HASHER_MAX_WORKERS", default=4, cast=int)
+
+    def load_hasher_queue_size(self):
+        return config("HASHER_QUEUE_SIZE", default=64, cast=int)
+
+    def load_hasher_retry_after(self):
+        return config("HASHER_RETRY_AFTER_SECONDS", default=1, cast=int)
+
+    def load_user_cache_max_entries(self):
+        return config("USER_CACHE_MAX_ENTRIES", default=10000, cast=int)
+
+    def load_user_cache_ttl(self):
+        return config("USER_CACHE_TTL_SECONDS", default=60, cast=float)
+
+    def load_jwt_backend(self):
+        return config("JWT_BACKEND", default="jose")
+
+    def load_jwt_cache_max_entries(self):
+        return config("JWT_CACHE_MAX_ENTRIES", default=10000, cast=int)
+
+    def load_db_pool_size(self):
+        return config("DB_POOL_SIZE", default=5, cast=int)
+
+    def load_db_max_overflow(self):
+        return config("DB_MAX_OVERFLOW", default=10, cast=int)
+
+    def load_db_pool_timeout(self):
+        return config("DB_POOL_TIMEOUT", default=30, cast=float)
+
+    def load_db_pool_recycle(self):
+        return config("DB_POOL_RECYCLE", default=1800, cast=int)
+
+    def load_db_pool_pre_ping(self):
+        return config("DB_POOL_PRE_PING", default=True, cast=bool)
+
+    def load_db_echo(self):
+        # "false" keeps statements out of the log, "true" logs them at INFO
+        # and "debug" also logs result rows
+        echo = config("DB_ECHO", default="false").lower()
+        if echo == "debug":
+            return echo
+        return echo in ("true", "1", "yes", "on")
+
+    def load_student_copy_chunk_size(self):
+        return config("STUDENT_COPY_CHUNK_SIZE", default=5000, cast=int)
+
+    def load_student_import_max_errors(self):
+        return config("STUDENT_IMPORT_MAX_ERRORS", default=1000, cast=int)
+
+    def load_attendance_queue_size(self):
+        return config("ATTENDANCE_QUEUE_SIZE", default=10000, cast=int)
+
+    def load_attendance_batch_size(self):
+        return config("ATTENDANCE_BATCH_SIZE", default=500, cast=int)
+
+    def load_attendance_flush_interval(self):
+        return config("ATTENDANCE_FLUSH_INTERVAL_SECONDS", default=0.5, cast=float)
+
+    def load_attendance_retry_after(self):
+        return config("ATTENDANCE_RETRY_AFTER_SECONDS", default=1, cast=int)
+
+    def load_attendance_write_retries(self):
+        return config("ATTENDANCE_WRITE_RETRIES", default=5, cast=int)
+
+    def load_attendance_write_backoff(self):
+        return config("ATTENDANCE_WRITE_BACKOFF_SECONDS", default=0.2, cast=float)
+
+    def load_student_index_refresh_interval(self):
+        return config("STUDENT_INDEX_REFRESH_SECONDS", default=30, cast=float)
+
+    def load_student_index_refresh_overlap(self):
+        return config("STUDENT_INDEX_REFRESH_OVERLAP_SECONDS", default=600, cast=float)
+
+    def load_student_index_full_reload_interval(self):
+        return config("STUDENT_INDEX_FULL_RELOAD_SECONDS", default=3600, cast=float)
+
+    def load_media_root(self):
+        return config("MEDIA_ROOT", default="static")
+
+    def load_recognition_max_workers(self):
+        return config("RECOGNITION_MAX_WORKERS", default=os.cpu_count() or 1, cast=int)
+
+    def load_recognition_queue_size(self):
+        return config("RECOGNITION_QUEUE_SIZE", default=16, cast=int)
+
+    def load_recognition_tolerance(self):
+        return config("RECOGNITION_TOLERANCE", default=0.6, cast=float)
+
+    def load_encoding_store_dir(self):
+        return config("ENCODING_STORE_DIR", default="encodings")
+
+    def load_recognition_batch_size(self):
+        return config("RECOGNITION_BATCH_SIZE", default=8, cast=int)
+
+    def load_recognition_batch_window(self):
+        return config("RECOGNITION_BATCH_WINDOW_MS", default=10, cast=float) / 1000
+
+    def load_recognition_timeout(self):
+        return config("RECOGNITION_TIMEOUT_SECONDS", default=10, cast=float)
+
+    def load_face_matcher(self):
+        return config("FACE_MATCHER", default="exact")
+
+    def load_face_matcher_lists(self):
+        return config("FACE_MATCHER_LISTS", default=0, cast=int)
+
+    def load_face_matcher_nprobe(self):
+        return config("FACE_MATCHER_NPROBE", default=8, cast=int)
+
+    def load_face_matcher_ef(self):
+        return config("FACE_MATCHER_EF", default=64, cast=int)
+
+    def load_recognition_refresh_interval(self):
+        return config("RECOGNITION_REFRESH_SECONDS", default=300, cast=float)
+
+    def load_student_photo_dir(self):
+        return config("STUDENT_PHOTO_DIR", default="students")
+
+    def load_student_photo_max_bytes(self):
+        return config("STUDENT_PHOTO_MAX_BYTES", default=10 * 1024 * 1024, cast=int)
+
+    def load_photo_encoding_side(self):
+        return config("PHOTO_ENCODING_SIDE", default=800, cast=int)
+
+    def load_photo_thumbnail_side(self):
+        return config("PHOTO_THUMBNAIL_SIDE", default=160, cast=int)
+
+    def load_recognition_probe_max_side(self):
+        return config("RECOGNITION_PROBE_MAX_SIDE", default=1600, cast=int)
+
+    def load_attendance_export_chunk_size(self):
+        return config("ATTENDANCE_EXPORT_CHUNK_SIZE", default=5000, cast=int)
+
+    def load_attendance_partition_months_ahead(self):
+        return config("ATTENDANCE_PARTITION_MONTHS_AHEAD", default=3, cast=int)
+
+    def load_attendance_retention_months(self):
+        return config("ATTENDANCE_RETENTION_MONTHS", default=0, cast=int)
+
+    def load_attendance_retention_action(self):
+        return config("ATTENDANCE_RETENTION_ACTION", default="archive")
+
+    def load_attendance_archive_schema(self):
+        return config("ATTENDANCE_ARCHIVE_SCHEMA", default="archive")
+
+    def load_attendance_partition_check_interval(self):
+        return config("ATTENDANCE_PARTITION_CHECK_SECONDS", default=3600, cast=float)
+
+    def load_database_replicas(self):
+        return config("DATABASE_REPLICA_URLS", default="", cast=Csv())
+
+    def load_db_replica_max_lag(self):
+        return config("DB_REPLICA_MAX_LAG_SECONDS", default=5, cast=float)
+
+    def load_db_replica_check_interval(self):
+        return config("DB_REPLICA_CHECK_SECONDS", default=5, cast=float)
+
+    def load_redis_url(self):
+        return config("REDIS_URL", default="")
+
+    def load_cache_prefix(self):
+        return config("CACHE_PREFIX", default="attendance")
+
+    def load_user_cache_shared_ttl(self):
+        return config("USER_CACHE_SHARED_TTL", default=300, cast=float)
+
+    def load_web_workers(self):
+        return config("WEB_WORKERS", default=0, cast=int)
+
+    def load_web_graceful_timeout(self):
+        return config("WEB_GRACEFUL_TIMEOUT", default=30, cast=float)
+
+    def load_web_reload_interval(self):
+        return config("WEB_RELOAD_SECONDS", default=3600, cast=float)
+
 
 variables = EnvironmentSettings()
@@ -0,0 +1,374 @@
+import asyncio
+import functools
+import json
+import time
+import uuid
+from collections import defaultdict
+from logging import getLogger
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Set
+
+from sqlalchemy import event
+from src.core.cache import LRUCache
+from src.core.settings import variables
+
+logger = getLogger(__name__)
+
+# how long a generation outlives the entries stored under it; a load slower
+# than this is not stored, so no entry outlives its generation
+GENERATION_MARGIN = 60
+
+
+class InMemoryRedis:
+    """Stand-in for the slice of redis.asyncio.Redis the shared cache uses.
+
+    Keys, expiry and pub/sub live in this process, so it behaves like a
+    Redis server only one worker talks to. For exercising the cache without
+    a server; never used in place of one, since every worker would get its
+    own and miss the others' invalidations.
+    """
+
+    def __init__(self):
+        self._data: Dict[str, tuple] = {}
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = defaultdict(set)
+
+    async def get(self, key: str) -> Optional[str]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._data[key]
+            return None
+        return value
+
+    async def mget(self, *keys: str) -> List[Optional[str]]:
+        return [await self.get(key) for key in keys]
+
+    async def set(self, key: str, value: str, px: Optional[int] = None) -> bool:
+        expires_at = None if px is None else time.monotonic() + px / 1000
+        self._data[key] = (expires_at, value)
+        return True
+
+    async def delete(self, *keys: str) -> int:
+        return sum(self._data.pop(key, None) is not None for key in keys)
+
+    async def publish(self, channel: str, message: str) -> int:
+        queues = self._subscribers.get(channel, ())
+        for queue in queues:
+            queue.put_nowait({"type": "message", "channel": channel, "data": message})
+        return len(queues)
+
+    def pubsub(self) -> "_InMemoryPubSub":
+        return _InMemoryPubSub(self._subscribers)
+
+    async def close(self) -> None:
+        self._data.clear()
+
+
+class _InMemoryPubSub:
+    def __init__(self, subscribers: Dict[str, Set[asyncio.Queue]]):
+        self._subscribers = subscribers
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._channels: List[str] = []
+
+    async def subscribe(self, *channels: str) -> None:
+        for channel in channels:
+            self._subscribers[channel].add(self._queue)
+            self._channels.append(channel)
+            self._queue.put_nowait(
+                {"type": "subscribe", "channel": channel, "data": len(self._channels)}
+            )
+
+    async def listen(self):
+        while True:
+            yield await self._queue.get()
+
+    async def close(self) -> None:
+        for channel in self._channels:
+            self._subscribers[channel].discard(self._queue)
+        self._channels.clear()
+
+
+def connect_redis(url: str):
+    """Client for ``url``, None when it is empty and caches stay local"""
+    if not url:
+        return None
+    from redis import asyncio as aioredis
+
+    return aioredis.from_url(url, decode_responses=True)
+
+
+class InvalidationBus:
+    """Pub/sub channel over which workers tell each other to drop entries.
+
+    Messages published while a worker is disconnected are lost, so after
+    every (re)subscription the worker clears its local tier and starts over
+    from Redis. Without Redis there is no channel and nothing to publish.
+    """
+
+    def __init__(self, redis, channel: str, prefix: str):
+        self.redis = redis
+        self.channel = channel
+        self.prefix = prefix
+        self.caches: Dict[str, "SharedCache"] = {}
+        self.published = 0
+        self.received = 0
+        self.reconnects = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def register(self, cache: "SharedCache") -> None:
+        self.caches[cache.namespace] = cache
+
+    async def publish(self, namespace: str, keys: List[str]) -> None:
+        if self.redis is None:
+            return
+        await self.redis.publish(self.channel, json.dumps([namespace, keys]))
+        self.published += 1
+
+    def start(self) -> None:
+        if self.redis is not None and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "backend": None if self.redis is None else type(self.redis).__name__,
+            "channel": self.channel,
+            "published": self.published,
+            "received": self.received,
+            "reconnects": self.reconnects,
+            "caches": {name: cache.stats() for name, cache in self.caches.items()},
+        }
+
+    def _deliver(self, data: str) -> None:
+        namespace, keys = json.loads(data)
+        cache = self.caches.get(namespace)
+        if cache is not None:
+            cache.forget(keys)
+        self.received += 1
+
+    async def _listen(self) -> None:
+        while True:
+            pubsub = self.redis.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                for cache in self.caches.values():
+                    cache.local.clear()
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        self._deliver(message["data"])
+            except Exception:
+                logger.exception("Cache invalidation channel failed")
+            finally:
+                await pubsub.close()
+            self.reconnects += 1
+            await asyncio.sleep(1)
+
+
+class SharedCache:
+    """Two-tier cache: a short-lived per-worker LRU in front of Redis.
+
+    ``get_or_load`` looks in the local tier, then in Redis, then calls the
+    loader and fills both. Concurrent misses for one key in a worker share a
+    single load. ``invalidate`` drops the key from Redis and, through the
+    bus, from the local tier of every worker. None is never cached.
+
+    Values cross Redis as text made by ``encode`` and read back by
+    ``decode``; JSON by default. Redis errors are counted and the cache
+    degrades to the local tier and the loader. Without Redis (an empty
+    REDIS_URL) only the local tier is used and ``local_ttl`` bounds how
+    long other workers keep an invalidated entry.
+
+    Each key has a generation in Redis that ``invalidate`` replaces with a
+    fresh token, and an entry is stored with the generation read before its
+    load. Readers only take an entry of the current generation, so a load
+    that read the row before a commit, or from a lagging replica, and lands
+    after the invalidation is never served. A generation expires
+    ``GENERATION_MARGIN`` seconds after the entries stored under it.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        bus: InvalidationBus,
+        max_entries: int,
+        ttl: float,
+        local_ttl: float,
+        encode: Callable[[Any], str] = json.dumps,
+        decode: Callable[[str], Any] = json.loads,
+    ):
+        self.namespace = namespace
+        self.bus = bus
+        self.local = LRUCache(max_entries=max_entries, ttl=local_ttl)
+        self.ttl = ttl
+        self.encode = encode
+        self.decode = decode
+        self.shared_hits = 0
+        self.shared_misses = 0
+        self.shared_errors = 0
+        self.loads = 0
+        self.coalesced = 0
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._stale: Set[asyncio.Task] = set()
+        self._evictions: Set[asyncio.Task] = set()
+        bus.register(self)
+
+    async def get_or_load(
+        self, key: Hashable, loader: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        key = str(key)
+        value = self.local.get(key)
+        if value is not None:
+            return value
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fill(key, loader))
+            self._inflight[key] = task
+            task.add_done_callback(functools.partial(self._landed, key))
+        else:
+            self.coalesced += 1
+        # a caller going away must not cancel the load the others wait on
+        return await asyncio.shield(task)
+
+    async def invalidate(self, *keys: Hashable) -> None:
+        keys = [str(key) for key in keys]
+        self.forget(keys)
+        if self.bus.redis is None:
+            return
+        try:
+            for key in keys:
+                await self.bus.redis.set(
+                    self._generation_key(key),
+                    uuid.uuid4().hex,
+                    px=int((self.ttl + GENERATION_MARGIN) * 1000),
+                )
+            await self.bus.redis.delete(*(self._shared_key(key) for key in keys))
+            await self.bus.publish(self.namespace, keys)
+        except Exception:
+            self.shared_errors += 1
+            logger.exception("Invalidating %s entries failed", self.namespace)
+
+    def invalidate_on_commit(self, session, *keys: Hashable) -> None:
+        """Invalidate once ``session`` commits, when readers can see the change.
+
+        Invalidating earlier lets another worker cache the row as it was
+        before the commit.
+        """
+
+        def evict(_session) -> None:
+            task = asyncio.get_running_loop().create_task(self.invalidate(*keys))
+            self._evictions.add(task)
+            task.add_done_callback(self._evictions.discard)
+
+        event.listen(session.sync_session, "after_commit", evict, once=True)
+
+    def forget(self, keys: List[str]) -> None:
+        """Drop keys from this worker's tier, including loads in flight"""
+        for key in keys:
+            self.local.pop(key)
+            task = self._inflight.pop(key, None)
+            if task is not None:
+                self._stale.add(task)
+
+    def stats(self) -> dict:
+        return {
+            "local": self.local.stats(),
+            "ttl_seconds": self.ttl,
+            "shared_hits": self.shared_hits,
+            "shared_misses": self.shared_misses,
+            "shared_errors": self.shared_errors,
+            "loads": self.loads,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._inflight),
+        }
+
+    def _shared_key(self, key: str) -> str:
+        return f"{self.bus.prefix}:{self.namespace}:{key}"
+
+    def _generation_key(self, key: str) -> str:
+        return f"{self.bus.prefix}:{self.namespace}:generation:{key}"
+
+    def _landed(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        self._stale.discard(task)
+
+    async def _fill(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        task = asyncio.current_task()
+        raw = generation = None
+        if self.bus.redis is not None:
+            try:
+                raw, generation = await self.bus.redis.mget(
+                    self._shared_key(key), self._generation_key(key)
+                )
+                generation = generation or "0"
+            except Exception:
+                self.shared_errors += 1
+        entry = None if raw is None else raw.split("\n", 1)
+        if entry is not None and entry[0] == generation:
+            self.shared_hits += 1
+            value = self.decode(entry[1])
+        else:
+            if self.bus.redis is not None:
+                self.shared_misses += 1
+            value = await self._load(key, loader, generation)
+            if value is None:
+                return value
+        # invalidated while loading: hand the value to the waiters, keep it out
+        if task not in self._stale:
+            self.local.set(key, value)
+        return value
+
+    async def _load(
+        self, key: str, loader: Callable[[], Awaitable[Any]], generation: Optional[str]
+    ) -> Any:
+        """Call the loader and store its value under ``generation``"""
+        self.loads += 1
+        started = time.monotonic()
+        value = await loader()
+        # without Redis the generation is unknown, so nothing is kept
+        if (
+            value is None
+            or generation is None
+            or time.monotonic() - started > GENERATION_MARGIN
+        ):
+            return value
+        try:
+            await self.bus.redis.set(
+                self._shared_key(key),
+                f"{generation}\n{self.encode(value)}",
+                px=int(self.ttl * 1000),
+            )
+        except Exception:
+            self.shared_errors += 1
+        return value
+
+
+def cached(cache: SharedCache, key: Callable[..., Hashable]):
+    """Serve an async function through ``cache``, keyed by ``key(*args)``"""
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            return await cache.get_or_load(
+                key(*args, **kwargs), lambda: func(*args, **kwargs)
+            )
+
+        return wrapper
+
+    return decorator
+
+
+redis = connect_redis(variables.redis_url)
+
+invalidation_bus = InvalidationBus(
+    redis, channel=f"{variables.cache_prefix}:invalidate", prefix=variables.cache_prefix
+)
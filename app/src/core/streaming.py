@@ -0,0 +1,385 @@
+import codecs
+import csv
+import io
+import json
+import re
+import zipfile
+import zlib
+from collections import deque
+from datetime import date, time
+from typing import (
+    AsyncIterator,
+    Deque,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+from xml.sax.saxutils import escape
+
+
+class RowError(ValueError):
+    """A single malformed line of an uploaded file"""
+
+
+# longest line, and longest multi-line CSV record, an upload may hold
+MAX_LINE_CHARS = 64 * 1024
+# CSV lines are handed to the parser in batches of about this size
+CSV_BATCH_CHARS = 16 * 1024
+
+
+async def aiter_lines(
+    chunks: AsyncIterator[bytes], max_chars: int = MAX_LINE_CHARS
+) -> AsyncIterator[Union[str, RowError]]:
+    """Split a byte stream into decoded lines without buffering the body.
+
+    A line longer than ``max_chars`` is skipped up to its end and a RowError
+    takes its place, so a body without line breaks costs no more memory.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    # the rest of an overlong line still has to be read past
+    skipping = False
+    async for chunk in chunks:
+        *lines, pending = (pending + decoder.decode(chunk)).split("\n")
+        for line in lines:
+            if skipping:
+                skipping = False
+            elif len(line) > max_chars:
+                yield RowError(f"Line longer than {max_chars} characters.")
+            else:
+                yield line.rstrip("\r")
+        if len(pending) > max_chars:
+            if not skipping:
+                yield RowError(f"Line longer than {max_chars} characters.")
+            pending, skipping = "", True
+    pending += decoder.decode(b"", final=True)
+    if pending and not skipping:
+        yield pending.rstrip("\r")
+
+
+class _NeedMore(Exception):
+    """Raised through csv.reader when the lines read so far end mid-record"""
+
+
+class _LineFeed:
+    """Lines handed to a csv.reader as they arrive.
+
+    Running out raises _NeedMore out of the reader, which starts every
+    record afresh, so the lines of the unfinished record are put back and
+    parsed again once more have arrived.
+    """
+
+    def __init__(self):
+        self.lines: Deque[Tuple[int, str]] = deque()
+        self.taken: List[Tuple[int, str]] = []
+        self.chars = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        if not self.lines:
+            raise _NeedMore
+        line = self.lines.popleft()
+        self.taken.append(line)
+        return line[1]
+
+    def append(self, line_no: int, line: str) -> None:
+        self.lines.append((line_no, line + "\n"))
+        self.chars += len(line) + 1
+
+    def record_line(self) -> int:
+        """Line the record parsed last, or the one still open, starts on"""
+        return (self.taken or self.lines)[0][0]
+
+    def done(self) -> None:
+        self.chars -= sum(len(line) for _, line in self.taken)
+        self.taken = []
+
+    def rewind(self) -> None:
+        self.lines.extendleft(reversed(self.taken))
+        self.taken = []
+
+    def clear(self) -> None:
+        self.lines.clear()
+        self.taken = []
+        self.chars = 0
+
+
+def _unterminated(first: int, last: int) -> RowError:
+    return RowError(f"Unterminated quoted field, lines {first}-{last} skipped.")
+
+
+def _parse_csv(
+    reader, feed: _LineFeed
+) -> Iterable[Tuple[int, Union[List[str], RowError]]]:
+    """(first line number, values) of the complete records in ``feed``"""
+    while True:
+        try:
+            values = next(reader)
+        except _NeedMore:
+            feed.rewind()
+            return
+        except csv.Error as err:
+            values = RowError(str(err))
+        yield feed.record_line(), values
+        feed.done()
+
+
+async def _aiter_csv_records(
+    chunks: AsyncIterator[bytes], max_chars: int
+) -> AsyncIterator[Tuple[int, Union[List[str], RowError]]]:
+    """(first line number, values) of each CSV record.
+
+    csv.reader does the parsing, quoted fields spanning lines included. A
+    record still open after ``max_chars`` is reported as one error and
+    dropped, and reading resumes at the next line. Lines are parsed in
+    batches, and an open record only again once its text has doubled, so a
+    long one costs linear time.
+    """
+    feed = _LineFeed()
+    reader = csv.reader(feed)
+    retry_at = line_no = 0
+    async for line in aiter_lines(chunks, max_chars):
+        line_no += 1
+        if isinstance(line, RowError):
+            # an overlong line also ends the record it belongs to
+            if feed.lines:
+                yield feed.record_line(), _unterminated(feed.record_line(), line_no)
+                feed.clear()
+            else:
+                yield line_no, line
+            continue
+        feed.append(line_no, line)
+        if feed.chars < retry_at and feed.chars <= max_chars:
+            continue
+        for record in _parse_csv(reader, feed):
+            yield record
+        if feed.chars > max_chars:
+            yield feed.record_line(), _unterminated(feed.record_line(), line_no)
+            feed.clear()
+        retry_at = max(2 * feed.chars, CSV_BATCH_CHARS)
+    for record in _parse_csv(reader, feed):
+        yield record
+    if feed.lines:
+        yield feed.record_line(), RowError("Unterminated quoted field.")
+
+
+async def aiter_csv_rows(
+    chunks: AsyncIterator[bytes], max_record_chars: int = MAX_LINE_CHARS
+) -> AsyncIterator[Tuple[int, Union[dict, RowError]]]:
+    """(line number, row) pairs of a CSV body with a header line.
+
+    Quoted fields may span lines, up to ``max_record_chars`` per record.
+    Blank lines are skipped and empty cells are left out of the row.
+    """
+    header = None
+    async for record_line, values in _aiter_csv_records(chunks, max_record_chars):
+        if isinstance(values, RowError):
+            yield record_line, values
+            continue
+        if len(values) < 2 and not "".join(values).strip():
+            continue
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        if len(values) != len(header):
+            yield record_line, RowError(
+                f"Expected {len(header)} fields, got {len(values)}."
+            )
+            continue
+        # empty cells count as absent so optional columns fall back to defaults
+        yield record_line, {
+            name: value for name, value in zip(header, values) if value != ""
+        }
+
+
+async def aiter_ndjson_rows(
+    chunks: AsyncIterator[bytes], max_chars: int = MAX_LINE_CHARS
+) -> AsyncIterator[Tuple[int, Union[dict, RowError]]]:
+    """(line number, row) pairs of a newline-delimited JSON body"""
+    line_no = 0
+    async for line in aiter_lines(chunks, max_chars):
+        line_no += 1
+        if isinstance(line, RowError):
+            yield line_no, line
+            continue
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as err:
+            yield line_no, RowError(f"Invalid JSON: {err}")
+            continue
+        if not isinstance(row, dict):
+            yield line_no, RowError("Expected a JSON object.")
+            continue
+        yield line_no, row
+
+
+class CsvEncoder:
+    """Encodes chunks of rows as CSV, header first"""
+
+    media_type = "text/csv"
+    extension = "csv"
+
+    def __init__(self, header: Sequence[str]):
+        self.header = header
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer)
+
+    def start(self) -> bytes:
+        return self.encode([self.header])
+
+    def encode(self, rows: Iterable[Sequence]) -> bytes:
+        self._writer.writerows(rows)
+        text = self._buffer.getvalue()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return text.encode()
+
+    def finish(self) -> bytes:
+        return b""
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only, unseekable file that hands back what was written to it"""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data, self._chunks = b"".join(self._chunks), []
+        return data
+
+
+_XLSX_PARTS = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" '
+        'ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/'
+        'vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/'
+        'vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        "</Types>"
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/'
+        'relationships"><Relationship Id="rId1" Type="http://schemas.'
+        'openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/></Relationships>'
+    ),
+    "xl/workbook.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="{sheet_name}" sheetId="1" r:id="rId1"/></sheets>'
+        "</workbook>"
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/'
+        'relationships"><Relationship Id="rId1" Type="http://schemas.'
+        'openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/></Relationships>'
+    ),
+}
+
+# characters XML 1.0 cannot carry at all
+_XML_ILLEGAL = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+def _xlsx_cell(value) -> str:
+    if value is None:
+        return "<c/>"
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return f"<c><v>{value}</v></c>"
+    if isinstance(value, (date, time)):
+        value = value.isoformat()
+    text = escape(_XML_ILLEGAL.sub("", str(value)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+class XlsxEncoder:
+    """Encodes chunks of rows as a single-sheet XLSX workbook, streamed.
+
+    The workbook is a zip written to an unseekable sink, so every entry is
+    emitted as soon as it is compressed and nothing but the current chunk is
+    held in memory. Cells are inline strings and plain numbers; dates are
+    written as ISO 8601 text.
+    """
+
+    media_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    extension = "xlsx"
+
+    def __init__(self, header: Sequence[str], sheet_name: str = "Sheet1"):
+        self.header = header
+        self.sheet_name = sheet_name
+        self._sink = _ChunkSink()
+        self._zip: Optional[zipfile.ZipFile] = None
+        self._sheet = None
+
+    def start(self) -> bytes:
+        self._zip = zipfile.ZipFile(self._sink, "w", zipfile.ZIP_DEFLATED)
+        for name, content in _XLSX_PARTS.items():
+            self._zip.writestr(
+                name, content.replace("{sheet_name}", escape(self.sheet_name))
+            )
+        self._sheet = self._zip.open("xl/worksheets/sheet1.xml", "w", force_zip64=True)
+        self._sheet.write(
+            b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/'
+            b'2006/main"><sheetData>'
+        )
+        return self.encode([self.header])
+
+    def encode(self, rows: Iterable[Sequence]) -> bytes:
+        self._sheet.write(
+            "".join(
+                "<row>" + "".join(_xlsx_cell(value) for value in row) + "</row>"
+                for row in rows
+            ).encode()
+        )
+        return self._sink.drain()
+
+    def finish(self) -> bytes:
+        self._sheet.write(b"</sheetData></worksheet>")
+        self._sheet.close()
+        self._zip.close()
+        return self._sink.drain()
+
+
+class GzipEncoder:
+    """Gzips the output of another encoder on the fly"""
+
+    def __init__(self, encoder):
+        self.encoder = encoder
+        self.media_type = encoder.media_type
+        self.extension = encoder.extension
+        self._compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+
+    def start(self) -> bytes:
+        return self._compressor.compress(self.encoder.start())
+
+    def encode(self, rows: Iterable[Sequence]) -> bytes:
+        return self._compressor.compress(self.encoder.encode(rows))
+
+    def finish(self) -> bytes:
+        return (
+            self._compressor.compress(self.encoder.finish()) + self._compressor.flush()
+        )
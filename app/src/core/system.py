@@ -0,0 +1,301 @@
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from src.core.metrics import executor_call_duration, registry
+
+
+class ServiceOverloadedError(Exception):
+    """Raised when a bounded executor has no room for another call"""
+
+    def __init__(self, name: str, retry_after: int):
+        self.name = name
+        self.retry_after = retry_after
+        super().__init__(f"{name} is saturated, retry in {retry_after}s.")
+
+
+class LatencyStats:
+    """Call count and latency figures for a single operation"""
+
+    __slots__ = ("calls", "total", "max")
+
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, elapsed: float) -> None:
+        self.calls += 1
+        self.total += elapsed
+        if elapsed > self.max:
+            self.max = elapsed
+
+    def as_dict(self) -> dict:
+        avg = self.total / self.calls if self.calls else 0.0
+        return {
+            "calls": self.calls,
+            "avg_ms": round(avg * 1000, 3),
+            "max_ms": round(self.max * 1000, 3),
+        }
+
+
+class RateMeter:
+    """Events per second over the last ``window`` seconds, in 1s buckets"""
+
+    __slots__ = ("window", "_seconds", "_counts")
+
+    def __init__(self, window: int = 60):
+        self.window = window
+        self._seconds = [-1] * window
+        self._counts = [0] * window
+
+    def add(self, count: int = 1) -> None:
+        second = int(time.monotonic())
+        slot = second % self.window
+        if self._seconds[slot] != second:
+            self._seconds[slot] = second
+            self._counts[slot] = 0
+        self._counts[slot] += count
+
+    def rate(self) -> float:
+        now = int(time.monotonic())
+        return (
+            sum(
+                count
+                for second, count in zip(self._seconds, self._counts)
+                if now - second < self.window
+            )
+            / self.window
+        )
+
+
+class BoundedExecutor:
+    """Runs blocking callables off the event loop with a bounded backlog.
+
+    At most ``max_workers`` calls run at once and ``queue_size`` more may wait
+    for a worker; anything beyond that is rejected with ServiceOverloadedError
+    instead of piling up behind the pool. A process pool imports the
+    ``preload`` modules once in its forkserver, so every worker forked from
+    it starts with them loaded.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        kind: str = "thread",
+        max_workers: int = 4,
+        queue_size: int = 64,
+        retry_after: int = 1,
+        preload: Sequence[str] = (),
+    ):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown executor kind: {kind}")
+        self.name = name
+        self.kind = kind
+        self.max_workers = max_workers
+        self.capacity = max_workers + queue_size
+        self.retry_after = retry_after
+        self.preload = list(preload)
+        self.in_flight = 0
+        self.rejected = 0
+        self._executor: Optional[Executor] = None
+        self._stats: Dict[str, LatencyStats] = {}
+        self._histograms: Dict[str, Any] = {}
+        registry.collector(self._metrics)
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                # forkserver children never inherit the event loop or its threads
+                context = multiprocessing.get_context("forkserver")
+                if self.preload:
+                    context.set_forkserver_preload(self.preload)
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers, mp_context=context
+                )
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix=self.name
+                )
+        return self._executor
+
+    async def run(self, label: str, func: Callable, *args):
+        if self.in_flight >= self.capacity:
+            self.rejected += 1
+            raise ServiceOverloadedError(self.name, self.retry_after)
+        stats = self._stats.get(label)
+        if stats is None:
+            stats = self._stats[label] = LatencyStats()
+            self._histograms[label] = executor_call_duration.labels(self.name, label)
+        histogram = self._histograms[label]
+        self.in_flight += 1
+        started = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, partial(func, *args))
+        finally:
+            self.in_flight -= 1
+            elapsed = time.perf_counter() - started
+            stats.observe(elapsed)
+            histogram.observe(elapsed)
+
+    async def warm_up(self, func: Callable) -> None:
+        """Start every worker ahead of the first real call by running ``func``"""
+        await asyncio.gather(
+            *(self.run("warm_up", func) for _ in range(self.max_workers))
+        )
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "kind": self.kind,
+            "max_workers": self.max_workers,
+            "capacity": self.capacity,
+            "in_flight": self.in_flight,
+            "rejected": self.rejected,
+            "operations": {
+                label: stats.as_dict() for label, stats in self._stats.items()
+            },
+        }
+
+    def _metrics(self):
+        labels = {"executor": self.name}
+        yield (
+            "executor_in_flight",
+            "gauge",
+            "Calls running or queued in a bounded executor.",
+            [(labels, self.in_flight)],
+        )
+        yield (
+            "executor_rejected_total",
+            "counter",
+            "Calls turned away because a bounded executor was full.",
+            [(labels, self.rejected)],
+        )
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+class MicroBatcher:
+    """Feeds items to an executor's idle workers, grouped once they queue up.
+
+    ``batch_func`` takes a list of items and returns one result per item.
+    Items are only handed to the executor when one of its workers is idle,
+    so none sit pinned in its queue behind a busy worker while another
+    frees up. While every worker is busy they wait here; whenever workers
+    free up each idle one gets its share of the waiting items, at most
+    ``max_batch``, so concurrent items run on as many workers as there are
+    and only group into batches once there are more items than workers.
+    Waiting items are rechecked every ``max_delay`` seconds for workers
+    freed by other callers of the executor, and count against its capacity.
+    Each caller awaits only its own result, with a timeout; a caller that
+    gives up before dispatch is left out.
+    """
+
+    def __init__(
+        self,
+        executor: BoundedExecutor,
+        label: str,
+        batch_func: Callable[[List[Any]], Sequence[Any]],
+        max_batch: int = 8,
+        max_delay: float = 0.01,
+        timeout: float = 10,
+    ):
+        self.executor = executor
+        self.label = label
+        self.batch_func = batch_func
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self.batches = 0
+        self.items = 0
+        self.cancelled = 0
+        self.timeouts = 0
+        self.rejected = 0
+        self._pending: List[Tuple[Any, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        # calls dispatched but not yet counted in executor.in_flight
+        self._unstarted = 0
+        self._tasks = set()
+
+    async def submit(self, item: Any, timeout: Optional[float] = None) -> Any:
+        queued = len(self._pending) + self._unstarted
+        if queued + self.executor.in_flight >= self.executor.capacity:
+            self.rejected += 1
+            raise ServiceOverloadedError(self.executor.name, self.executor.retry_after)
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((item, future))
+        self._dispatch()
+        try:
+            return await asyncio.wait_for(future, timeout or self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "max_batch": self.max_batch,
+            "max_delay_ms": self.max_delay * 1000,
+            "waiting": len(self._pending),
+            "cancelled": self.cancelled,
+            "timeouts": self.timeouts,
+            "rejected": self.rejected,
+        }
+
+    def _idle_workers(self) -> int:
+        return self.executor.max_workers - self.executor.in_flight - self._unstarted
+
+    def _dispatch(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        waiting = [
+            (item, future) for item, future in self._pending if not future.done()
+        ]
+        self.cancelled += len(self._pending) - len(waiting)
+        # an even share for every worker, so the ones freeing up next get some
+        size = min(self.max_batch, -(-len(waiting) // self.executor.max_workers))
+        for _ in range(max(0, self._idle_workers())):
+            if not waiting:
+                break
+            batch, waiting = waiting[:size], waiting[size:]
+            self._unstarted += 1
+            task = asyncio.create_task(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        self._pending = waiting
+        if waiting:
+            self._flush_handle = asyncio.get_running_loop().call_later(
+                self.max_delay, self._dispatch
+            )
+
+    async def _run(self, batch: List[Tuple[Any, asyncio.Future]]) -> None:
+        self.batches += 1
+        self.items += len(batch)
+        # executor.run counts itself in flight before its first await
+        self._unstarted -= 1
+        try:
+            results = await self.executor.run(
+                self.label, self.batch_func, [item for item, _ in batch]
+            )
+        except Exception as err:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(err)
+            return
+        finally:
+            if self._pending:
+                self._dispatch()
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
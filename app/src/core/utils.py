@@ -1,8 +1,11 @@
+import time
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Callable, Optional
 
+from src.core.cache import LRUCache
 from src.core.settings import variables
-from jose import jwt
+from src.core.system import BoundedExecutor
+from jose import JWTError, jwt
 from passlib.context import CryptContext
 
 
@@ -19,6 +22,54 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 
+def _jose_decoder() -> Callable[[str], dict]:
+    def decode(token: str) -> dict:
+        return jwt.decode(token, variables.secret_key, algorithms=[variables.algorithm])
+
+    return decode
+
+
+def _pyjwt_decoder() -> Callable[[str], dict]:
+    import jwt as pyjwt
+
+    def decode(token: str) -> dict:
+        try:
+            return pyjwt.decode(
+                token, variables.secret_key, algorithms=[variables.algorithm]
+            )
+        except pyjwt.PyJWTError as err:
+            raise JWTError(str(err)) from err
+
+    return decode
+
+
+JWT_BACKENDS = {"jose": _jose_decoder, "pyjwt": _pyjwt_decoder}
+
+if variables.jwt_backend not in JWT_BACKENDS:
+    raise ValueError(f"Unknown JWT_BACKEND: {variables.jwt_backend}")
+_decode_token = JWT_BACKENDS[variables.jwt_backend]()
+
+token_cache = LRUCache(
+    max_entries=variables.jwt_cache_max_entries, ttl=variables.token_life * 60
+)
+
+
+def decode_access_token(token: str, use_cache: bool = True) -> dict:
+    """Verified claims of the token, memoized until the token expires.
+
+    Raises JWTError whichever backend is configured.
+    """
+    if use_cache:
+        claims = token_cache.get(token)
+        if claims is not None:
+            return claims
+    claims = _decode_token(token)
+    if use_cache:
+        exp = claims.get("exp")
+        token_cache.set(token, claims, ttl=None if exp is None else exp - time.time())
+    return claims
+
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 
@@ -30,3 +81,31 @@ class Hasher:
     @staticmethod
     def get_password_hash(password: str) -> str:
         return pwd_context.hash(password)
+
+
+class AsyncHasher:
+    """Hasher counterpart for async handlers, keeps bcrypt off the event loop"""
+
+    def __init__(self, executor: BoundedExecutor):
+        self.executor = executor
+
+    async def verify_password(self, plain_password: str, hashed_password: str) -> bool:
+        return await self.executor.run(
+            "verify_password", Hasher.verify_password, plain_password, hashed_password
+        )
+
+    async def get_password_hash(self, password: str) -> str:
+        return await self.executor.run(
+            "get_password_hash", Hasher.get_password_hash, password
+        )
+
+
+async_hasher = AsyncHasher(
+    BoundedExecutor(
+        "hasher",
+        kind=variables.hasher_pool_kind,
+        max_workers=variables.hasher_max_workers,
+        queue_size=variables.hasher_queue_size,
+        retry_after=variables.hasher_retry_after,
+    )
+)
@@ -1,18 +1,179 @@
-from typing import Union
+import json
+from collections import Counter
+from datetime import date, datetime
+from typing import AsyncIterator, Dict, List, Sequence, Set, Tuple, Union
 from uuid import UUID
 
-from sqlalchemy import and_, select, update
+from sqlalchemy import Column, and_, func, select, text, tuple_, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.db.models import User, Faculty, StudyYear, Change
+from src.core.metrics import instrument_dal
+from src.core.pagination import InvalidCursor, decode_cursor, encode_cursor
+from src.core.settings import variables
+from src.core.shared_cache import SharedCache, cached, invalidation_bus
+from src.db.models import (
+    AdminRole,
+    AttendanceDaily,
+    AttendanceStudentDay,
+    Change,
+    Faculty,
+    GeneralAttendance,
+    Group,
+    Profession,
+    Student,
+    StudyYear,
+    User,
+    UserSnapshot,
+)
+from src.db.session import pin_to_primary
 
 
+def _encode_snapshot(snapshot: UserSnapshot) -> str:
+    return json.dumps(
+        [str(snapshot.id), snapshot.fullname, snapshot.is_active, snapshot.roles]
+    )
+
+
+def _decode_snapshot(raw: str) -> UserSnapshot:
+    user_id, fullname, is_active, roles = json.loads(raw)
+    return UserSnapshot(UUID(user_id), fullname, is_active, tuple(roles))
+
+
+# snapshots of authenticated users keyed by token subject (fullname); a
+# committed UserDAL write invalidates the user's entry in all workers
+user_cache = SharedCache(
+    "user",
+    invalidation_bus,
+    max_entries=variables.user_cache_max_entries,
+    ttl=variables.user_cache_shared_ttl,
+    local_ttl=variables.user_cache_ttl,
+    encode=_encode_snapshot,
+    decode=_decode_snapshot,
+)
+
+
+async def _driver_connection(db_session: AsyncSession):
+    """The asyncpg connection under the session's own connection.
+
+    Statements run on it land in the session's transaction, which the
+    asyncpg adapter only begins on the first statement, so callers must have
+    executed one. Its errors are asyncpg.PostgresError, not DBAPIError.
+    """
+    connection = await db_session.connection()
+    raw_connection = await connection.get_raw_connection()
+    return raw_connection.driver_connection
+
+
+class Keyset:
+    """Whitelisted columns and seek key of one paginated list.
+
+    Pages are fetched with ``WHERE (key) > (last key seen) ORDER BY key``
+    instead of OFFSET, so every page costs the same index range scan no
+    matter how deep it is. The last key travels as an opaque cursor.
+    """
+
+    def __init__(self, fields: Dict[str, Column], key: Sequence[str]):
+        self.fields = fields
+        self.key = tuple(key)
+
+    async def fetch(
+        self,
+        db_session: AsyncSession,
+        fields: Sequence[str],
+        cursor: Union[str, None],
+        limit: int,
+        conditions: Sequence = (),
+    ) -> Tuple[List[dict], Union[str, None]]:
+        """One page of rows holding only ``fields``, and the next cursor.
+
+        Raises InvalidCursor for a cursor this list did not produce.
+        """
+        key_columns = [self.fields[name] for name in self.key]
+        columns = [self.fields[name].label(name) for name in fields]
+        columns += [
+            column.label(name)
+            for name, column in zip(self.key, key_columns)
+            if name not in fields
+        ]
+        query = (
+            select(*columns).where(*conditions).order_by(*key_columns).limit(limit + 1)
+        )
+        if cursor is not None:
+            query = query.where(tuple_(*key_columns) > tuple_(*self._after(cursor)))
+        rows = (await db_session.execute(query)).all()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(*(rows[-1]._mapping[name] for name in self.key))
+        return [
+            {name: row._mapping[name] for name in fields} for row in rows
+        ], next_cursor
+
+    def _after(self, cursor: str) -> List:
+        values = decode_cursor(cursor, len(self.key))
+        after = []
+        for name, value in zip(self.key, values):
+            python_type = self.fields[name].type.python_type
+            try:
+                if python_type is UUID:
+                    value = UUID(value)
+                elif python_type is datetime:
+                    value = datetime.fromisoformat(value)
+                elif not isinstance(value, python_type):
+                    raise TypeError(name)
+            except (TypeError, ValueError) as err:
+                raise InvalidCursor("Malformed cursor.") from err
+            after.append(value)
+        return after
+
+
+def _manageable_user(user_id: UUID, protected_roles: Sequence[str]):
+    """Active user with the given id holding none of the protected roles"""
+    clause = and_(User.id == user_id, User.is_active == True)
+    if protected_roles:
+        clause = and_(clause, ~User.roles.overlap(list(protected_roles)))
+    return clause
+
+
+@instrument_dal
 class UserDAL:
-    """Data Access Layer for operating User info"""
+    """Data Access Layer for operating User info.
+
+    Writes are conditional UPDATE ... RETURNING statements: the permission
+    check travels in the WHERE clause, and None means no row matched.
+    """
+
+    listing = Keyset(
+        {
+            "id": User.id,
+            "fullname": User.fullname,
+            "is_active": User.is_active,
+            "roles": User.roles,
+        },
+        key=("fullname", "id"),
+    )
 
     def __init__(self, db_session: AsyncSession):
         self.db_session = db_session
 
+    async def list_users(
+        self,
+        fields: Sequence[str],
+        cursor: Union[str, None],
+        limit: int,
+        is_active: Union[bool, None] = None,
+        role: Union[str, None] = None,
+    ) -> Tuple[List[dict], Union[str, None]]:
+        conditions = []
+        if is_active is not None:
+            conditions.append(User.is_active == is_active)
+        if role is not None:
+            conditions.append(User.roles.contains([role]))
+        return await self.listing.fetch(
+            self.db_session, fields, cursor, limit, conditions
+        )
+
     async def create_user(
         self,
         user_id: UUID,
@@ -30,17 +191,16 @@ class UserDAL:
         await self.db_session.flush()
         return new_user
 
-    async def delete_user(self, user_id: UUID) -> Union[UUID, None]:
+    async def delete_user(
+        self, user_id: UUID, protected_roles: Sequence[str] = ()
+    ) -> Union[UUID, None]:
         query = (
             update(User)
-            .where(and_(User.user_id == user_id, User.is_active == True))
+            .where(_manageable_user(user_id, protected_roles))
             .values(is_active=False)
-            .returning(User.user_id)
+            .returning(User.id, User.fullname)
         )
-        res = await self.db_session.execute(query)
-        deleted_user_id_row = res.fetchone()
-        if deleted_user_id_row is not None:
-            return deleted_user_id_row[0]
+        return await self._written(query)
 
     async def get_user_by_id(self, user_id: UUID) -> Union[User, None]:
         query = select(User).where(User.id == user_id)
@@ -56,25 +216,85 @@ class UserDAL:
         if user_row is not None:
             return user_row[0]
 
-    async def update_user(self, user_id: UUID, **kwargs) -> Union[UUID, None]:
+    @cached(user_cache, key=lambda dal, fullname: fullname)
+    async def get_user_snapshot(self, fullname: str) -> Union[UserSnapshot, None]:
+        # a lagging replica would put a revoked user back in the cache
+        pin_to_primary(self.db_session)
+        user = await self.get_user_by_fullname(fullname)
+        if user is not None:
+            return UserSnapshot.from_user(user)
+
+    async def update_user(
+        self, user_id: UUID, protected_roles: Sequence[str] = (), **kwargs
+    ) -> Union[UUID, None]:
+        # a rename has to evict the entry under the old fullname
+        previous = select(User.id, User.fullname).where(User.id == user_id).subquery()
         query = (
             update(User)
-            .where(and_(User.id == user_id, User.is_active == True))
+            .where(_manageable_user(user_id, protected_roles))
+            .where(User.id == previous.c.id)
             .values(kwargs)
-            .returning(User.id)
+            .returning(User.id, previous.c.fullname, User.fullname)
+        )
+        return await self._written(query)
+
+    async def grant_admin_role(self, user_id: UUID) -> Union[UUID, None]:
+        query = (
+            update(User)
+            .where(
+                _manageable_user(
+                    user_id,
+                    [AdminRole.ROLE_ADMIN.value, AdminRole.ROLE_SUPERADMIN.value],
+                )
+            )
+            .values(roles=func.array_append(User.roles, AdminRole.ROLE_ADMIN.value))
+            .returning(User.id, User.fullname)
+        )
+        return await self._written(query)
+
+    async def revoke_admin_role(self, user_id: UUID) -> Union[UUID, None]:
+        query = (
+            update(User)
+            .where(
+                and_(
+                    _manageable_user(user_id, ()),
+                    User.roles.any(AdminRole.ROLE_ADMIN.value),
+                )
+            )
+            .values(roles=func.array_remove(User.roles, AdminRole.ROLE_ADMIN.value))
+            .returning(User.id, User.fullname)
         )
+        return await self._written(query)
+
+    async def _written(self, query) -> Union[UUID, None]:
+        """Run a conditional write returning (id, *fullnames) and evict them"""
         res = await self.db_session.execute(query)
-        update_user_id_row = res.fetchone()
-        if update_user_id_row is not None:
-            return update_user_id_row[0]
+        row = res.fetchone()
+        if row is not None:
+            user_cache.invalidate_on_commit(self.db_session, *set(row[1:]))
+            return row[0]
 
 
 class FacultyDAL:
     """Data Access Layer for operating Faculty info"""
 
+    listing = Keyset(
+        {
+            "id": Faculty.id,
+            "faculty_name": Faculty.faculty_name,
+            "faculty_dean": Faculty.faculty_dean,
+        },
+        key=("id",),
+    )
+
     def __init__(self, db_session: AsyncSession):
         self.db_session = db_session
 
+    async def list_faculties(
+        self, fields: Sequence[str], cursor: Union[str, None], limit: int
+    ) -> Tuple[List[dict], Union[str, None]]:
+        return await self.listing.fetch(self.db_session, fields, cursor, limit)
+
     async def create_user(
         self,
         faculty_id: UUID,
@@ -114,9 +334,24 @@ class StudyYearDAL:
 class ChangeDAL:
     """Data Access Layer for operating Change info"""
 
+    listing = Keyset(
+        {
+            "id": Change.id,
+            "change_name": Change.change_name,
+            "start_time": Change.start_time,
+            "end_time": Change.end_time,
+        },
+        key=("id",),
+    )
+
     def __init__(self, db_session: AsyncSession):
         self.db_session = db_session
 
+    async def list_changes(
+        self, fields: Sequence[str], cursor: Union[str, None], limit: int
+    ) -> Tuple[List[dict], Union[str, None]]:
+        return await self.listing.fetch(self.db_session, fields, cursor, limit)
+
     async def create_user(
         self,
         change_id: int,
@@ -129,3 +364,503 @@ class ChangeDAL:
         self.db_session.add(new_studyYear)
         await self.db_session.flush()
         return new_studyYear
+
+
+class StudentDAL:
+    """Data Access Layer for operating Student info"""
+
+    copy_columns = (
+        "id",
+        "fullname",
+        "student_id",
+        "gender",
+        "student_image",
+        "course",
+        "qr_code",
+        "created_time",
+        "student_profession_id",
+        "student_group_id",
+    )
+    copy_staging_table = "students_import"
+
+    listing = Keyset(
+        {
+            "id": Student.id,
+            "fullname": Student.fullname,
+            "student_id": Student.student_id,
+            "gender": Student.gender,
+            "student_image": Student.student_image,
+            "course": Student.course,
+            "qr_code": Student.qr_code,
+            "created_time": Student.created_time,
+            "profession_id": Student.student_profession_id,
+            "group_id": Student.student_group_id,
+        },
+        key=("student_id",),
+    )
+
+    def __init__(self, db_session: AsyncSession):
+        self.db_session = db_session
+
+    async def list_students(
+        self,
+        fields: Sequence[str],
+        cursor: Union[str, None],
+        limit: int,
+        group_id: Union[int, None] = None,
+        course: Union[int, None] = None,
+        study_year_id: Union[int, None] = None,
+        profession_id: Union[int, None] = None,
+    ) -> Tuple[List[dict], Union[str, None]]:
+        conditions = []
+        if group_id is not None:
+            conditions.append(Student.student_group_id == group_id)
+        if course is not None:
+            conditions.append(Student.course == course)
+        if study_year_id is not None:
+            conditions.append(
+                Student.student_group_id.in_(
+                    select(Group.id).where(Group.study_year_id == study_year_id)
+                )
+            )
+        if profession_id is not None:
+            conditions.append(Student.student_profession_id == profession_id)
+        return await self.listing.fetch(
+            self.db_session, fields, cursor, limit, conditions
+        )
+
+    async def get_reference_ids(self) -> Tuple[Set[int], Set[int]]:
+        """Ids of every group and profession a student may point at"""
+        groups = await self.db_session.execute(select(Group.id))
+        professions = await self.db_session.execute(select(Profession.id))
+        return set(groups.scalars()), set(professions.scalars())
+
+    async def copy_students(self, records: Sequence[tuple]) -> Set[UUID]:
+        """Bulk insert rows ordered as copy_columns, returns the ids inserted.
+
+        The rows are COPYed into a temporary staging table and moved on with
+        ON CONFLICT DO NOTHING, so a row whose id, student_id or qr_code is
+        taken, by a student or an earlier row, is skipped instead of failing
+        the others. Any other rejection raises asyncpg.PostgresError.
+        """
+        driver_connection = await _driver_connection(self.db_session)
+        columns = ", ".join(self.copy_columns)
+        await driver_connection.execute(
+            f"CREATE TEMPORARY TABLE IF NOT EXISTS {self.copy_staging_table} "
+            f"(LIKE {Student.__tablename__}) ON COMMIT DROP"
+        )
+        await driver_connection.copy_records_to_table(
+            self.copy_staging_table, records=records, columns=self.copy_columns
+        )
+        inserted = await driver_connection.fetch(
+            f"INSERT INTO {Student.__tablename__} ({columns}) "
+            f"SELECT {columns} FROM {self.copy_staging_table} "
+            "ON CONFLICT DO NOTHING RETURNING id"
+        )
+        await driver_connection.execute(f"TRUNCATE {self.copy_staging_table}")
+        return {row["id"] for row in inserted}
+
+    async def get_index_rows(
+        self, created_since: Union[datetime, None] = None
+    ) -> List[tuple]:
+        """(student_id, fullname, qr_code, group id, created_time) rows"""
+        query = select(
+            Student.student_id,
+            Student.fullname,
+            Student.qr_code,
+            Student.student_group_id,
+            Student.created_time,
+        )
+        if created_since is not None:
+            query = query.where(Student.created_time >= created_since)
+        res = await self.db_session.execute(query)
+        return res.all()
+
+    async def student_exists(self, student_id: str) -> bool:
+        res = await self.db_session.execute(
+            select(Student.id).where(Student.student_id == student_id)
+        )
+        return res.first() is not None
+
+    async def set_student_image(self, student_id: str, student_image: str) -> bool:
+        """Point a student at a new photo, False when there is no such student"""
+        res = await self.db_session.execute(
+            update(Student)
+            .where(Student.student_id == student_id)
+            .values(student_image=student_image)
+            .returning(Student.id)
+        )
+        return res.fetchone() is not None
+
+    async def get_image_rows(self) -> List[tuple]:
+        """(student_id, student_image) rows of every student"""
+        res = await self.db_session.execute(
+            select(Student.student_id, Student.student_image)
+        )
+        return res.all()
+
+
+class ProfessionDAL:
+    """Data Access Layer for operating Profession info"""
+
+    listing = Keyset(
+        {"id": Profession.id, "profession_name": Profession.profession_name},
+        key=("id",),
+    )
+
+    def __init__(self, db_session: AsyncSession):
+        self.db_session = db_session
+
+    async def list_professions(
+        self, fields: Sequence[str], cursor: Union[str, None], limit: int
+    ) -> Tuple[List[dict], Union[str, None]]:
+        return await self.listing.fetch(self.db_session, fields, cursor, limit)
+
+
+class GroupDAL:
+    """Data Access Layer for operating Group info"""
+
+    listing = Keyset(
+        {
+            "id": Group.id,
+            "group_name": Group.group_name,
+            "group_year": Group.group_year,
+            "change_id": Group.group_change_id,
+            "study_year_id": Group.study_year_id,
+        },
+        key=("id",),
+    )
+
+    def __init__(self, db_session: AsyncSession):
+        self.db_session = db_session
+
+    async def list_groups(
+        self,
+        fields: Sequence[str],
+        cursor: Union[str, None],
+        limit: int,
+        study_year_id: Union[int, None] = None,
+        change_id: Union[int, None] = None,
+    ) -> Tuple[List[dict], Union[str, None]]:
+        conditions = []
+        if study_year_id is not None:
+            conditions.append(Group.study_year_id == study_year_id)
+        if change_id is not None:
+            conditions.append(Group.group_change_id == change_id)
+        return await self.listing.fetch(
+            self.db_session, fields, cursor, limit, conditions
+        )
+
+    async def get_change_ids(self) -> Dict[int, Union[int, None]]:
+        """Change (shift) id of every group, keyed by group id"""
+        res = await self.db_session.execute(select(Group.id, Group.group_change_id))
+        return dict(res.all())
+
+
+class AttendanceDAL:
+    """Data Access Layer for operating GeneralAttendance info"""
+
+    def __init__(self, db_session: AsyncSession):
+        self.db_session = db_session
+
+    async def insert_attendance(self, records: Sequence[dict]) -> Set[UUID]:
+        """Write a batch of check-ins as a single multi-row INSERT.
+
+        Check-ins already stored are skipped, so a batch sent again after a
+        commit whose acknowledgement was lost writes nothing; returns the
+        ids of the rows written.
+        """
+        res = await self.db_session.execute(
+            pg_insert(GeneralAttendance.__table__)
+            .values(list(records))
+            .on_conflict_do_nothing(index_elements=["id", "attended_time"])
+            .returning(GeneralAttendance.id)
+        )
+        return {row[0] for row in res}
+
+    async def record_daily_attendance(self, visits: Sequence[tuple]) -> None:
+        """Fold (date, student_id, group_id, change_id) check-ins into the
+        daily summaries, within the caller's transaction.
+
+        Student-days are inserted first; only the ones that were new add to
+        the distinct student counts. Rows are written in key order so that
+        concurrent flushes lock them in the same order.
+        """
+        check_ins = Counter((day, group, change) for day, _, group, change in visits)
+        first_visits = {}
+        for day, student_id, group, change in visits:
+            first_visits.setdefault((day, student_id), (group, change))
+        res = await self.db_session.execute(
+            pg_insert(AttendanceStudentDay)
+            .values(
+                [
+                    {
+                        "attendance_date": day,
+                        "student_id": student_id,
+                        "group_id": group,
+                        "change_id": change,
+                    }
+                    for (day, student_id), (group, change) in sorted(
+                        first_visits.items()
+                    )
+                ]
+            )
+            .on_conflict_do_nothing()
+            .returning(
+                AttendanceStudentDay.attendance_date,
+                AttendanceStudentDay.group_id,
+                AttendanceStudentDay.change_id,
+            )
+        )
+        students = Counter(tuple(row) for row in res)
+        query = pg_insert(AttendanceDaily).values(
+            [
+                {
+                    "attendance_date": day,
+                    "group_id": group,
+                    "change_id": change,
+                    "check_ins": check_ins[day, group, change],
+                    "students": students[day, group, change],
+                }
+                for day, group, change in sorted(check_ins)
+            ]
+        )
+        await self.db_session.execute(
+            query.on_conflict_do_update(
+                index_elements=[
+                    AttendanceDaily.attendance_date,
+                    AttendanceDaily.group_id,
+                    AttendanceDaily.change_id,
+                ],
+                set_={
+                    "check_ins": AttendanceDaily.check_ins + query.excluded.check_ins,
+                    "students": AttendanceDaily.students + query.excluded.students,
+                },
+            )
+        )
+
+    async def get_report(
+        self,
+        date_from: date,
+        date_to: date,
+        dimensions: Sequence[str],
+        group_id: Union[int, None] = None,
+        change_id: Union[int, None] = None,
+        study_year_id: Union[int, None] = None,
+    ) -> List[dict]:
+        """Summary rows between two dates (inclusive) grouped by any of
+        "day", "group" and "change", each with check_ins, students (summed
+        student-days) and days (days with any check-in)"""
+        columns = {
+            "day": [AttendanceDaily.attendance_date],
+            "group": [
+                AttendanceDaily.group_id,
+                Group.group_name,
+                StudyYear.year.label("study_year"),
+            ],
+            "change": [AttendanceDaily.change_id, Change.change_name],
+        }
+        keys = [column for dimension in dimensions for column in columns[dimension]]
+        query = (
+            select(
+                *keys,
+                func.sum(AttendanceDaily.check_ins).label("check_ins"),
+                func.sum(AttendanceDaily.students).label("students"),
+                func.count(AttendanceDaily.attendance_date.distinct()).label("days"),
+            )
+            .select_from(AttendanceDaily)
+            .outerjoin(Group, Group.id == AttendanceDaily.group_id)
+            .outerjoin(StudyYear, StudyYear.id == Group.study_year_id)
+            .outerjoin(Change, Change.id == AttendanceDaily.change_id)
+            .where(AttendanceDaily.attendance_date.between(date_from, date_to))
+            .group_by(*keys)
+            .order_by(*keys)
+        )
+        if group_id is not None:
+            query = query.where(AttendanceDaily.group_id == group_id)
+        if change_id is not None:
+            query = query.where(AttendanceDaily.change_id == change_id)
+        if study_year_id is not None:
+            query = query.where(Group.study_year_id == study_year_id)
+        res = await self.db_session.execute(query)
+        return [dict(row._mapping) for row in res]
+
+    async def get_records(
+        self,
+        time_from: datetime,
+        time_to: datetime,
+        limit: int,
+        after: Union[Tuple[datetime, UUID], None] = None,
+        group_id: Union[int, None] = None,
+        change_id: Union[int, None] = None,
+    ) -> List[tuple]:
+        """Check-ins in [time_from, time_to) ordered by (attended_time, id),
+        starting after the given key"""
+        query = (
+            select(
+                GeneralAttendance.id,
+                GeneralAttendance.attended_student_id,
+                GeneralAttendance.attended_student_name,
+                GeneralAttendance.attended_time,
+                GeneralAttendance.attended_change,
+                Student.student_group_id,
+            )
+            .join(Student, Student.student_id == GeneralAttendance.attended_student_id)
+            .where(
+                GeneralAttendance.attended_time >= time_from,
+                GeneralAttendance.attended_time < time_to,
+            )
+            .order_by(GeneralAttendance.attended_time, GeneralAttendance.id)
+            .limit(limit)
+        )
+        if after is not None:
+            query = query.where(
+                tuple_(GeneralAttendance.attended_time, GeneralAttendance.id)
+                > tuple_(*after)
+            )
+        if group_id is not None:
+            query = query.where(Student.student_group_id == group_id)
+        if change_id is not None:
+            query = query.where(GeneralAttendance.attended_change == change_id)
+        res = await self.db_session.execute(query)
+        return res.all()
+
+    async def stream_export_rows(
+        self,
+        time_from: datetime,
+        time_to: datetime,
+        chunk_size: int,
+        after: Union[Tuple[datetime, UUID], None] = None,
+        group_id: Union[int, None] = None,
+        change_id: Union[int, None] = None,
+        study_year_id: Union[int, None] = None,
+    ) -> AsyncIterator[List[tuple]]:
+        """Check-ins in [time_from, time_to) in (attended_time, id) order,
+        read through a server-side cursor ``chunk_size`` rows at a time"""
+        query = (
+            select(
+                GeneralAttendance.id,
+                GeneralAttendance.attended_time,
+                GeneralAttendance.attended_student_id,
+                GeneralAttendance.attended_student_name,
+                Group.group_name,
+                StudyYear.year,
+                Change.change_name,
+            )
+            .join(Student, Student.student_id == GeneralAttendance.attended_student_id)
+            .outerjoin(Group, Group.id == Student.student_group_id)
+            .outerjoin(StudyYear, StudyYear.id == Group.study_year_id)
+            .outerjoin(Change, Change.id == GeneralAttendance.attended_change)
+            .where(
+                GeneralAttendance.attended_time >= time_from,
+                GeneralAttendance.attended_time < time_to,
+            )
+            .order_by(GeneralAttendance.attended_time, GeneralAttendance.id)
+            .execution_options(yield_per=chunk_size)
+        )
+        if after is not None:
+            query = query.where(
+                tuple_(GeneralAttendance.attended_time, GeneralAttendance.id)
+                > tuple_(*after)
+            )
+        if group_id is not None:
+            query = query.where(Student.student_group_id == group_id)
+        if change_id is not None:
+            query = query.where(GeneralAttendance.attended_change == change_id)
+        if study_year_id is not None:
+            query = query.where(Group.study_year_id == study_year_id)
+        result = await self.db_session.stream(query)
+        async for rows in result.partitions(chunk_size):
+            yield rows
+
+
+class AttendancePartitionDAL:
+    """Data Access Layer for the monthly partitions of general_attendance.
+
+    DDL takes no bind parameters, so partition names and bounds are spliced
+    into the statements; they only ever come from calendar arithmetic.
+    """
+
+    parent = GeneralAttendance.__tablename__
+    # catches rows no monthly partition covers
+    default_partition = f"{parent}_default"
+    # any constant shared by every worker; keeps maintenance single-flight
+    lock_key = 0x6761_7474
+
+    def __init__(self, db_session: AsyncSession):
+        self.db_session = db_session
+
+    async def try_lock(self) -> bool:
+        """Take the maintenance lock for the rest of the transaction"""
+        res = await self.db_session.execute(
+            text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": self.lock_key}
+        )
+        return bool(res.scalar())
+
+    async def get_partitions(self) -> List[str]:
+        res = await self.db_session.execute(
+            text(
+                "SELECT child.relname FROM pg_inherits"
+                " JOIN pg_class child ON child.oid = pg_inherits.inhrelid"
+                " WHERE pg_inherits.inhparent = CAST(:parent AS regclass)"
+            ),
+            {"parent": self.parent},
+        )
+        return list(res.scalars())
+
+    async def get_default_months(self) -> List[date]:
+        """Months of the rows the default partition caught"""
+        res = await self.db_session.execute(
+            text(
+                "SELECT DISTINCT CAST(date_trunc('month', attended_time) AS date)"
+                f' FROM "{self.default_partition}"'
+            )
+        )
+        return sorted(res.scalars())
+
+    async def create_partition(
+        self, name: str, start: date, end: date, from_default: bool = True
+    ) -> int:
+        """Create the partition for [start, end), returns the rows it took over.
+
+        Creating it as PARTITION OF fails once the default partition holds a
+        row of the range, so the table is made on its own, the default
+        partition's rows of the range are moved into it and it is attached,
+        all in the caller's transaction.
+        """
+        start_at, end_at = start.isoformat(), end.isoformat()
+        await self.db_session.execute(
+            text(f'CREATE TABLE IF NOT EXISTS "{name}" (LIKE "{self.parent}")')
+        )
+        moved = 0
+        if from_default:
+            res = await self.db_session.execute(
+                text(
+                    f'WITH moved AS (DELETE FROM "{self.default_partition}"'
+                    f" WHERE attended_time >= '{start_at}'"
+                    f" AND attended_time < '{end_at}' RETURNING *)"
+                    f' INSERT INTO "{name}" SELECT * FROM moved'
+                )
+            )
+            moved = res.rowcount
+        await self.db_session.execute(
+            text(
+                f'ALTER TABLE "{self.parent}" ATTACH PARTITION "{name}"'
+                f" FOR VALUES FROM ('{start_at}') TO ('{end_at}')"
+            )
+        )
+        return moved
+
+    async def detach_partition(self, name: str) -> None:
+        await self.db_session.execute(
+            text(f'ALTER TABLE "{self.parent}" DETACH PARTITION "{name}"')
+        )
+
+    async def archive_partition(self, name: str, schema: str) -> None:
+        await self.db_session.execute(text(f'CREATE SCHEMA IF NOT EXISTS "{schema}"'))
+        await self.db_session.execute(
+            text(f'ALTER TABLE "{name}" SET SCHEMA "{schema}"')
+        )
+
+    async def drop_partition(self, name: str) -> None:
+        await self.db_session.execute(text(f'DROP TABLE "{name}"'))
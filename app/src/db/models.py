@@ -1,8 +1,19 @@
 import uuid
 from datetime import datetime
 from enum import Enum
-
-from sqlalchemy import Boolean, Column, Integer, String, Time, ForeignKey, DateTime
+from typing import NamedTuple, Tuple
+
+from sqlalchemy import (
+    Boolean,
+    Column,
+    Date,
+    Integer,
+    String,
+    Time,
+    ForeignKey,
+    DateTime,
+    Index,
+)
 from sqlalchemy.dialects.postgresql import ARRAY, UUID
 from sqlalchemy.orm import declarative_base, relationship
 
@@ -19,11 +30,14 @@ class User(Base):
     __tablename__ = "users"
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    fullname = Column(String, nullable=False)
+    fullname = Column(String, nullable=False, unique=True)
     hashed_password = Column(String, nullable=False)
     is_active = Column(Boolean(), default=True)
     roles = Column(ARRAY(String), nullable=False)
 
+    # seek key of the user list, also serves lookups by fullname
+    __table_args__ = (Index("ix_users_fullname_id", "fullname", "id"),)
+
     @property
     def is_superadmin(self) -> bool:
         return AdminRole.ROLE_SUPERADMIN in self.roles
@@ -41,6 +55,27 @@ class User(Base):
             return {role for role in self.roles if role != AdminRole.ROLE_ADMIN}
 
 
+class UserSnapshot(NamedTuple):
+    """Immutable, session-independent copy of the fields auth relies on"""
+
+    id: uuid.UUID
+    fullname: str
+    is_active: bool
+    roles: Tuple[str, ...]
+
+    @classmethod
+    def from_user(cls, user: User) -> "UserSnapshot":
+        return cls(user.id, user.fullname, user.is_active, tuple(user.roles))
+
+    @property
+    def is_superadmin(self) -> bool:
+        return AdminRole.ROLE_SUPERADMIN in self.roles
+
+    @property
+    def is_admin(self) -> bool:
+        return AdminRole.ROLE_ADMIN in self.roles
+
+
 class Faculty(Base):
     __tablename__ = "faculty"
 
@@ -63,9 +98,6 @@ class Change(Base):
     change_name = Column(String, nullable=False)
     start_time = Column(Time, nullable=True)
     end_time = Column(Time, nullable=True)
-    change_year = Column(Integer, ForeignKey("study_year.id"), nullable=True)
-
-    change_year = relationship("StudyYear")
 
 
 class Profession(Base):
@@ -95,31 +127,86 @@ class Student(Base):
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     fullname = Column(String, nullable=False)
-    student_id = Column(String, nullable=False)
+    student_id = Column(String, nullable=False, unique=True)
     gender = Column(String, nullable=False)
     student_image = Column(String, nullable=False)
     course = Column(Integer, nullable=False)
-    qr_code = Column(String, nullable=False)
-    created_time = Column(DateTime, default=datetime.now())
+    qr_code = Column(String, nullable=False, unique=True)
+    created_time = Column(DateTime, default=datetime.now)
     student_profession_id = Column(Integer, ForeignKey("professions.id"))
     student_group_id = Column(Integer, ForeignKey("groups.id"))
 
     student_profession = relationship("Profession")
     student_group = relationship("Group")
 
+    # per-group pages of the student list, ordered by student_id
+    __table_args__ = (
+        Index(
+            "ix_students_student_group_id_student_id", "student_group_id", "student_id"
+        ),
+    )
+
+
+class GeneralAttendance(Base):
+    """Check-ins, range-partitioned by month on attended_time.
+
+    Postgres requires the partition key in the primary key; the monthly
+    partitions are created and retired by AttendancePartitionManager.
+    """
 
-class GeneralAttendance:
     __tablename__ = "general_attendance"
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     attended_student_id = Column(
         String, ForeignKey("students.student_id"), nullable=False
     )
-    attended_student_name = Column(
-        String, ForeignKey("students.fullname"), nullable=False
+    attended_student_name = Column(String, nullable=False)
+    attended_time = Column(
+        DateTime, primary_key=True, nullable=False, default=datetime.now
     )
-    attended_time = Column(DateTime, nullable=False, default=datetime.now())
     attended_change = Column(Integer, ForeignKey("change.id"), nullable=True)
     students_qr_code = Column(String, nullable=False)
 
     attended_student = relationship("Student")
+
+    __table_args__ = (
+        Index("ix_general_attendance_attended_time_id", "attended_time", "id"),
+        Index(
+            "ix_general_attendance_attended_student_id_attended_time",
+            "attended_student_id",
+            "attended_time",
+        ),
+        Index("ix_general_attendance_attended_change", "attended_change"),
+        # a few pages per block range: tiny, and enough for day/term scans
+        Index(
+            "brin_general_attendance_attended_time",
+            "attended_time",
+            postgresql_using="brin",
+        ),
+        {"postgresql_partition_by": "RANGE (attended_time)"},
+    )
+
+
+class AttendanceStudentDay(Base):
+    """One row per student per day with at least one check-in"""
+
+    __tablename__ = "attendance_student_days"
+
+    attendance_date = Column(Date, primary_key=True)
+    student_id = Column(String, primary_key=True)
+    # 0 stands for "no group" / "no change" so both can be part of the key
+    group_id = Column(Integer, nullable=False)
+    change_id = Column(Integer, nullable=False)
+
+
+class AttendanceDaily(Base):
+    """Check-ins per day, group and change, kept current by every flush"""
+
+    __tablename__ = "attendance_daily"
+
+    attendance_date = Column(Date, primary_key=True)
+    group_id = Column(Integer, primary_key=True)
+    change_id = Column(Integer, primary_key=True)
+    check_ins = Column(Integer, nullable=False, default=0)
+    # distinct students whose first check-in of the day fell in this row
+    students = Column(Integer, nullable=False, default=0)
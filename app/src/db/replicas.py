@@ -0,0 +1,186 @@
+import asyncio
+import time
+from decimal import Decimal
+from logging import getLogger
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+logger = getLogger(__name__)
+
+# write-ahead log position the primary has reached, as a number
+PRIMARY_LSN_QUERY = text("SELECT pg_wal_lsn_diff(pg_current_wal_lsn(), '0/0')")
+
+# whether the replica still follows a primary, how far it has replayed and
+# received, when it replayed its last transaction, and whether its WAL
+# receiver is streaming: the receiver's row exists only while it runs, its
+# status is only shown to roles with pg_read_all_stats
+REPLICA_QUERY = text(
+    "SELECT pg_is_in_recovery(),"
+    " pg_wal_lsn_diff(pg_last_wal_replay_lsn(), '0/0'),"
+    " pg_wal_lsn_diff(pg_last_wal_receive_lsn(), '0/0'),"
+    " EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()),"
+    " (SELECT coalesce(status = 'streaming', true) FROM pg_stat_wal_receiver)"
+)
+
+
+class Replica:
+    def __init__(self, engine: AsyncEngine):
+        self.engine = engine
+        self.name = engine.url.render_as_string(hide_password=True)
+        self.healthy = False
+        self.lag: Optional[float] = None
+        self.streaming: Optional[bool] = None
+        self.failures = 0
+        self.reads = 0
+        self.checked_at: Optional[float] = None
+
+    def stats(self) -> dict:
+        return {
+            "url": self.name,
+            "healthy": self.healthy,
+            "lag_seconds": self.lag,
+            "streaming": self.streaming,
+            "failures": self.failures,
+            "reads": self.reads,
+            "checked_at": self.checked_at,
+            "pool": self.engine.sync_engine.pool.stats(),
+        }
+
+
+class ReplicaSet:
+    """Read replicas of the primary, probed every ``check_interval`` seconds.
+
+    A replica serves reads while it answers the probe, is still in
+    recovery, streams from the primary and is within ``max_lag`` seconds of
+    it; ``choose`` spreads sessions round-robin over those and returns None
+    when there are none, in which case reads fall back to the primary.
+
+    Lag is 0 once the replica has replayed the WAL position the primary had
+    when the check started, so an idle primary does not make its replicas
+    look stale; otherwise it is the age of the last transaction replayed. A
+    replica whose WAL receiver is down is out of rotation whatever its lag:
+    it has stopped hearing about writes, so it cannot tell it is behind.
+    """
+
+    def __init__(
+        self,
+        engines: List[AsyncEngine],
+        max_lag: float,
+        check_interval: float,
+        primary: Optional[AsyncEngine] = None,
+    ):
+        self.replicas = [Replica(engine) for engine in engines]
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.primary = primary
+        self.fallbacks = 0
+        self._next = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self.replicas)
+
+    def choose(self) -> Optional[Replica]:
+        if not self.replicas:
+            return None
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            self.fallbacks += 1
+            return None
+        self._next = (self._next + 1) % len(healthy)
+        replica = healthy[self._next]
+        replica.reads += 1
+        return replica
+
+    async def check(self) -> None:
+        primary_lsn = None
+        if self.primary is not None:
+            try:
+                primary_lsn = await asyncio.wait_for(
+                    self._query_primary(), self.check_interval
+                )
+            except Exception as err:
+                logger.warning("Cannot read the primary's WAL position: %s", err)
+        await asyncio.gather(
+            *(self._probe(replica, primary_lsn) for replica in self.replicas)
+        )
+
+    def start_checking(self) -> None:
+        if self.replicas and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._check_periodically())
+
+    async def stop_checking(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def dispose(self) -> None:
+        for replica in self.replicas:
+            await replica.engine.dispose()
+
+    def stats(self) -> dict:
+        return {
+            "max_lag_seconds": self.max_lag,
+            "fallbacks": self.fallbacks,
+            "replicas": [replica.stats() for replica in self.replicas],
+        }
+
+    async def _probe(self, replica: Replica, primary_lsn: Optional[Decimal]) -> None:
+        healthy = replica.healthy
+        try:
+            row = await asyncio.wait_for(
+                self._query_replica(replica), self.check_interval
+            )
+        except Exception as err:
+            replica.healthy = False
+            replica.lag = None
+            replica.streaming = None
+            replica.failures += 1
+            if healthy:
+                logger.warning("Replica %s is unreachable: %s", replica.name, err)
+        else:
+            in_recovery, replayed, received, replay_age, streaming = row
+            # without the primary's position, replaying all WAL received
+            # is the best sign of having caught up
+            caught_up = replayed is not None and replayed >= (
+                received if primary_lsn is None else primary_lsn
+            )
+            if caught_up:
+                replica.lag = 0.0
+            else:
+                replica.lag = None if replay_age is None else float(replay_age)
+            replica.streaming = bool(streaming)
+            # a promoted replica is no longer following the primary
+            replica.healthy = (
+                bool(in_recovery)
+                and replica.streaming
+                and replica.lag is not None
+                and replica.lag <= self.max_lag
+            )
+            if healthy and not replica.healthy:
+                logger.warning(
+                    "Replica %s left rotation (lag %s s, %s)",
+                    replica.name,
+                    replica.lag,
+                    "streaming" if replica.streaming else "not streaming",
+                )
+        replica.checked_at = time.time()
+
+    async def _query_primary(self) -> Decimal:
+        async with self.primary.connect() as connection:
+            return (await connection.execute(PRIMARY_LSN_QUERY)).scalar()
+
+    async def _query_replica(self, replica: Replica) -> tuple:
+        async with replica.engine.connect() as connection:
+            return tuple((await connection.execute(REPLICA_QUERY)).one())
+
+    async def _check_periodically(self) -> None:
+        while True:
+            await self.check()
+            await asyncio.sleep(self.check_interval)
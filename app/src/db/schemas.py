@@ -1,5 +1,6 @@
 import uuid
-from typing import Optional
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional
 from pydantic import BaseModel, constr, UUID4
 
 
@@ -49,3 +50,100 @@ class FacultyCreate(TunedModel):
     faculty_id: UUID4
     faculty_name: str
     faculty_dean: str
+
+
+class StudentCreate(TunedModel):
+    fullname: constr(strip_whitespace=True, min_length=1)
+    student_id: constr(strip_whitespace=True, min_length=1)
+    gender: constr(strip_whitespace=True, min_length=1)
+    course: int
+    qr_code: constr(strip_whitespace=True, min_length=1)
+    group: Optional[int]
+    profession: Optional[int]
+    student_image: str = ""
+
+
+class StudentRowError(TunedModel):
+    line: int
+    error: str
+
+
+class StudentBulkCreateResponse(TunedModel):
+    inserted: int
+    failed: int
+    errors: List[StudentRowError]
+
+
+class StudentPhotoResponse(TunedModel):
+    student_id: str
+    student_image: str
+    sha256: str
+    size: int
+    deduplicated: bool
+    variants: Dict[str, str]
+
+
+class CheckInRequest(TunedModel):
+    qr_code: Optional[constr(min_length=1)]
+    student_id: Optional[constr(min_length=1)]
+
+
+class CheckInResponse(TunedModel):
+    student_id: str
+    fullname: str
+    change_id: Optional[int]
+    attended_time: datetime
+    persisted: bool
+
+
+class AttendanceReportRow(TunedModel):
+    attendance_date: Optional[date]
+    group_id: Optional[int]
+    group_name: Optional[str]
+    study_year: Optional[str]
+    change_id: Optional[int]
+    change_name: Optional[str]
+    check_ins: int
+    students: int
+    days: int
+    enrolled: Optional[int]
+    rate: Optional[float]
+
+
+class AttendanceReport(TunedModel):
+    date_from: date
+    date_to: date
+    rows: List[AttendanceReportRow]
+
+
+class AttendanceRecord(TunedModel):
+    id: uuid.UUID
+    student_id: str
+    fullname: str
+    attended_time: datetime
+    change_id: Optional[int]
+    group_id: Optional[int]
+
+
+class AttendanceRecordPage(TunedModel):
+    items: List[AttendanceRecord]
+    next_cursor: Optional[str]
+
+
+class RecognitionMatch(TunedModel):
+    student_id: str
+    fullname: Optional[str]
+    distance: float
+
+
+class RecognizedFace(TunedModel):
+    matches: List[RecognitionMatch]
+
+
+class RecognitionResponse(TunedModel):
+    faces: List[RecognizedFace]
+
+
+class Page(TunedModel):
+    items: List[Dict[str, Any]]
+    next_cursor: Optional[str]
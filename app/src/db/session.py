@@ -1,26 +1,120 @@
 from typing import Generator
 
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from src.core.metrics import instrument_engine, registry
 from src.core.settings import variables
+from src.db.pool import InstrumentedQueuePool
+from src.db.replicas import ReplicaSet
 from sqlalchemy.orm import declarative_base
 
 Base = declarative_base()
 
-engine = create_async_engine(
-    variables.database,
-    future=True,
-    echo=True,
-    # execution_options={"isolation_level": "AUTOCOMMIT"},
+
+def _create_engine(url: str):
+    engine = create_async_engine(
+        url,
+        future=True,
+        echo=variables.db_echo,
+        poolclass=InstrumentedQueuePool,
+        pool_size=variables.db_pool_size,
+        max_overflow=variables.db_max_overflow,
+        pool_timeout=variables.db_pool_timeout,
+        pool_recycle=variables.db_pool_recycle,
+        pool_pre_ping=variables.db_pool_pre_ping,
+        # execution_options={"isolation_level": "AUTOCOMMIT"},
+    )
+    instrument_engine(engine)
+    return engine
+
+
+engine = _create_engine(variables.database)
+
+replicas = ReplicaSet(
+    [_create_engine(url) for url in variables.database_replicas],
+    max_lag=variables.db_replica_max_lag,
+    check_interval=variables.db_replica_check_interval,
+    primary=engine,
 )
 
+
+@registry.collector
+def _pool_metrics():
+    engines = [("primary", engine)]
+    engines += [(replica.name, replica.engine) for replica in replicas.replicas]
+    pools = [({"database": name}, db.sync_engine.pool) for name, db in engines]
+    yield (
+        "db_pool_checked_out",
+        "gauge",
+        "Connections checked out of the pool.",
+        [(labels, pool.checkedout()) for labels, pool in pools],
+    )
+    yield (
+        "db_pool_checkout_timeouts_total",
+        "counter",
+        "Checkouts that timed out waiting for a connection.",
+        [(labels, pool.checkout_timeouts) for labels, pool in pools],
+    )
+
+
+class RoutingSession(Session):
+    """Sends plain SELECTs to a healthy replica and everything else to the primary.
+
+    The first statement that is not a plain SELECT (a flush, DML, locking
+    read, raw SQL) pins the session to the primary, so a request reads its
+    own writes. Reads before that stay on the one replica chosen for the
+    session, and go to the primary when no replica is in rotation.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        primary = super().get_bind(mapper=mapper, clause=clause, **kw)
+        if not replicas or self.info.get("pinned"):
+            return primary
+        if (
+            self._flushing
+            or clause is None
+            or not clause.is_select
+            or getattr(clause, "_for_update_arg", None) is not None
+        ):
+            self.info["pinned"] = True
+            return primary
+        if "replica" not in self.info:
+            self.info["replica"] = replicas.choose()
+        replica = self.info["replica"]
+        return primary if replica is None else replica.engine.sync_engine
+
+
+def pin_to_primary(session: AsyncSession) -> None:
+    """Send the rest of a routed session's reads to the primary as well.
+
+    For reads that must not be stale: a row written a moment ago, or one a
+    cache is about to keep.
+    """
+    session.sync_session.info["pinned"] = True
+
+
+# background services read and write in one go, so they stay on the primary
 async_session = sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
 
+routed_session = sessionmaker(
+    engine,
+    expire_on_commit=False,
+    class_=AsyncSession,
+    sync_session_class=RoutingSession,
+)
+
 
 async def get_db() -> Generator:
-    """Dependency for getting async session"""
+    """Dependency for getting async session.
+
+    The session is the request's unit of work: every statement the request
+    runs shares one transaction per database and one pooled connection each.
+    Reads go to a read replica until the first write; handlers commit once
+    their writes are done; anything left uncommitted is rolled back when the
+    session closes.
+    """
     try:
-        session: AsyncSession = async_session()
+        session: AsyncSession = routed_session()
         yield session
     finally:
         await session.close()
@@ -1,26 +1,141 @@
-import uvicorn
-from fastapi import FastAPI
-from fastapi.responses import RedirectResponse
+from contextlib import asynccontextmanager
+
+from fastapi import Depends, FastAPI, Request
+from fastapi.responses import (
+    JSONResponse,
+    ORJSONResponse,
+    PlainTextResponse,
+    RedirectResponse,
+)
 from fastapi.routing import APIRouter
 from fastapi.staticfiles import StaticFiles
 
-from src.api.api_v1.login_api import login_router
+from src.api.api_v1.attendance_api import attendance_router
+from src.api.api_v1.internal_api import internal_router
+from src.api.api_v1.login_api import get_current_admin_from_token, login_router
+from src.api.api_v1.recognition import recognition_router
+from src.api.api_v1.reference_api import (
+    change_router,
+    faculty_router,
+    group_router,
+    profession_router,
+)
+from src.api.api_v1.students_api import student_router
 from src.api.api_v1.users_api import user_router
+from src.core.metrics import MetricsMiddleware, registry
+from src.core.shared_cache import invalidation_bus, redis
+from src.core.system import ServiceOverloadedError
+from src.core.utils import async_hasher
+from src.db.session import replicas
+from src.services.attendance import attendance_writer
+from src.services.partitions import attendance_partitions
+from src.services.recognition import recognition_service
+from src.services.student_index import student_index
+
 
-app = FastAPI(title="Attendance System")
-app.mount("/static", StaticFiles(directory="static"), name="static")
-main_router = APIRouter()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start the background services without waiting on any of them.
+
+    The student index, face encodings and recognition pool load in the
+    background; /ready reports when check-ins can be served, and routes
+    that need a component answer 503 until it is there.
+    """
+    replicas.start_checking()
+    invalidation_bus.start()
+    student_index.start_refreshing()
+    await attendance_writer.start()
+    recognition_service.start_building()
+    attendance_partitions.start()
+    yield
+    await attendance_writer.stop()
+    await student_index.stop_refreshing()
+    await recognition_service.stop_building()
+    await attendance_partitions.stop()
+    await replicas.stop_checking()
+    await replicas.dispose()
+    await invalidation_bus.stop()
+    if redis is not None:
+        await redis.close()
+    async_hasher.executor.shutdown()
+    recognition_service.executor.shutdown()
 
 
-@app.get("/")
 async def docs_redirect():
     return RedirectResponse(url="/docs")
 
 
-main_router.include_router(user_router, prefix="/user", tags=["user"])
-main_router.include_router(login_router, prefix="/login", tags=["login"])
-app.include_router(main_router)
+async def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
+async def health():
+    return {"status": "ok"}
+
+
+async def ready():
+    components = {
+        "student_index": student_index.loaded,
+        "recognition": recognition_service.ready,
+    }
+    # check-ins only need the student index; recognition answers 503 itself
+    return JSONResponse(
+        status_code=200 if student_index.loaded else 503, content=components
+    )
+
+
+async def service_overloaded_handler(request: Request, exc: ServiceOverloadedError):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+def create_app() -> FastAPI:
+    """Build the application; the services it drives are module singletons"""
+    app = FastAPI(title="Attendance System", default_response_class=ORJSONResponse)
+    # FastAPI 0.88 has no lifespan argument yet, its router does
+    app.router.lifespan_context = lifespan
+    app.add_middleware(MetricsMiddleware)
+    app.mount("/static", StaticFiles(directory="static"), name="static")
+    app.add_api_route("/", docs_redirect, methods=["GET"])
+    app.add_api_route("/metrics", metrics, methods=["GET"], include_in_schema=False)
+    app.add_api_route("/health", health, methods=["GET"], include_in_schema=False)
+    app.add_api_route("/ready", ready, methods=["GET"], include_in_schema=False)
+    app.add_exception_handler(ServiceOverloadedError, service_overloaded_handler)
+
+    main_router = APIRouter()
+    main_router.include_router(user_router, prefix="/user", tags=["user"])
+    main_router.include_router(login_router, prefix="/login", tags=["login"])
+    main_router.include_router(student_router, prefix="/student", tags=["student"])
+    main_router.include_router(group_router, prefix="/group", tags=["group"])
+    main_router.include_router(faculty_router, prefix="/faculty", tags=["faculty"])
+    main_router.include_router(
+        profession_router, prefix="/profession", tags=["profession"]
+    )
+    main_router.include_router(change_router, prefix="/change", tags=["change"])
+    main_router.include_router(
+        attendance_router, prefix="/attendance", tags=["attendance"]
+    )
+    main_router.include_router(
+        recognition_router, prefix="/recognition", tags=["recognition"]
+    )
+    main_router.include_router(
+        internal_router,
+        prefix="/internal",
+        tags=["internal"],
+        include_in_schema=False,
+        dependencies=[Depends(get_current_admin_from_token)],
+    )
+    app.include_router(main_router)
+    return app
+
+
+app = create_app()
 
 
 if __name__ == "__main__":
+    import uvicorn
+
     uvicorn.run(app, host="0.0.0.0", port=8000)
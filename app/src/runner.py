@@ -0,0 +1,308 @@
+"""Production runner: a master process forking uvicorn workers.
+
+    python -m src.runner [--host 0.0.0.0] [--port 8000] [--workers N]
+
+The master imports the app and loads the read-mostly state once: the student
+index, packed into flat arrays, and the face encodings, brought up to date
+with the students' photos and stored in a memory-mapped file. It then
+freezes the garbage collector and forks the workers, which all accept on the
+socket the master bound. Their copy of that state is the master's pages,
+shared copy-on-write and only read, so an extra worker costs its own heap
+and not another copy of the index.
+
+SIGHUP, and every WEB_RELOAD_SECONDS, loads fresh state in the master and
+forks a new generation of workers. The old generation is asked to stop only
+once every new worker accepts connections, and finishes the requests it has
+in flight, so a reload drops nothing. Workers do not run full index reloads
+or encoding builds themselves; the new generation replaces them. SIGTERM or
+SIGINT stops the workers gracefully and exits; a worker that dies is
+replaced.
+
+Each worker keeps its own recognition pool of RECOGNITION_MAX_WORKERS
+processes and its own /metrics.
+"""
+import argparse
+import asyncio
+import gc
+import math
+import os
+import select
+import signal
+import time
+from logging import getLogger
+from typing import Dict, List
+
+import uvicorn
+from src.core.settings import variables
+from src.db.session import async_session, engine, replicas
+from src.main import app
+from src.services.recognition import recognition_service
+from src.services.student_index import student_index
+
+logger = getLogger(__name__)
+
+# how long a new generation may take to accept connections
+STARTUP_TIMEOUT = 60
+# how long a stopping worker keeps reading requests off accepted connections
+DRAIN_DELAY = 1.0
+
+
+async def preload() -> None:
+    """Load the state the next generation of workers will share"""
+    try:
+        async with async_session() as session:
+            await student_index.load(session)
+    except Exception:
+        logger.exception("Preloading the student index failed")
+    try:
+        # maps the stored version first, so a failed build still serves it
+        await recognition_service.build()
+    except Exception:
+        logger.exception("Building face encodings failed")
+    # pooled connections belong to this event loop; children open their own
+    await engine.dispose()
+    await replicas.dispose()
+
+
+def _drain(server: uvicorn.Server) -> None:
+    """Stop accepting, then let uvicorn shut down.
+
+    uvicorn closes connections that have not sent a request yet as soon as
+    it shuts down, which resets the ones accepted just before. Closing the
+    listeners first leaves the other workers to accept new connections
+    while this one reads the requests already on its connections.
+    """
+    for listener in server.servers:
+        listener.close()
+    asyncio.get_running_loop().call_later(
+        DRAIN_DELAY, setattr, server, "should_exit", True
+    )
+
+
+async def _serve(server: uvicorn.Server, sock, ready_fd: int) -> None:
+    serving = asyncio.create_task(server.serve(sockets=[sock]))
+    while not server.started and not serving.done():
+        await asyncio.sleep(0.05)
+    if server.started:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, _drain, server)
+        os.write(ready_fd, b".")
+    os.close(ready_fd)
+    await serving
+
+
+class Runner:
+    def __init__(
+        self,
+        config: uvicorn.Config,
+        workers: int,
+        graceful_timeout: float,
+        reload_interval: float,
+    ):
+        self.config = config
+        self.workers = workers
+        self.graceful_timeout = graceful_timeout
+        self.reload_interval = reload_interval
+        self.generation = 0
+        # pid -> generation
+        self.children: Dict[int, int] = {}
+        # pid -> monotonic time after which a stopping worker is killed
+        self.deadlines: Dict[int, float] = {}
+        self.signals: List[int] = []
+        self.sock = None
+        self._wakeup_read = self._wakeup_write = -1
+
+    def run(self) -> None:
+        self.sock = self.config.bind_socket()
+        self._wakeup_read, self._wakeup_write = os.pipe()
+        os.set_blocking(self._wakeup_read, False)
+        os.set_blocking(self._wakeup_write, False)
+        signal.set_wakeup_fd(self._wakeup_write)
+        for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP, signal.SIGCHLD):
+            signal.signal(signum, self._on_signal)
+        if not variables.redis_url and self.workers > 1:
+            logger.warning(
+                "REDIS_URL is not set: %s workers cache users on their own, and"
+                " one of them revoking a user leaves the others serving the old"
+                " roles for up to USER_CACHE_TTL_SECONDS",
+                self.workers,
+            )
+        student_index.packed = True
+        self._preload()
+        self._spawn(self.workers)
+        next_reload = time.monotonic() + (self.reload_interval or math.inf)
+        while True:
+            select.select([self._wakeup_read], [], [], 1.0)
+            self._drain_wakeups()
+            self._reap()
+            received, self.signals = self.signals, []
+            if signal.SIGTERM in received or signal.SIGINT in received:
+                self._stop()
+                return
+            if signal.SIGHUP in received or time.monotonic() >= next_reload:
+                self._reload()
+                next_reload = time.monotonic() + (self.reload_interval or math.inf)
+            self._kill_overdue()
+            missing = self.workers - self._current_count()
+            if missing > 0:
+                logger.warning("Replacing %s worker(s)", missing)
+                self._spawn(missing)
+
+    def _on_signal(self, signum, frame) -> None:
+        self.signals.append(signum)
+
+    def _drain_wakeups(self) -> None:
+        try:
+            while os.read(self._wakeup_read, 512):
+                pass
+        except BlockingIOError:
+            pass
+
+    def _preload(self) -> None:
+        started = time.perf_counter()
+        asyncio.run(preload())
+        # keep the collector from writing to every shared object's header;
+        # workers never unfreeze, a full collection would touch them all
+        gc.freeze()
+        logger.info(
+            "Preloaded %s students and %s face encodings in %.1fs",
+            len(student_index),
+            len(recognition_service.matcher),
+            time.perf_counter() - started,
+        )
+
+    def _spawn(self, count: int) -> int:
+        """Fork ``count`` workers of the current generation, return how many came up"""
+        ready_read, ready_write = os.pipe()
+        for _ in range(count):
+            pid = os.fork()
+            if pid == 0:
+                os.close(ready_read)
+                self._worker(ready_write)
+            self.children[pid] = self.generation
+        os.close(ready_write)
+        ready = 0
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while ready < count and time.monotonic() < deadline:
+            if not select.select([ready_read], [], [], 1.0)[0]:
+                continue
+            data = os.read(ready_read, count)
+            if not data:
+                # every child closed its end, the rest failed to start
+                break
+            ready += len(data)
+        os.close(ready_read)
+        return ready
+
+    def _worker(self, ready_fd: int) -> None:
+        status = 1
+        try:
+            signal.set_wakeup_fd(-1)
+            os.close(self._wakeup_read)
+            os.close(self._wakeup_write)
+            for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+                signal.signal(signum, signal.SIG_DFL)
+            signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+            # the master reloads the full index and rebuilds the encodings
+            # by replacing the workers
+            student_index.full_reload_interval = math.inf
+            recognition_service.refresh_interval = math.inf
+            asyncio.run(_serve(uvicorn.Server(self.config), self.sock, ready_fd))
+            status = 0
+        except BaseException:
+            logger.exception("Worker %s failed", os.getpid())
+        finally:
+            os._exit(status)
+
+    def _reload(self) -> None:
+        previous = [
+            pid
+            for pid, generation in self.children.items()
+            if generation == self.generation
+        ]
+        logger.info("Reloading: starting generation %s", self.generation + 1)
+        self._preload()
+        self.generation += 1
+        ready = self._spawn(self.workers)
+        if ready < self.workers:
+            logger.error(
+                "Only %s of %s new workers started, keeping the old generation",
+                ready,
+                self.workers,
+            )
+            failed = [
+                pid
+                for pid, generation in self.children.items()
+                if generation == self.generation
+            ]
+            self.generation -= 1
+            self._terminate(failed)
+            return
+        self._terminate(previous)
+
+    def _terminate(self, pids: List[int]) -> None:
+        deadline = time.monotonic() + self.graceful_timeout
+        for pid in pids:
+            self.deadlines[pid] = deadline
+            self._kill(pid, signal.SIGTERM)
+
+    def _kill_overdue(self) -> None:
+        now = time.monotonic()
+        for pid, deadline in list(self.deadlines.items()):
+            if now >= deadline:
+                logger.warning("Worker %s did not stop in time, killing it", pid)
+                self._kill(pid, signal.SIGKILL)
+                del self.deadlines[pid]
+
+    def _stop(self) -> None:
+        self._terminate(list(self.children))
+        while self.children:
+            self._reap()
+            self._kill_overdue()
+            time.sleep(0.1)
+        self.sock.close()
+
+    def _reap(self) -> None:
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            generation = self.children.pop(pid, None)
+            stopping = self.deadlines.pop(pid, None) is not None
+            if generation == self.generation and not stopping:
+                logger.warning(
+                    "Worker %s exited with status %s",
+                    pid,
+                    os.waitstatus_to_exitcode(status),
+                )
+
+    def _current_count(self) -> int:
+        return sum(
+            generation == self.generation and pid not in self.deadlines
+            for pid, generation in self.children.items()
+        )
+
+    @staticmethod
+    def _kill(pid: int, signum: int) -> None:
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--workers", type=int, default=variables.web_workers or os.cpu_count()
+    )
+    arguments = parser.parse_args()
+    Runner(
+        uvicorn.Config(app, host=arguments.host, port=arguments.port, lifespan="on"),
+        workers=arguments.workers,
+        graceful_timeout=variables.web_graceful_timeout,
+        reload_interval=variables.web_reload_interval,
+    ).run()
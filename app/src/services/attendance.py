@@ -0,0 +1,265 @@
+import asyncio
+import time
+import uuid
+from datetime import datetime
+from logging import getLogger
+from typing import Callable, List, Optional, Tuple
+
+from sqlalchemy.exc import DBAPIError, InterfaceError
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from src.core.settings import variables
+from src.core.system import LatencyStats, ServiceOverloadedError
+from src.db.crud import AttendanceDAL
+from src.db.session import async_session
+from src.services.student_index import StudentRecord
+
+logger = getLogger(__name__)
+
+# postgres caps a statement at 32767 bind parameters, six per attendance row
+MAX_ROWS_PER_INSERT = 32767 // 6
+# longest pause between two attempts at the same batch
+MAX_RETRY_DELAY = 5.0
+# SQLSTATE classes worth retrying the same batch for: connection exceptions,
+# transaction rollbacks (serialization failures, deadlocks), insufficient
+# resources and operator intervention (shutdowns, failover)
+TRANSIENT_SQLSTATE_CLASSES = ("08", "40", "53", "57")
+# data exceptions and integrity constraint violations, caused by some row
+ROW_SQLSTATE_CLASSES = ("22", "23")
+
+_STOP = object()
+
+
+def _sqlstate(err: Exception) -> str:
+    return getattr(getattr(err, "orig", None), "sqlstate", None) or ""
+
+
+def _is_transient(err: Exception) -> bool:
+    if isinstance(err, (OSError, asyncio.TimeoutError, PoolTimeoutError)):
+        return True
+    if not isinstance(err, DBAPIError):
+        return False
+    return (
+        err.connection_invalidated
+        or isinstance(err, InterfaceError)
+        or _sqlstate(err)[:2] in TRANSIENT_SQLSTATE_CLASSES
+    )
+
+
+def _is_row_error(err: Exception) -> bool:
+    return isinstance(err, DBAPIError) and _sqlstate(err)[:2] in ROW_SQLSTATE_CLASSES
+
+
+class AttendanceWriter:
+    """Acknowledges check-ins at once and writes them to general_attendance
+    in batches.
+
+    Check-ins wait in a bounded queue; a single background task flushes them
+    as one multi-row INSERT whenever ``batch_size`` rows are queued or
+    ``flush_interval`` seconds have passed since the first queued row. A full
+    queue rejects new check-ins with ServiceOverloadedError. Durable callers
+    get a future that resolves once their batch is committed. The daily
+    report summaries are updated in the same transaction as each batch.
+
+    A batch the database cannot take right now (lost connection, failover,
+    deadlock) is retried ``write_retries`` times with exponential backoff
+    from ``write_backoff`` seconds. Rows a retry finds already stored, its
+    earlier commit having landed after all, are skipped. A batch the
+    database rejects for a row's content is split in halves until the
+    offending rows are alone; only those are dropped, logged and counted as
+    failed.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable = async_session,
+        queue_size: int = 10000,
+        batch_size: int = 500,
+        flush_interval: float = 0.5,
+        retry_after: int = 1,
+        write_retries: int = 5,
+        write_backoff: float = 0.2,
+    ):
+        self.session_factory = session_factory
+        self.queue_size = queue_size
+        self.batch_size = min(batch_size, MAX_ROWS_PER_INSERT)
+        self.flush_interval = flush_interval
+        self.retry_after = retry_after
+        self.write_retries = write_retries
+        self.write_backoff = write_backoff
+        self.accepted = 0
+        self.rejected = 0
+        self.written = 0
+        self.failed = 0
+        self.retried = 0
+        self.replayed = 0
+        self.flush_latency = LatencyStats()
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Flush everything already accepted, then stop the writer task"""
+        if not self.running:
+            return
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+
+    def submit(
+        self, student: StudentRecord, durable: bool = False
+    ) -> Tuple[dict, Optional[asyncio.Future]]:
+        if not self.running or self._queue.full():
+            self.rejected += 1
+            raise ServiceOverloadedError("attendance writer", self.retry_after)
+        record = {
+            "id": uuid.uuid4(),
+            "attended_student_id": student.student_id,
+            "attended_student_name": student.fullname,
+            "attended_time": datetime.now(),
+            "attended_change": student.change_id,
+            "students_qr_code": student.qr_code,
+        }
+        future = asyncio.get_running_loop().create_future() if durable else None
+        self._queue.put_nowait((record, student.group_id, future))
+        self.accepted += 1
+        return record, future
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "queue_size": self.queue_size,
+            "batch_size": self.batch_size,
+            "flush_interval_seconds": self.flush_interval,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "written": self.written,
+            "failed": self.failed,
+            "retried": self.retried,
+            "replayed": self.replayed,
+            "flush": self.flush_latency.as_dict(),
+        }
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[tuple]) -> None:
+        started = time.perf_counter()
+        try:
+            await self._write(batch)
+        finally:
+            self.flush_latency.observe(time.perf_counter() - started)
+
+    async def _write(self, batch: List[tuple]) -> None:
+        err = await self._insert_with_retries(batch)
+        if err is None:
+            self.written += len(batch)
+            self._resolve(batch, None)
+        elif len(batch) > 1 and _is_row_error(err):
+            middle = len(batch) // 2
+            await self._write(batch[:middle])
+            await self._write(batch[middle:])
+        else:
+            logger.error(
+                "Dropping %s check-ins (%s): %s",
+                len(batch),
+                err,
+                ", ".join(
+                    f"{record['attended_student_id']}@{record['attended_time']}"
+                    for record, _, _ in batch
+                ),
+            )
+            self.failed += len(batch)
+            self._resolve(batch, err)
+
+    async def _insert_with_retries(self, batch: List[tuple]) -> Optional[Exception]:
+        """Commit a batch, returns the error that stopped it if it was not"""
+        for attempt in range(self.write_retries + 1):
+            try:
+                await self._insert(batch)
+                return None
+            except Exception as err:
+                if not _is_transient(err) or attempt == self.write_retries:
+                    return err
+                delay = min(self.write_backoff * 2**attempt, MAX_RETRY_DELAY)
+                logger.warning(
+                    "Writing %s check-ins failed (%s), retrying in %.1fs",
+                    len(batch),
+                    err,
+                    delay,
+                )
+                self.retried += 1
+                await asyncio.sleep(delay)
+
+    async def _insert(self, batch: List[tuple]) -> None:
+        records = [record for record, _, _ in batch]
+        async with self.session_factory() as session:
+            attendance_dal = AttendanceDAL(session)
+            inserted = await attendance_dal.insert_attendance(records)
+            # rows a retry finds already stored were counted when they were
+            visits = [
+                (
+                    record["attended_time"].date(),
+                    record["attended_student_id"],
+                    group_id or 0,
+                    record["attended_change"] or 0,
+                )
+                for record, group_id, _ in batch
+                if record["id"] in inserted
+            ]
+            if visits:
+                await attendance_dal.record_daily_attendance(visits)
+            await session.commit()
+        self.replayed += len(records) - len(inserted)
+
+    @staticmethod
+    def _resolve(batch: List[tuple], err: Optional[Exception]) -> None:
+        for _, _, future in batch:
+            if future is None or future.done():
+                continue
+            if err is None:
+                future.set_result(None)
+            else:
+                future.set_exception(err)
+
+
+attendance_writer = AttendanceWriter(
+    queue_size=variables.attendance_queue_size,
+    batch_size=variables.attendance_batch_size,
+    flush_interval=variables.attendance_flush_interval,
+    retry_after=variables.attendance_retry_after,
+    write_retries=variables.attendance_write_retries,
+    write_backoff=variables.attendance_write_backoff,
+)
@@ -0,0 +1,185 @@
+import fcntl
+import json
+import os
+from contextlib import contextmanager
+from logging import getLogger
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from src.services.face_matcher import ENCODING_SIZE
+
+logger = getLogger(__name__)
+
+STORE_FORMAT = 1
+
+
+class EncodingSnapshot(NamedTuple):
+    version: int
+    student_ids: List[str]
+    encodings: np.ndarray
+    fingerprints: Dict[str, str]
+    # photos that yielded no face, kept so they are not retried every build
+    unencodable: Dict[str, str]
+
+
+def image_fingerprint(path: str) -> Optional[str]:
+    """Cheap change marker for a stored photo, None when it is missing"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return f"{path}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+class EncodingStore:
+    """Versioned on-disk face encodings shared by every worker.
+
+    A build writes ``encodings-<version>.npy`` (an (n, 128) float32 matrix)
+    and ``encodings-<version>.json`` (student ids and photo fingerprints),
+    then points ``CURRENT`` at the new version. Readers memory-map the matrix,
+    so workers share the page cache instead of holding private copies, and
+    a rebuild only re-encodes students whose photo fingerprint changed.
+    """
+
+    def __init__(self, directory: str, keep_versions: int = 2):
+        self.directory = directory
+        self.keep_versions = keep_versions
+
+    def open(self) -> Optional[EncodingSnapshot]:
+        version = self._current_version()
+        if version is None:
+            return None
+        with open(self._path(version, "json")) as index_file:
+            index = json.load(index_file)
+        if index.get("format") != STORE_FORMAT:
+            logger.warning("Ignoring encoding store in format %s", index.get("format"))
+            return None
+        encodings = np.load(self._path(version, "npy"), mmap_mode="r")
+        return EncodingSnapshot(
+            version,
+            index["student_ids"],
+            encodings,
+            index["fingerprints"],
+            index["unencodable"],
+        )
+
+    def build(
+        self,
+        rows: Iterable[Tuple[str, str]],
+        media_root: str,
+        encode: Callable[[str], Optional[np.ndarray]],
+    ) -> EncodingSnapshot:
+        """Bring the store up to date with (student_id, image path) rows.
+
+        Holds an exclusive lock so concurrent workers build at most once.
+        """
+        with self._lock():
+            current = self.open()
+            previous = {}
+            if current is not None:
+                previous = {
+                    student_id: row
+                    for row, student_id in enumerate(current.student_ids)
+                }
+            student_ids, encodings, fingerprints, unencodable = [], [], {}, {}
+            encoded = 0
+            for student_id, image_path in rows:
+                if not image_path:
+                    continue
+                path = os.path.join(media_root, image_path)
+                fingerprint = image_fingerprint(path)
+                if fingerprint is None:
+                    continue
+                row = previous.get(student_id)
+                if row is not None and current.fingerprints[student_id] == fingerprint:
+                    encoding = current.encodings[row]
+                elif (
+                    current is not None
+                    and current.unencodable.get(student_id) == fingerprint
+                ):
+                    unencodable[student_id] = fingerprint
+                    continue
+                else:
+                    encoding = encode(path)
+                    encoded += 1
+                    if encoding is None:
+                        unencodable[student_id] = fingerprint
+                        continue
+                student_ids.append(student_id)
+                encodings.append(encoding)
+                fingerprints[student_id] = fingerprint
+            if (
+                current is not None
+                and not encoded
+                and student_ids == current.student_ids
+                and unencodable == current.unencodable
+            ):
+                return current
+            matrix = np.empty((len(encodings), ENCODING_SIZE), dtype=np.float32)
+            for row, encoding in enumerate(encodings):
+                matrix[row] = encoding
+            version = current.version + 1 if current is not None else 1
+            self._write(version, student_ids, matrix, fingerprints, unencodable)
+            logger.info(
+                "Encoding store v%s: %s students, %s re-encoded",
+                version,
+                len(student_ids),
+                encoded,
+            )
+            return self.open()
+
+    def _write(
+        self,
+        version: int,
+        student_ids: List[str],
+        matrix: np.ndarray,
+        fingerprints: Dict[str, str],
+        unencodable: Dict[str, str],
+    ) -> None:
+        matrix_path = self._path(version, "npy")
+        with open(matrix_path + ".tmp", "wb") as matrix_file:
+            np.save(matrix_file, matrix)
+        os.replace(matrix_path + ".tmp", matrix_path)
+        index_path = self._path(version, "json")
+        with open(index_path + ".tmp", "w") as index_file:
+            json.dump(
+                {
+                    "format": STORE_FORMAT,
+                    "student_ids": student_ids,
+                    "fingerprints": fingerprints,
+                    "unencodable": unencodable,
+                },
+                index_file,
+            )
+        os.replace(index_path + ".tmp", index_path)
+        current_path = os.path.join(self.directory, "CURRENT")
+        with open(current_path + ".tmp", "w") as current_file:
+            current_file.write(str(version))
+        os.replace(current_path + ".tmp", current_path)
+        # mapped files stay readable for workers that still have them open
+        for old_version in range(version - self.keep_versions, 0, -1):
+            for extension in ("npy", "json"):
+                try:
+                    os.remove(self._path(old_version, extension))
+                except FileNotFoundError:
+                    pass
+
+    def _current_version(self) -> Optional[int]:
+        try:
+            with open(os.path.join(self.directory, "CURRENT")) as current_file:
+                return int(current_file.read().strip())
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _path(self, version: int, extension: str) -> str:
+        return os.path.join(self.directory, f"encodings-{version}.{extension}")
+
+    @contextmanager
+    def _lock(self):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, ".lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
@@ -0,0 +1,64 @@
+import io
+import os
+from logging import getLogger
+from typing import List, Optional
+
+import numpy as np
+from src.services.face_matcher import ENCODING_SIZE
+from src.services.photos import decode_image, variant_path
+
+logger = getLogger(__name__)
+
+
+def load_models() -> None:
+    """Import face_recognition, which loads the dlib models it ships.
+
+    That takes seconds, so it happens on first use (or in a pool warm-up)
+    rather than when the app is imported; login and CRUD never pay for it.
+    """
+    import face_recognition  # noqa: F401
+
+
+def encode_faces(image: np.ndarray) -> np.ndarray:
+    """(faces, 128) encodings of every face found in an RGB image array"""
+    import face_recognition
+
+    locations = face_recognition.face_locations(image)
+    if not locations:
+        return np.empty((0, ENCODING_SIZE), dtype=np.float32)
+    return np.asarray(
+        face_recognition.face_encodings(image, known_face_locations=locations),
+        dtype=np.float32,
+    )
+
+
+def encode_probe(data: bytes, max_side: Optional[int] = None) -> np.ndarray:
+    """Encodings of every face in an uploaded image, decoded from memory"""
+    return encode_faces(decode_image(io.BytesIO(data), max_side=max_side))
+
+
+def encode_probes(
+    images: List[bytes], max_side: Optional[int] = None
+) -> List[np.ndarray]:
+    """encode_probe over a micro-batch, run in one pool worker"""
+    return [encode_probe(data, max_side) for data in images]
+
+
+def encode_image_file(path: str) -> Optional[np.ndarray]:
+    """Encoding of the first face in a stored student photo.
+
+    Reads the downscaled "encoding" variant made at upload when there is one.
+    """
+    encoding_path = variant_path(path, "encoding")
+    if os.path.exists(encoding_path):
+        path = encoding_path
+    try:
+        image = decode_image(path)
+    except (OSError, ValueError) as err:
+        logger.warning("Cannot read student image %s: %s", path, err)
+        return None
+    encodings = encode_faces(image)
+    if not len(encodings):
+        logger.warning("No face found in student image %s", path)
+        return None
+    return encodings[0]
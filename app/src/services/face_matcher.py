@@ -0,0 +1,355 @@
+import math
+from typing import List, NamedTuple, Sequence, Tuple
+
+import numpy as np
+
+ENCODING_SIZE = 128
+
+
+class FaceMatch(NamedTuple):
+    student_id: str
+    distance: float
+
+
+def _as_encodings(encodings: np.ndarray) -> np.ndarray:
+    return np.ascontiguousarray(encodings, dtype=np.float32).reshape(-1, ENCODING_SIZE)
+
+
+def _squared_norms(matrix: np.ndarray) -> np.ndarray:
+    return np.einsum("ij,ij->i", matrix, matrix)
+
+
+def _distances(
+    probes: np.ndarray, matrix: np.ndarray, sq_norms: np.ndarray
+) -> np.ndarray:
+    """(probes, rows) euclidean distances"""
+    # |a - b|^2 = |a|^2 - 2ab + |b|^2: one product for the whole batch
+    distances = probes @ matrix.T
+    distances *= -2.0
+    distances += sq_norms
+    distances += _squared_norms(probes)[:, None]
+    np.maximum(distances, 0.0, out=distances)
+    return np.sqrt(distances, out=distances)
+
+
+def _ranked(distances: np.ndarray, k: int, tolerance: float) -> List[Tuple[int, float]]:
+    """(column, distance) of up to k columns within tolerance, nearest first"""
+    k = min(k, len(distances))
+    if not k:
+        return []
+    columns = np.argpartition(distances, k - 1)[:k]
+    columns = columns[np.argsort(distances[columns])]
+    return [
+        (column, float(distances[column]))
+        for column in columns
+        if distances[column] <= tolerance
+    ]
+
+
+class FaceMatcher:
+    """Nearest known faces by euclidean distance over one contiguous matrix.
+
+    Every known encoding is a row of a single float32 matrix, so matching a
+    batch of probes is one matrix product instead of a Python loop over
+    students. This is the exact matcher the approximate ones are measured
+    against. ``load`` swaps in a whole new generation at once and ``add``
+    appends students to the current one; both replace the state with a
+    single assignment, so they may run in a thread while matches continue.
+    """
+
+    # whether add is meaningfully cheaper than loading everything again
+    incremental = False
+
+    def __init__(self):
+        self._state: Tuple[Sequence[str], np.ndarray, np.ndarray] = (
+            (),
+            np.empty((0, ENCODING_SIZE), dtype=np.float32),
+            np.empty(0, dtype=np.float32),
+        )
+
+    def __len__(self) -> int:
+        return len(self._state[0])
+
+    def load(self, student_ids: Sequence[str], encodings: np.ndarray) -> None:
+        matrix = _as_encodings(encodings)
+        if len(student_ids) != len(matrix):
+            raise ValueError("Expected one encoding per student id")
+        self._state = (tuple(student_ids), matrix, _squared_norms(matrix))
+
+    def add(self, student_ids: Sequence[str], encodings: np.ndarray) -> None:
+        """Append students without rebuilding what is already loaded"""
+        known_ids, matrix, sq_norms = self._state
+        added = _as_encodings(encodings)
+        if len(student_ids) != len(added):
+            raise ValueError("Expected one encoding per student id")
+        self._state = (
+            known_ids + tuple(student_ids),
+            np.concatenate([matrix, added]),
+            np.concatenate([sq_norms, _squared_norms(added)]),
+        )
+
+    def match(
+        self, probe: np.ndarray, k: int = 1, tolerance: float = 0.6
+    ) -> List[FaceMatch]:
+        return self.match_many(probe, k=k, tolerance=tolerance)[0]
+
+    def match_many(
+        self, probes: np.ndarray, k: int = 1, tolerance: float = 0.6
+    ) -> List[List[FaceMatch]]:
+        """Up to k matches within tolerance for each probe, nearest first"""
+        student_ids, matrix, sq_norms = self._state
+        probes = _as_encodings(probes)
+        if not student_ids:
+            return [[] for _ in range(len(probes))]
+        return [
+            [
+                FaceMatch(student_ids[column], distance)
+                for column, distance in _ranked(row, k, tolerance)
+            ]
+            for row in _distances(probes, matrix, sq_norms)
+        ]
+
+    def stats(self) -> dict:
+        return {"kind": "exact", "students": len(self)}
+
+
+class IVFFaceMatcher(FaceMatcher):
+    """Inverted-file index: k-means cells, only the nearest cells are scanned.
+
+    ``load`` clusters the encodings into ``n_lists`` cells (about sqrt(n) when
+    not given) and keeps the row numbers of every cell. A probe is compared
+    with the centroids first and then exactly with the rows of its ``nprobe``
+    nearest cells, so raising ``nprobe`` trades latency for recall. ``add``
+    files new students into their nearest existing cell without retraining;
+    a later ``load`` rebalances the cells.
+    """
+
+    incremental = True
+
+    def __init__(
+        self,
+        n_lists: int = 0,
+        nprobe: int = 8,
+        train_iterations: int = 10,
+        train_per_list: int = 64,
+        seed: int = 0,
+    ):
+        super().__init__()
+        self.n_lists = n_lists
+        self.nprobe = nprobe
+        self.train_iterations = train_iterations
+        self.train_per_list = train_per_list
+        self.seed = seed
+        # student ids, matrix, squared norms, centroids, their norms, cells
+        self._state = self._state + (
+            np.empty((0, ENCODING_SIZE), dtype=np.float32),
+            np.empty(0, dtype=np.float32),
+            (),
+        )
+
+    def load(self, student_ids: Sequence[str], encodings: np.ndarray) -> None:
+        matrix = _as_encodings(encodings)
+        if len(student_ids) != len(matrix):
+            raise ValueError("Expected one encoding per student id")
+        sq_norms = _squared_norms(matrix)
+        centroids = self._train(matrix)
+        centroid_norms = _squared_norms(centroids)
+        assignment = self._assign(matrix, sq_norms, centroids, centroid_norms)
+        order = np.argsort(assignment, kind="stable")
+        bounds = np.cumsum(np.bincount(assignment, minlength=len(centroids)))[:-1]
+        cells = tuple(np.split(order, bounds))
+        self._state = (
+            tuple(student_ids),
+            matrix,
+            sq_norms,
+            centroids,
+            centroid_norms,
+            cells,
+        )
+
+    def add(self, student_ids: Sequence[str], encodings: np.ndarray) -> None:
+        known_ids, matrix, sq_norms, centroids, centroid_norms, cells = self._state
+        if not len(centroids):
+            return self.load(
+                known_ids + tuple(student_ids),
+                np.concatenate([matrix, _as_encodings(encodings)]),
+            )
+        added = _as_encodings(encodings)
+        if len(student_ids) != len(added):
+            raise ValueError("Expected one encoding per student id")
+        added_norms = _squared_norms(added)
+        assignment = self._assign(added, added_norms, centroids, centroid_norms)
+        rows = np.arange(len(matrix), len(matrix) + len(added))
+        cells = list(cells)
+        for cell in np.unique(assignment):
+            cells[cell] = np.concatenate([cells[cell], rows[assignment == cell]])
+        self._state = (
+            known_ids + tuple(student_ids),
+            np.concatenate([matrix, added]),
+            np.concatenate([sq_norms, added_norms]),
+            centroids,
+            centroid_norms,
+            tuple(cells),
+        )
+
+    def match_many(
+        self, probes: np.ndarray, k: int = 1, tolerance: float = 0.6
+    ) -> List[List[FaceMatch]]:
+        student_ids, matrix, sq_norms, centroids, centroid_norms, cells = self._state
+        probes = _as_encodings(probes)
+        if not student_ids:
+            return [[] for _ in range(len(probes))]
+        nprobe = min(self.nprobe, len(centroids))
+        to_centroids = _distances(probes, centroids, centroid_norms)
+        probed = np.argpartition(to_centroids, nprobe - 1, axis=1)[:, :nprobe]
+        results = []
+        for probe, probe_cells in zip(probes, probed):
+            rows = np.concatenate([cells[cell] for cell in probe_cells])
+            distances = _distances(probe[None, :], matrix[rows], sq_norms[rows])[0]
+            results.append(
+                [
+                    FaceMatch(student_ids[rows[column]], distance)
+                    for column, distance in _ranked(distances, k, tolerance)
+                ]
+            )
+        return results
+
+    def stats(self) -> dict:
+        cells = self._state[5]
+        sizes = [len(cell) for cell in cells]
+        return {
+            "kind": "ivf",
+            "students": len(self),
+            "lists": len(cells),
+            "nprobe": self.nprobe,
+            "largest_list": max(sizes, default=0),
+        }
+
+    def _train(self, matrix: np.ndarray) -> np.ndarray:
+        if not len(matrix):
+            return np.empty((0, ENCODING_SIZE), dtype=np.float32)
+        n_lists = min(self.n_lists or max(1, int(math.sqrt(len(matrix)))), len(matrix))
+        random = np.random.default_rng(self.seed)
+        sample_size = min(len(matrix), n_lists * self.train_per_list)
+        sample = matrix[np.sort(random.choice(len(matrix), sample_size, replace=False))]
+        sample_norms = _squared_norms(sample)
+        centroids = sample[random.choice(len(sample), n_lists, replace=False)].copy()
+        for _ in range(self.train_iterations):
+            assignment = self._assign(
+                sample, sample_norms, centroids, _squared_norms(centroids)
+            )
+            counts = np.bincount(assignment, minlength=n_lists)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            filled = counts > 0
+            # an empty cell keeps its old centroid rather than collapsing to 0
+            centroids[filled] = sums[filled] / counts[filled, None]
+        return centroids
+
+    @staticmethod
+    def _assign(
+        matrix: np.ndarray,
+        sq_norms: np.ndarray,
+        centroids: np.ndarray,
+        centroid_norms: np.ndarray,
+        chunk_size: int = 16384,
+    ) -> np.ndarray:
+        """Nearest centroid of every row, in chunks to bound memory"""
+        assignment = np.empty(len(matrix), dtype=np.intp)
+        for start in range(0, len(matrix), chunk_size):
+            chunk = slice(start, start + chunk_size)
+            # |a|^2 is the same for every centroid, so it can be left out
+            scores = matrix[chunk] @ centroids.T
+            scores *= -2.0
+            scores += centroid_norms
+            assignment[chunk] = np.argmin(scores, axis=1)
+        return assignment
+
+
+class HNSWFaceMatcher(FaceMatcher):
+    """Hierarchical navigable small world graph from the optional hnswlib.
+
+    ``ef`` is the search breadth: higher values raise recall and latency.
+    New students are inserted into the live graph, growing it as needed;
+    hnswlib does not allow that during a query, so call ``add`` from the same
+    thread that matches.
+    """
+
+    incremental = True
+
+    def __init__(self, ef: int = 64, m: int = 16, ef_construction: int = 200):
+        import hnswlib
+
+        super().__init__()
+        self._hnswlib = hnswlib
+        self.ef = ef
+        self.m = m
+        self.ef_construction = ef_construction
+        # student ids and the graph, labelled by position in the ids
+        self._state = ((), None, None)
+
+    def load(self, student_ids: Sequence[str], encodings: np.ndarray) -> None:
+        matrix = _as_encodings(encodings)
+        if len(student_ids) != len(matrix):
+            raise ValueError("Expected one encoding per student id")
+        index = self._hnswlib.Index(space="l2", dim=ENCODING_SIZE)
+        index.init_index(
+            max_elements=max(len(matrix), 1),
+            ef_construction=self.ef_construction,
+            M=self.m,
+        )
+        if len(matrix):
+            index.add_items(matrix, np.arange(len(matrix)))
+        index.set_ef(self.ef)
+        self._state = (tuple(student_ids), index, None)
+
+    def add(self, student_ids: Sequence[str], encodings: np.ndarray) -> None:
+        known_ids, index, _ = self._state
+        added = _as_encodings(encodings)
+        if len(student_ids) != len(added):
+            raise ValueError("Expected one encoding per student id")
+        if index is None:
+            return self.load(student_ids, added)
+        total = len(known_ids) + len(added)
+        if total > index.get_max_elements():
+            index.resize_index(max(total, 2 * index.get_max_elements()))
+        index.add_items(added, np.arange(len(known_ids), total))
+        self._state = (known_ids + tuple(student_ids), index, None)
+
+    def match_many(
+        self, probes: np.ndarray, k: int = 1, tolerance: float = 0.6
+    ) -> List[List[FaceMatch]]:
+        student_ids, index, _ = self._state
+        probes = _as_encodings(probes)
+        if not student_ids:
+            return [[] for _ in range(len(probes))]
+        labels, distances = index.knn_query(probes, k=min(k, len(student_ids)))
+        # hnswlib reports squared l2 distances
+        distances = np.sqrt(np.maximum(distances, 0.0))
+        return [
+            [
+                FaceMatch(student_ids[label], float(distance))
+                for label, distance in zip(row_labels, row_distances)
+                if distance <= tolerance
+            ]
+            for row_labels, row_distances in zip(labels, distances)
+        ]
+
+    def stats(self) -> dict:
+        return {"kind": "hnsw", "students": len(self), "ef": self.ef, "m": self.m}
+
+
+MATCHER_KINDS = ("exact", "ivf", "hnsw")
+
+
+def make_matcher(
+    kind: str = "exact", n_lists: int = 0, nprobe: int = 8, ef: int = 64
+) -> FaceMatcher:
+    """Matcher of the configured kind; hnsw needs the optional hnswlib"""
+    if kind == "exact":
+        return FaceMatcher()
+    if kind == "ivf":
+        return IVFFaceMatcher(n_lists=n_lists, nprobe=nprobe)
+    if kind == "hnsw":
+        return HNSWFaceMatcher(ef=ef)
+    raise ValueError(f"Unknown face matcher {kind!r}, expected one of {MATCHER_KINDS}")
@@ -0,0 +1,208 @@
+import asyncio
+import re
+import time
+from datetime import date
+from logging import getLogger
+from typing import Callable, List, Optional, Set, Tuple
+
+from src.core.settings import variables
+from src.db.crud import AttendancePartitionDAL
+from src.db.session import async_session
+
+logger = getLogger(__name__)
+
+RETENTION_ACTIONS = ("archive", "drop")
+
+
+def add_months(month: date, months: int) -> date:
+    """First day of the month ``months`` away from ``month``"""
+    years, index = divmod(month.month - 1 + months, 12)
+    return date(month.year + years, index + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{AttendancePartitionDAL.parent}_p{month:%Y%m}"
+
+
+def partition_month(name: str) -> Optional[date]:
+    """Month a partition covers, None for the default or a foreign table"""
+    match = re.fullmatch(rf"{AttendancePartitionDAL.parent}_p(\d{{4}})(\d{{2}})", name)
+    if match is None:
+        return None
+    return date(int(match[1]), int(match[2]), 1)
+
+
+class AttendancePartitionManager:
+    """Keeps monthly general_attendance partitions ahead of the clock.
+
+    Every run creates the partitions of this month and the next
+    ``months_ahead``, and with ``retention_months`` set detaches the ones
+    that ended longer ago, then moves them to ``archive_schema`` or drops
+    them. A month whose check-ins the default partition caught meanwhile
+    gets its partition too, and they are moved into it. A run is one
+    transaction under an advisory lock, so with several workers only one
+    of them does the DDL and the others skip the round.
+    The daily summaries are separate tables and outlive retired partitions.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable = async_session,
+        months_ahead: int = 3,
+        retention_months: int = 0,
+        retention_action: str = "archive",
+        archive_schema: str = "archive",
+        check_interval: float = 3600,
+    ):
+        if retention_action not in RETENTION_ACTIONS:
+            raise ValueError(
+                f"Retention action must be one of {', '.join(RETENTION_ACTIONS)}."
+            )
+        self.session_factory = session_factory
+        self.months_ahead = months_ahead
+        self.retention_months = retention_months
+        self.retention_action = retention_action
+        self.archive_schema = archive_schema
+        self.check_interval = check_interval
+        self.partitions: List[str] = []
+        self.created = 0
+        self.retired = 0
+        self.moved = 0
+        self.skipped = 0
+        self.last_run: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def maintain(self, today: Optional[date] = None) -> None:
+        this_month = (today or date.today()).replace(day=1)
+        cutoff = None
+        if self.retention_months:
+            cutoff = add_months(this_month, -self.retention_months)
+        async with self.session_factory() as session:
+            dal = AttendancePartitionDAL(session)
+            if not await dal.try_lock():
+                self.skipped += 1
+                return
+            partitions = set(await dal.get_partitions())
+            created, moved = await self._create(dal, partitions, this_month, cutoff)
+            retired = 0
+            if cutoff is not None:
+                retired = await self._retire(dal, partitions, cutoff)
+            await session.commit()
+        self.partitions = sorted(partitions)
+        self.created += created
+        self.moved += moved
+        self.retired += retired
+        self.last_run = time.time()
+        if created or retired:
+            logger.info(
+                "Attendance partitions: %d created, %d %s",
+                created,
+                retired,
+                "archived" if self.retention_action == "archive" else "dropped",
+            )
+
+    async def _create(
+        self,
+        dal: AttendancePartitionDAL,
+        partitions: Set[str],
+        this_month: date,
+        cutoff: Optional[date],
+    ) -> Tuple[int, int]:
+        """Create missing partitions, returns how many and the rows moved"""
+        months = {
+            add_months(this_month, offset) for offset in range(self.months_ahead + 1)
+        }
+        has_default = dal.default_partition in partitions
+        if has_default:
+            # check-ins caught while no partition covered them: the manager
+            # was down, a clock was off or old rows were backfilled
+            stranded = await dal.get_default_months()
+            months.update(
+                month for month in stranded if cutoff is None or month >= cutoff
+            )
+            expired = [month for month in stranded if month not in months]
+            if expired:
+                logger.warning(
+                    "%s holds check-ins of %s, past the retention window",
+                    dal.default_partition,
+                    ", ".join(f"{month:%Y-%m}" for month in expired),
+                )
+        created = moved = 0
+        for start in sorted(months):
+            name = partition_name(start)
+            if name in partitions:
+                continue
+            rows = await dal.create_partition(
+                name, start, add_months(start, 1), from_default=has_default
+            )
+            if rows:
+                logger.warning(
+                    "Moving %d check-ins from %s into %s",
+                    rows,
+                    dal.default_partition,
+                    name,
+                )
+            partitions.add(name)
+            created += 1
+            moved += rows
+        return created, moved
+
+    async def _retire(
+        self, dal: AttendancePartitionDAL, partitions: Set[str], cutoff: date
+    ) -> int:
+        retired = 0
+        for name in sorted(partitions):
+            month = partition_month(name)
+            if month is None or month >= cutoff:
+                continue
+            await dal.detach_partition(name)
+            if self.retention_action == "archive":
+                await dal.archive_partition(name, self.archive_schema)
+            else:
+                await dal.drop_partition(name)
+            partitions.discard(name)
+            retired += 1
+        return retired
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._maintain_periodically())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "partitions": self.partitions,
+            "months_ahead": self.months_ahead,
+            "retention_months": self.retention_months,
+            "retention_action": self.retention_action,
+            "created": self.created,
+            "retired": self.retired,
+            "moved_from_default": self.moved,
+            "skipped": self.skipped,
+            "last_run": self.last_run,
+        }
+
+    async def _maintain_periodically(self) -> None:
+        while True:
+            try:
+                await self.maintain()
+            except Exception:
+                logger.exception("Attendance partition maintenance failed")
+            await asyncio.sleep(self.check_interval)
+
+
+attendance_partitions = AttendancePartitionManager(
+    months_ahead=variables.attendance_partition_months_ahead,
+    retention_months=variables.attendance_retention_months,
+    retention_action=variables.attendance_retention_action,
+    archive_schema=variables.attendance_archive_schema,
+    check_interval=variables.attendance_partition_check_interval,
+)
@@ -0,0 +1,153 @@
+import asyncio
+import hashlib
+import os
+import uuid
+from typing import AsyncIterator, Dict, Iterable, NamedTuple, Optional
+
+import numpy as np
+from PIL import Image
+from src.core.settings import variables
+
+PHOTO_TYPES = {"image/jpeg": ".jpg", "image/png": ".png", "image/webp": ".webp"}
+
+
+class PhotoTooLarge(ValueError):
+    """An uploaded photo went over the configured size limit"""
+
+
+class StoredPhoto(NamedTuple):
+    path: str
+    sha256: str
+    size: int
+    deduplicated: bool
+
+
+def variant_path(path: str, variant: str) -> str:
+    """Where the ``variant`` rendition of a stored photo lives"""
+    return f"{os.path.splitext(path)[0]}.{variant}.jpg"
+
+
+def decode_image(source, max_side: Optional[int] = None) -> np.ndarray:
+    """RGB array of an image file or file-like object.
+
+    With ``max_side`` a JPEG is decoded straight at the smallest DCT scale
+    that still covers it, so a large photo never materialises at full size.
+    """
+    with Image.open(source) as image:
+        if max_side:
+            image.draft("RGB", (max_side, max_side))
+            image = image.convert("RGB")
+            image.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+        else:
+            image = image.convert("RGB")
+        return np.asarray(image)
+
+
+def make_variants(path: str, sizes: Dict[str, int]) -> Dict[str, str]:
+    """Write a JPEG per {variant: max side} next to the photo, once.
+
+    The photo is decoded a single time; each variant is shrunk from the
+    previous, larger one. Raises OSError when the file is not an image
+    Pillow can read.
+    """
+    variants = {}
+    try:
+        with Image.open(path) as original:
+            image = original.convert("RGB")
+    except Image.DecompressionBombError as err:
+        raise OSError(str(err)) from err
+    for variant, max_side in sorted(sizes.items(), key=lambda item: -item[1]):
+        image.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+        target = variant_path(path, variant)
+        variants[variant] = target
+        if not os.path.exists(target):
+            image.save(target + ".tmp", "JPEG", quality=90)
+            os.replace(target + ".tmp", target)
+    return variants
+
+
+class PhotoStore:
+    """Content-addressed photo files under ``media_root/directory``.
+
+    Uploads are streamed to a temporary file while their sha256 is computed,
+    then renamed to ``<sha[:2]>/<sha><ext>``; an upload whose content is
+    already stored is discarded and the existing file reused.
+    """
+
+    def __init__(self, media_root: str, directory: str, max_bytes: int):
+        self.media_root = media_root
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.uploads = 0
+        self.deduplicated = 0
+        self.bytes_written = 0
+
+    def absolute(self, path: str) -> str:
+        return os.path.join(self.media_root, path)
+
+    async def save(self, chunks: AsyncIterator[bytes], extension: str) -> StoredPhoto:
+        """Stream ``chunks`` to disk, raising PhotoTooLarge past max_bytes"""
+        root = os.path.join(self.media_root, self.directory)
+        os.makedirs(root, exist_ok=True)
+        temporary = os.path.join(root, f".upload-{uuid.uuid4().hex}")
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with open(temporary, "wb") as upload:
+                async for chunk in chunks:
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        raise PhotoTooLarge(
+                            f"Photos are limited to {self.max_bytes} bytes."
+                        )
+                    digest.update(chunk)
+                    await asyncio.to_thread(upload.write, chunk)
+            sha256 = digest.hexdigest()
+            path = os.path.join(self.directory, sha256[:2], sha256 + extension)
+            target = self.absolute(path)
+            deduplicated = os.path.exists(target)
+            if deduplicated:
+                os.remove(temporary)
+                self.deduplicated += 1
+            else:
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                os.replace(temporary, target)
+                self.bytes_written += size
+        except BaseException:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+        self.uploads += 1
+        return StoredPhoto(path, sha256, size, deduplicated)
+
+    def discard(self, photo: StoredPhoto, variants: Iterable[str] = ()) -> None:
+        """Remove a photo saved by this upload that turned out to be unusable,
+        and whichever of its ``variants`` were rendered"""
+        if photo.deduplicated:
+            return
+        path = self.absolute(photo.path)
+        for path in (path, *(variant_path(path, variant) for variant in variants)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> dict:
+        return {
+            "uploads": self.uploads,
+            "deduplicated": self.deduplicated,
+            "bytes_written": self.bytes_written,
+        }
+
+
+photo_store = PhotoStore(
+    variables.media_root,
+    variables.student_photo_dir,
+    max_bytes=variables.student_photo_max_bytes,
+)
+
+# "encoding" is what the face encoder reads instead of the full-size upload
+PHOTO_VARIANTS = {
+    "encoding": variables.photo_encoding_side,
+    "thumb": variables.photo_thumbnail_side,
+}
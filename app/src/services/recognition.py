@@ -0,0 +1,221 @@
+import asyncio
+import math
+import time
+from functools import partial
+from logging import getLogger
+from typing import Callable, Dict, List, Optional
+
+from src.core.metrics import recognition_faces, recognition_stage_duration
+from src.core.settings import variables
+from src.core.system import BoundedExecutor, MicroBatcher, RateMeter
+from src.db.crud import StudentDAL
+from src.db.session import async_session
+from src.services.encoding_store import EncodingSnapshot, EncodingStore
+from src.services.face_encoding import encode_image_file, encode_probes, load_models
+from src.services.face_matcher import FaceMatch, FaceMatcher, make_matcher
+
+logger = getLogger(__name__)
+
+
+class RecognitionService:
+    """Matches probe photos against the encodings of every enrolled student.
+
+    Student encodings come from the shared EncodingStore: startup maps the
+    last stored version right away, then a background task re-encodes only
+    the students whose photo changed, every ``refresh_interval`` seconds.
+    With an infinite interval the task only warms up the pool and whoever
+    owns the service builds; the runner's master does, once per generation.
+    When a new version only adds students and the matcher is an index that
+    is expensive to rebuild, the new rows are inserted into it instead.
+    Probes are decoded and encoded in a process pool, each on its own worker
+    while any is idle, grouped only once more of them wait than there are
+    workers; the event loop only ever does the vectorized match.
+    """
+
+    def __init__(
+        self,
+        executor: BoundedExecutor,
+        store: EncodingStore,
+        matcher: Optional[FaceMatcher] = None,
+        session_factory: Callable = async_session,
+        media_root: str = "static",
+        tolerance: float = 0.6,
+        batch_size: int = 8,
+        batch_window: float = 0.01,
+        timeout: float = 10,
+        probe_max_side: Optional[int] = None,
+        refresh_interval: float = 300,
+    ):
+        self.executor = executor
+        self.batcher = MicroBatcher(
+            executor,
+            "encode_probes",
+            partial(encode_probes, max_side=probe_max_side),
+            max_batch=batch_size,
+            max_delay=batch_window,
+            timeout=timeout,
+        )
+        self.store = store
+        self.session_factory = session_factory
+        self.media_root = media_root
+        self.tolerance = tolerance
+        self.matcher = matcher if matcher is not None else FaceMatcher()
+        self.refresh_interval = refresh_interval
+        self.ready = False
+        self.store_version: Optional[int] = None
+        self.build_seconds: Optional[float] = None
+        self.faces = 0
+        self._face_rate = RateMeter()
+        self._encode_duration = recognition_stage_duration.labels("encode")
+        self._match_duration = recognition_stage_duration.labels("match")
+        self.full_loads = 0
+        self.incremental_loads = 0
+        self._fingerprints: Optional[Dict[str, str]] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def load_stored(self) -> None:
+        """Map the last stored version without encoding anything"""
+        snapshot = await asyncio.to_thread(self.store.open)
+        if snapshot is not None:
+            await self._load(snapshot)
+
+    async def build(self) -> None:
+        started = time.perf_counter()
+        await self.load_stored()
+        async with self.session_factory() as session:
+            rows = await StudentDAL(session).get_image_rows()
+        snapshot = await asyncio.to_thread(
+            self.store.build, rows, self.media_root, encode_image_file
+        )
+        await self._load(snapshot)
+        self.build_seconds = time.perf_counter() - started
+        logger.info(
+            "Face encodings v%s cover %s of %s students, built in %.1fs",
+            snapshot.version,
+            len(snapshot.student_ids),
+            len(rows),
+            self.build_seconds,
+        )
+
+    def start_building(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._build_periodically())
+
+    async def stop_building(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def identify(self, image: bytes, k: int = 1) -> List[List[FaceMatch]]:
+        """Matches for every face in the image, nearest first.
+
+        Raises asyncio.TimeoutError when encoding takes longer than the
+        configured timeout; a request cancelled before its batch is sent to
+        the pool is dropped from it.
+        """
+        started = time.perf_counter()
+        probes = await self.batcher.submit(image)
+        encoded = time.perf_counter()
+        self.faces += len(probes)
+        self._face_rate.add(len(probes))
+        recognition_faces.inc(len(probes))
+        matches = self.matcher.match_many(probes, k=k, tolerance=self.tolerance)
+        self._encode_duration.observe(encoded - started)
+        self._match_duration.observe(time.perf_counter() - encoded)
+        return matches
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "students": len(self.matcher),
+            "store_version": self.store_version,
+            "build_seconds": self.build_seconds,
+            "tolerance": self.tolerance,
+            "matcher": self.matcher.stats(),
+            "full_loads": self.full_loads,
+            "incremental_loads": self.incremental_loads,
+            "faces": self.faces,
+            # over the last minute
+            "faces_per_second": round(self._face_rate.rate(), 3),
+            "executor": self.executor.stats(),
+            "batcher": self.batcher.stats(),
+        }
+
+    async def _load(self, snapshot: EncodingSnapshot) -> None:
+        if snapshot.version == self.store_version:
+            return
+        added = self._added_rows(snapshot)
+        if added is None:
+            # training an index can take seconds; matches go on meanwhile
+            await asyncio.to_thread(
+                self.matcher.load, snapshot.student_ids, snapshot.encodings
+            )
+            self.full_loads += 1
+        else:
+            if added:
+                self.matcher.add(
+                    [snapshot.student_ids[row] for row in added],
+                    snapshot.encodings[added],
+                )
+            self.incremental_loads += 1
+        self._fingerprints = snapshot.fingerprints
+        self.store_version = snapshot.version
+        self.ready = True
+
+    def _added_rows(self, snapshot: EncodingSnapshot) -> Optional[List[int]]:
+        """Rows new in the snapshot, None when it needs a full load"""
+        known = self._fingerprints
+        if known is None or not self.matcher.incremental:
+            return None
+        if len(snapshot.student_ids) < len(known) or any(
+            snapshot.fingerprints.get(student_id) != fingerprint
+            for student_id, fingerprint in known.items()
+        ):
+            return None
+        return [
+            row
+            for row, student_id in enumerate(snapshot.student_ids)
+            if student_id not in known
+        ]
+
+    async def _build_periodically(self) -> None:
+        try:
+            # spawn the pool now rather than on the first recognition request
+            await self.executor.warm_up(load_models)
+        except Exception:
+            logger.exception("Warming up the recognition pool failed")
+        while math.isfinite(self.refresh_interval):
+            try:
+                await self.build()
+            except Exception:
+                logger.exception("Building face encodings failed")
+            await asyncio.sleep(self.refresh_interval)
+
+
+recognition_service = RecognitionService(
+    BoundedExecutor(
+        "recognition",
+        kind="process",
+        max_workers=variables.recognition_max_workers,
+        queue_size=variables.recognition_queue_size,
+        preload=["face_recognition"],
+    ),
+    EncodingStore(variables.encoding_store_dir),
+    matcher=make_matcher(
+        variables.face_matcher,
+        n_lists=variables.face_matcher_lists,
+        nprobe=variables.face_matcher_nprobe,
+        ef=variables.face_matcher_ef,
+    ),
+    media_root=variables.media_root,
+    tolerance=variables.recognition_tolerance,
+    batch_size=variables.recognition_batch_size,
+    batch_window=variables.recognition_batch_window,
+    timeout=variables.recognition_timeout,
+    probe_max_side=variables.recognition_probe_max_side,
+    refresh_interval=variables.recognition_refresh_interval,
+)
@@ -0,0 +1,428 @@
+import asyncio
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from logging import getLogger
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Union,
+)
+
+import numpy as np
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.core.settings import variables
+from src.core.system import LatencyStats
+from src.db.crud import GroupDAL, StudentDAL
+from src.db.session import async_session
+
+logger = getLogger(__name__)
+
+
+class StudentRecord(NamedTuple):
+    student_id: str
+    fullname: str
+    qr_code: str
+    group_id: Optional[int]
+    change_id: Optional[int]
+
+
+class _IndexRecord(NamedTuple):
+    student_id: str
+    fullname: str
+    qr_code: str
+    group_id: Optional[int]
+
+
+_MISSING = object()
+# stands for a None group id in a packed table
+_NO_GROUP = np.iinfo(np.int64).min
+
+
+class _DictRecords:
+    """Full-load records in two dicts, the fastest to look up"""
+
+    def __init__(self, records: Iterable[_IndexRecord]):
+        self.by_qr_code: Dict[str, _IndexRecord] = {}
+        self.by_student_id: Dict[str, _IndexRecord] = {}
+        for record in records:
+            self.by_qr_code[record.qr_code] = record
+            self.by_student_id[record.student_id] = record
+
+    def __len__(self) -> int:
+        return len(self.by_student_id)
+
+    def __iter__(self) -> Iterator[_IndexRecord]:
+        return iter(self.by_student_id.values())
+
+    def qr_code(self, qr_code: str) -> Optional[_IndexRecord]:
+        return self.by_qr_code.get(qr_code)
+
+    def student_id(self, student_id: str) -> Optional[_IndexRecord]:
+        return self.by_student_id.get(student_id)
+
+    def group_sizes(self) -> Counter:
+        return Counter(record.group_id for record in self)
+
+    def footprint(self) -> int:
+        size = sys.getsizeof(self.by_qr_code) + sys.getsizeof(self.by_student_id)
+        for record in self:
+            size += sys.getsizeof(record) + sum(
+                sys.getsizeof(field) for field in record[:3]
+            )
+        return size
+
+
+class _PackedRecords:
+    """Full-load records packed into a few flat arrays.
+
+    Looking a record up only reads the arrays, where reading a dict entry
+    writes the reference counts of the objects it hands out; workers forked
+    after packing keep sharing these pages with their parent. Each key index
+    is the keys' hashes, sorted, next to the row each belongs to, and the
+    strings of a row are cut out of one UTF-8 blob. A lookup takes
+    several microseconds instead of a fraction of one. str hashes are salted per
+    interpreter, so a table is only valid in the process that packed it and
+    in processes forked from it.
+    """
+
+    def __init__(self, records: Iterable[_IndexRecord]):
+        records = list(records)
+        # text columns cannot hold NUL, so it can separate the fields
+        encoded = ["\0".join(record[:3]).encode() for record in records]
+        self._blob = b"".join(encoded)
+        self._offsets = np.zeros(len(records) + 1, dtype=np.int64)
+        np.cumsum([len(row) for row in encoded], out=self._offsets[1:])
+        self._groups = np.array(
+            [
+                _NO_GROUP if record.group_id is None else record.group_id
+                for record in records
+            ],
+            dtype=np.int64,
+        )
+        self._by_qr_code = self._hash_index([record.qr_code for record in records])
+        self._by_student_id = self._hash_index(
+            [record.student_id for record in records]
+        )
+
+    def __len__(self) -> int:
+        return len(self._groups)
+
+    def __iter__(self) -> Iterator[_IndexRecord]:
+        return map(self._record, range(len(self)))
+
+    def qr_code(self, qr_code: str) -> Optional[_IndexRecord]:
+        return self._find(self._by_qr_code, qr_code, 2)
+
+    def student_id(self, student_id: str) -> Optional[_IndexRecord]:
+        return self._find(self._by_student_id, student_id, 0)
+
+    def group_sizes(self) -> Counter:
+        groups, counts = np.unique(self._groups, return_counts=True)
+        return Counter(
+            {
+                None if group == _NO_GROUP else group: count
+                for group, count in zip(groups.tolist(), counts.tolist())
+            }
+        )
+
+    def footprint(self) -> int:
+        arrays = (self._offsets, self._groups, *self._by_qr_code, *self._by_student_id)
+        return sys.getsizeof(self._blob) + sum(array.nbytes for array in arrays)
+
+    @staticmethod
+    def _hash_index(keys: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        hashes = np.fromiter(map(hash, keys), dtype=np.int64, count=len(keys))
+        rows = np.argsort(hashes, kind="stable").astype(np.int32)
+        return hashes[rows], rows
+
+    def _find(
+        self, index: Tuple[np.ndarray, np.ndarray], key: str, field: int
+    ) -> Optional[_IndexRecord]:
+        hashes, rows = index
+        digest = hash(key)
+        position = int(hashes.searchsorted(digest))
+        # distinct keys may share a hash; compare the keys themselves
+        while position < len(hashes) and hashes[position] == digest:
+            record = self._record(int(rows[position]))
+            if record[field] == key:
+                return record
+            position += 1
+        return None
+
+    def _record(self, row: int) -> _IndexRecord:
+        start, end = self._offsets[row : row + 2].tolist()
+        student_id, fullname, qr_code = self._blob[start:end].decode().split("\0")
+        group_id = int(self._groups[row])
+        return _IndexRecord(
+            student_id, fullname, qr_code, None if group_id == _NO_GROUP else group_id
+        )
+
+
+class _Snapshot:
+    """One immutable generation of the index, replaced as a whole.
+
+    ``base`` holds the last full load and is never modified afterwards; the
+    ``recent_`` maps layer the rows of later refreshes over it, with None
+    marking a QR code that moved to another student.
+    """
+
+    __slots__ = (
+        "base",
+        "recent_by_qr_code",
+        "recent_by_student_id",
+        "change_by_group",
+        "watermark",
+        "_group_sizes",
+    )
+
+    def __init__(
+        self,
+        base: Union[_DictRecords, _PackedRecords],
+        recent_by_qr_code: Dict[str, Optional[_IndexRecord]],
+        recent_by_student_id: Dict[str, _IndexRecord],
+        change_by_group: Dict[int, Optional[int]],
+        watermark: Optional[datetime],
+    ):
+        self.base = base
+        self.recent_by_qr_code = recent_by_qr_code
+        self.recent_by_student_id = recent_by_student_id
+        self.change_by_group = change_by_group
+        self.watermark = watermark
+        self._group_sizes: Optional[Counter] = None
+
+    def __len__(self) -> int:
+        return len(self.base) + sum(
+            self.base.student_id(student_id) is None
+            for student_id in self.recent_by_student_id
+        )
+
+    def qr_code(self, qr_code: str) -> Optional[_IndexRecord]:
+        record = self.recent_by_qr_code.get(qr_code, _MISSING)
+        return self.base.qr_code(qr_code) if record is _MISSING else record
+
+    def student_id(self, student_id: str) -> Optional[_IndexRecord]:
+        record = self.recent_by_student_id.get(student_id)
+        return self.base.student_id(student_id) if record is None else record
+
+    def group_sizes(self) -> Counter:
+        """Students per group id, counted on first use"""
+        if self._group_sizes is None:
+            sizes = self.base.group_sizes()
+            for student_id, record in self.recent_by_student_id.items():
+                previous = self.base.student_id(student_id)
+                if previous is not None:
+                    sizes[previous.group_id] -= 1
+                sizes[record.group_id] += 1
+            self._group_sizes = sizes
+        return self._group_sizes
+
+    def footprint(self) -> int:
+        """Approximate bytes held by the records and the maps over them"""
+        mappings = (
+            self.recent_by_qr_code,
+            self.recent_by_student_id,
+            self.change_by_group,
+        )
+        size = self.base.footprint()
+        size += sum(sys.getsizeof(mapping) for mapping in mappings)
+        for record in self.recent_by_student_id.values():
+            size += sys.getsizeof(record) + sum(
+                sys.getsizeof(field) for field in record[:3]
+            )
+        return size
+
+
+def _later(
+    watermark: Optional[datetime], created_time: Optional[datetime]
+) -> Optional[datetime]:
+    if created_time is not None and (watermark is None or created_time > watermark):
+        return created_time
+    return watermark
+
+
+class StudentIndex:
+    """In-process lookup of students by QR code and by student id.
+
+    Records are plain tuples, not ORM objects. The first load reads every
+    student; later refreshes only read students created since the previous
+    watermark (minus ``refresh_overlap`` seconds, so rows committed late by a
+    long import are still picked up) plus the small group -> change map. Every
+    load builds a new snapshot and swaps it in with a single assignment, so a
+    lookup never sees a half-built index. A refresh only copies the rows
+    added since the last full load; the full load itself is shared with the
+    next snapshot as is. A full reload every ``full_reload_interval`` seconds
+    reconciles edits and deletions. With ``packed`` the full load is kept
+    in flat arrays rather than dicts, slower to look up but shared by the
+    workers a process forks after loading it.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable = async_session,
+        refresh_interval: float = 30,
+        refresh_overlap: float = 600,
+        full_reload_interval: float = 3600,
+        packed: bool = False,
+    ):
+        self.session_factory = session_factory
+        self.packed = packed
+        self.refresh_interval = refresh_interval
+        self.refresh_overlap = timedelta(seconds=refresh_overlap)
+        self.full_reload_interval = full_reload_interval
+        self.lookup_latency = LatencyStats()
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.full_reloads = 0
+        self.last_refresh: Optional[datetime] = None
+        self._snapshot = _Snapshot(_DictRecords(()), {}, {}, {}, None)
+        self._last_full_reload = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._snapshot)
+
+    @property
+    def loaded(self) -> bool:
+        return self.last_refresh is not None
+
+    async def load(self, session: AsyncSession) -> None:
+        """Rebuild the index from every student row"""
+        rows = await StudentDAL(session).get_index_rows()
+        change_by_group = await GroupDAL(session).get_change_ids()
+        records, watermark = [], None
+        for record, created_time in self._records(rows):
+            records.append(record)
+            watermark = _later(watermark, created_time)
+        base = (_PackedRecords if self.packed else _DictRecords)(records)
+        self._swap(_Snapshot(base, {}, {}, change_by_group, watermark))
+        self._last_full_reload = time.monotonic()
+        self.full_reloads += 1
+
+    async def refresh(self, session: AsyncSession) -> None:
+        """Layer students created since the watermark over the last full load"""
+        current = self._snapshot
+        if current.watermark is None:
+            return await self.load(session)
+        rows = await StudentDAL(session).get_index_rows(
+            created_since=current.watermark - self.refresh_overlap
+        )
+        change_by_group = await GroupDAL(session).get_change_ids()
+        recent_by_qr_code = dict(current.recent_by_qr_code)
+        recent_by_student_id = dict(current.recent_by_student_id)
+        watermark = current.watermark
+        for record, created_time in self._records(rows):
+            previous = current.student_id(record.student_id)
+            if previous is not None and previous.qr_code != record.qr_code:
+                recent_by_qr_code[previous.qr_code] = None
+            recent_by_qr_code[record.qr_code] = record
+            recent_by_student_id[record.student_id] = record
+            watermark = _later(watermark, created_time)
+        self._swap(
+            _Snapshot(
+                current.base,
+                recent_by_qr_code,
+                recent_by_student_id,
+                change_by_group,
+                watermark,
+            )
+        )
+        self.refreshes += 1
+
+    def by_qr_code(self, qr_code: str) -> Optional[StudentRecord]:
+        started = time.perf_counter()
+        snapshot = self._snapshot
+        record = self._resolve(snapshot, snapshot.qr_code(qr_code))
+        self.lookup_latency.observe(time.perf_counter() - started)
+        return record
+
+    def by_student_id(self, student_id: str) -> Optional[StudentRecord]:
+        started = time.perf_counter()
+        snapshot = self._snapshot
+        record = self._resolve(snapshot, snapshot.student_id(student_id))
+        self.lookup_latency.observe(time.perf_counter() - started)
+        return record
+
+    def enrolled(self, group_id: Optional[int]) -> int:
+        """Number of students currently in a group"""
+        return self._snapshot.group_sizes()[group_id]
+
+    def start_refreshing(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._refresh_periodically())
+
+    async def stop_refreshing(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "students": len(self),
+            "recent_students": len(self._snapshot.recent_by_student_id),
+            "groups": len(self._snapshot.change_by_group),
+            "footprint_bytes": self._snapshot.footprint(),
+            "watermark": self._snapshot.watermark,
+            "last_refresh": self.last_refresh,
+            "refreshes": self.refreshes,
+            "full_reloads": self.full_reloads,
+            "hits": self.hits,
+            "misses": self.misses,
+            "lookup": self.lookup_latency.as_dict(),
+        }
+
+    def _resolve(
+        self, snapshot: _Snapshot, record: Optional[_IndexRecord]
+    ) -> Optional[StudentRecord]:
+        if record is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return StudentRecord(*record, snapshot.change_by_group.get(record.group_id))
+
+    @staticmethod
+    def _records(rows: Iterable[tuple]) -> Iterable[tuple]:
+        for student_id, fullname, qr_code, group_id, created_time in rows:
+            yield _IndexRecord(student_id, fullname, qr_code, group_id), created_time
+
+    def _swap(self, snapshot: _Snapshot) -> None:
+        self._snapshot = snapshot
+        self.last_refresh = datetime.now()
+
+    async def _refresh_periodically(self) -> None:
+        # the first round is the initial load, so startup does not wait for it
+        while True:
+            full = (
+                not self.loaded
+                or time.monotonic() - self._last_full_reload
+                >= self.full_reload_interval
+            )
+            try:
+                async with self.session_factory() as session:
+                    if full:
+                        await self.load(session)
+                    else:
+                        await self.refresh(session)
+            except Exception:
+                logger.exception("Student index refresh failed")
+            await asyncio.sleep(self.refresh_interval)
+
+
+student_index = StudentIndex(
+    refresh_interval=variables.student_index_refresh_interval,
+    refresh_overlap=variables.student_index_refresh_overlap,
+    full_reload_interval=variables.student_index_full_reload_interval,
+)
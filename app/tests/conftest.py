@@ -0,0 +1,60 @@
+from contextlib import asynccontextmanager
+
+import pytest
+
+
+class FakeSession:
+    """The part of AsyncSession the code under test touches"""
+
+    def __init__(self):
+        self.sync_session = self
+        self.info = {}
+        self.commits = 0
+
+    @asynccontextmanager
+    async def begin_nested(self):
+        yield
+
+    async def commit(self):
+        self.commits += 1
+
+
+class FakeDAL:
+    """In-memory DAL patched in for a DAL class.
+
+    Calling it stands for the constructor and hands out the same instance
+    for every session, so a test reads and sets its state on the fixture.
+    """
+
+    db_session = None
+
+    def __call__(self, db_session) -> "FakeDAL":
+        self.db_session = db_session
+        return self
+
+
+@pytest.fixture
+def session() -> FakeSession:
+    return FakeSession()
+
+
+@pytest.fixture
+def session_factory(session):
+    """Stand-in for async_session that always yields ``session``"""
+
+    @asynccontextmanager
+    async def factory():
+        yield session
+
+    return factory
+
+
+@pytest.fixture
+def stream():
+    """Async iterator over ``data`` in ``size``-byte chunks, like a request body"""
+
+    async def chunks(data: bytes, size: int = 16):
+        for start in range(0, len(data), size):
+            yield data[start : start + size]
+
+    return chunks
@@ -0,0 +1,62 @@
+import asyncio
+import uuid
+
+import httpx
+import pytest
+from src.api.api_v1.login_api import get_current_user_from_token
+from src.db.models import AdminRole, UserSnapshot
+
+ADMIN = UserSnapshot(uuid.uuid4(), "admin", True, (AdminRole.ROLE_ADMIN,))
+CLIENT = UserSnapshot(uuid.uuid4(), "client", True, ("client",))
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    # the app serves ./static, so it is built in a directory that has one
+    (tmp_path / "static").mkdir()
+    monkeypatch.chdir(tmp_path)
+    from src.main import create_app
+
+    return create_app()
+
+
+def _status(app, path: str, user: UserSnapshot = None) -> int:
+    if user is not None:
+        app.dependency_overrides[get_current_user_from_token] = lambda: user
+
+    async def get():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as c:
+            return (await c.get(path)).status_code
+
+    return asyncio.run(get())
+
+
+def test_internal_endpoints_need_a_login(app):
+    assert _status(app, "/internal/hasher") == 401
+
+
+@pytest.mark.parametrize("path", ["/internal/hasher", "/internal/db-replicas"])
+def test_internal_endpoints_are_for_admins(app, path):
+    assert _status(app, path, CLIENT) == 403
+    assert _status(app, path, ADMIN) == 200
+
+
+@pytest.mark.parametrize(
+    "path",
+    [
+        "/student/list",
+        "/group/list",
+        "/faculty/list",
+        "/profession/list",
+        "/change/list",
+    ],
+)
+def test_lists_are_for_admins(app, path):
+    assert _status(app, path, CLIENT) == 403
+
+
+@pytest.mark.parametrize("path", ["/attendance/reports", "/attendance/records"])
+def test_check_ins_are_for_admins(app, path):
+    query = "?date_from=2026-09-01&date_to=2026-09-30"
+    assert _status(app, path + query, CLIENT) == 403
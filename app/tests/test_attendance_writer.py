@@ -0,0 +1,119 @@
+import asyncio
+
+import pytest
+from sqlalchemy.exc import IntegrityError, OperationalError
+from src.services import attendance
+from src.services.attendance import AttendanceWriter
+from src.services.student_index import StudentRecord
+
+from tests.conftest import FakeDAL
+
+
+class FakeError(Exception):
+    def __init__(self, sqlstate: str):
+        super().__init__(sqlstate)
+        self.sqlstate = sqlstate
+
+
+class FakeAttendanceDAL(FakeDAL):
+    """Rejects any batch holding a deleted student, fails the first
+    ``outages`` writes as if the primary were failing over, and loses the
+    acknowledgement of the first ``lost_acks`` writes that did land"""
+
+    def __init__(self):
+        self.deleted = {"s3", "s7"}
+        self.outages = 0
+        self.lost_acks = 0
+        self.stored = {}
+        self.visits = []
+
+    async def insert_attendance(self, records):
+        if self.outages:
+            self.outages -= 1
+            raise OperationalError("INSERT", {}, FakeError("57P01"))
+        if any(record["attended_student_id"] in self.deleted for record in records):
+            raise IntegrityError("INSERT", {}, FakeError("23503"))
+        new = [record for record in records if record["id"] not in self.stored]
+        self.stored.update((record["id"], record) for record in new)
+        return {record["id"] for record in new}
+
+    async def record_daily_attendance(self, visits):
+        self.visits.extend(visits)
+        if self.lost_acks:
+            self.lost_acks -= 1
+            raise OperationalError("COMMIT", {}, FakeError("08006"))
+
+
+@pytest.fixture
+def attendance_dal(monkeypatch) -> FakeAttendanceDAL:
+    dal = FakeAttendanceDAL()
+    monkeypatch.setattr(attendance, "AttendanceDAL", dal)
+    return dal
+
+
+@pytest.fixture
+def writer(attendance_dal, session_factory) -> AttendanceWriter:
+    return AttendanceWriter(
+        session_factory=session_factory,
+        batch_size=100,
+        flush_interval=0.05,
+        write_retries=3,
+        write_backoff=0.001,
+    )
+
+
+def _check_in(writer: AttendanceWriter) -> list:
+    """Check in ten students durably, returns each one's error"""
+
+    async def run():
+        await writer.start()
+        futures = [
+            writer.submit(
+                StudentRecord(f"s{number}", "Student", f"qr{number}", 1, 1),
+                durable=True,
+            )[1]
+            for number in range(10)
+        ]
+        await writer.stop()
+        return [future.exception() for future in futures]
+
+    return asyncio.run(run())
+
+
+def test_rejected_rows_are_dropped_alone(writer, attendance_dal):
+    errors = _check_in(writer)
+    stored = {
+        record["attended_student_id"] for record in attendance_dal.stored.values()
+    }
+    assert stored == {f"s{number}" for number in range(10)} - {"s3", "s7"}
+    assert [number for number, err in enumerate(errors) if err] == [3, 7]
+    assert isinstance(errors[3], IntegrityError)
+    assert (writer.written, writer.failed) == (8, 2)
+
+
+def test_transient_errors_are_retried(writer, attendance_dal):
+    attendance_dal.deleted = set()
+    attendance_dal.outages = 2
+    errors = _check_in(writer)
+    assert not any(errors)
+    assert len(attendance_dal.stored) == 10
+    assert (writer.written, writer.failed, writer.retried) == (10, 0, 2)
+
+
+def test_outage_outlasting_the_retries_fails_the_batch(writer, attendance_dal):
+    attendance_dal.outages = 10
+    errors = _check_in(writer)
+    assert all(isinstance(err, OperationalError) for err in errors)
+    assert attendance_dal.stored == {}
+    assert (writer.written, writer.failed, writer.retried) == (0, 10, 3)
+
+
+def test_replayed_batch_is_not_a_failure(writer, attendance_dal):
+    attendance_dal.deleted = set()
+    attendance_dal.lost_acks = 1
+    errors = _check_in(writer)
+    assert not any(errors)
+    assert len(attendance_dal.stored) == 10
+    # the retry stored nothing twice and counted nobody twice
+    assert len(attendance_dal.visits) == 10
+    assert (writer.written, writer.failed, writer.replayed) == (10, 0, 10)
@@ -0,0 +1,99 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from src.core.system import BoundedExecutor, MicroBatcher, ServiceOverloadedError
+
+
+class _Calls(list):
+    """Batch sizes in call order, and how many calls ran at once at most"""
+
+    def __init__(self):
+        super().__init__()
+        self.lock = threading.Lock()
+        self.running = 0
+        self.peak = 0
+
+
+def _batcher(calls: _Calls, workers: int = 4, queue_size: int = 64) -> MicroBatcher:
+    def encode(items):
+        with calls.lock:
+            calls.append(len(items))
+            calls.running += 1
+            calls.peak = max(calls.peak, calls.running)
+        time.sleep(0.05 * len(items))
+        with calls.lock:
+            calls.running -= 1
+        return [item * 2 for item in items]
+
+    executor = BoundedExecutor("test", max_workers=workers, queue_size=queue_size)
+    return MicroBatcher(executor, "encode", encode, max_batch=8, max_delay=0.01)
+
+
+def _submit(batcher: MicroBatcher, items: int):
+    async def run():
+        return await asyncio.gather(*(batcher.submit(item) for item in range(items)))
+
+    try:
+        return asyncio.run(run())
+    finally:
+        batcher.executor.shutdown()
+
+
+def test_items_spread_over_idle_workers():
+    calls = _Calls()
+    results = _submit(_batcher(calls), 4)
+    assert results == [0, 2, 4, 6]
+    assert calls == [1, 1, 1, 1]
+    # in parallel, not one after the other on a single worker
+    assert calls.peak == 4
+
+
+def test_items_group_only_beyond_the_workers():
+    calls = _Calls()
+    results = _submit(_batcher(calls, workers=2), 10)
+    assert results == [item * 2 for item in range(10)]
+    assert calls[:2] == [1, 1]
+    assert sum(calls) == 10 and len(calls) < 10
+    assert calls.peak == 2
+
+
+def test_waiting_items_count_against_capacity():
+    calls = _Calls()
+    batcher = _batcher(calls, workers=1, queue_size=2)
+
+    async def run():
+        return await asyncio.gather(
+            *(batcher.submit(item) for item in range(4)), return_exceptions=True
+        )
+
+    results = asyncio.run(run())
+    batcher.executor.shutdown()
+    assert results[:3] == [0, 2, 4]
+    assert isinstance(results[3], ServiceOverloadedError)
+    assert batcher.rejected == 1
+
+
+def test_cancelled_items_are_left_out():
+    calls = _Calls()
+    batcher = _batcher(calls, workers=1)
+
+    async def run():
+        first = asyncio.ensure_future(batcher.submit(1))
+        second = asyncio.ensure_future(batcher.submit(2))
+        await asyncio.sleep(0)
+        second.cancel()
+        return await first
+
+    assert asyncio.run(run()) == 2
+    batcher.executor.shutdown()
+    assert calls == [1]
+    assert batcher.cancelled == 1
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_every_item_gets_its_result(workers):
+    calls = _Calls()
+    results = _submit(_batcher(calls, workers=workers), 7)
+    assert results == [item * 2 for item in range(7)]
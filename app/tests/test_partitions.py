@@ -0,0 +1,79 @@
+import asyncio
+from datetime import date
+
+import pytest
+from src.services import partitions
+from src.services.partitions import AttendancePartitionManager
+
+from tests.conftest import FakeDAL
+
+
+class FakePartitionDAL(FakeDAL):
+    parent = "general_attendance"
+    default_partition = "general_attendance_default"
+
+    def __init__(self):
+        self.tables = {"general_attendance_default", "general_attendance_p202610"}
+        # month -> rows the default partition caught
+        self.default_rows = {}
+
+    async def try_lock(self):
+        return True
+
+    async def get_partitions(self):
+        return sorted(self.tables)
+
+    async def get_default_months(self):
+        return sorted(self.default_rows)
+
+    async def create_partition(self, name, start, end, from_default=True):
+        self.tables.add(name)
+        return self.default_rows.pop(start, 0) if from_default else 0
+
+    async def detach_partition(self, name):
+        self.tables.discard(name)
+
+    async def drop_partition(self, name):
+        pass
+
+
+@pytest.fixture
+def partition_dal(monkeypatch) -> FakePartitionDAL:
+    dal = FakePartitionDAL()
+    monkeypatch.setattr(partitions, "AttendancePartitionDAL", dal)
+    return dal
+
+
+def _maintain(session_factory, retention_months: int = 0):
+    manager = AttendancePartitionManager(
+        session_factory=session_factory,
+        months_ahead=1,
+        retention_months=retention_months,
+        retention_action="drop",
+    )
+    asyncio.run(manager.maintain(date(2026, 10, 18)))
+    return manager
+
+
+def test_rows_caught_by_the_default_partition_get_their_month(
+    partition_dal, session_factory
+):
+    partition_dal.default_rows = {date(2026, 11, 1): 3, date(2025, 2, 1): 5}
+    manager = _maintain(session_factory)
+    assert manager.partitions == [
+        "general_attendance_default",
+        "general_attendance_p202502",
+        "general_attendance_p202610",
+        "general_attendance_p202611",
+    ]
+    assert (manager.created, manager.moved) == (2, 8)
+    assert partition_dal.default_rows == {}
+
+
+def test_expired_rows_stay_in_the_default_partition(partition_dal, session_factory):
+    partition_dal.default_rows = {date(2025, 2, 1): 5, date(2026, 9, 1): 2}
+    manager = _maintain(session_factory, retention_months=6)
+    assert "general_attendance_p202502" not in manager.partitions
+    assert "general_attendance_p202609" in manager.partitions
+    assert manager.moved == 2
+    assert partition_dal.default_rows == {date(2025, 2, 1): 5}
@@ -0,0 +1,46 @@
+import asyncio
+import math
+
+from src.core.system import BoundedExecutor
+from src.services.encoding_store import EncodingStore
+from src.services.recognition import RecognitionService
+
+
+def _service(tmp_path, refresh_interval: float, builds: list) -> RecognitionService:
+    service = RecognitionService(
+        BoundedExecutor("test", max_workers=2, queue_size=4),
+        EncodingStore(str(tmp_path)),
+        refresh_interval=refresh_interval,
+    )
+
+    async def build():
+        builds.append(1)
+
+    service.build = build
+    return service
+
+
+def _run_briefly(service: RecognitionService) -> None:
+    async def run():
+        service.start_building()
+        await asyncio.sleep(0.05)
+        await service.stop_building()
+
+    try:
+        asyncio.run(run())
+    finally:
+        service.executor.shutdown()
+
+
+def test_builds_periodically(tmp_path):
+    builds = []
+    _run_briefly(_service(tmp_path, 0.01, builds))
+    assert len(builds) > 1
+
+
+def test_runner_workers_only_warm_up(tmp_path):
+    builds = []
+    service = _service(tmp_path, math.inf, builds)
+    _run_briefly(service)
+    assert builds == []
+    assert "warm_up" in service.executor.stats()["operations"]
@@ -0,0 +1,156 @@
+import asyncio
+import time
+
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from src.core.shared_cache import (
+    GENERATION_MARGIN,
+    InMemoryRedis,
+    InvalidationBus,
+    SharedCache,
+)
+
+
+def _cache(redis) -> SharedCache:
+    """One worker's cache; caches sharing ``redis`` are separate workers"""
+    bus = InvalidationBus(redis, channel="test:invalidate", prefix="test")
+    return SharedCache("user", bus, max_entries=100, ttl=60, local_ttl=60)
+
+
+class _Loader:
+    def __init__(self, *values, delay: float = 0):
+        self.values = list(values)
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return self.values.pop(0)
+
+
+class _BrokenRedis(InMemoryRedis):
+    async def mget(self, *keys):
+        raise ConnectionError("redis is down")
+
+    async def set(self, key, value, px=None):
+        raise ConnectionError("redis is down")
+
+
+def test_concurrent_misses_share_one_load():
+    async def run():
+        cache = _cache(InMemoryRedis())
+        loader = _Loader("alice", delay=0.01)
+        values = await asyncio.gather(
+            *(cache.get_or_load("alice", loader) for _ in range(5))
+        )
+        return cache, loader, values
+
+    cache, loader, values = asyncio.run(run())
+    assert values == ["alice"] * 5
+    assert loader.calls == 1
+    assert cache.coalesced == 4
+
+
+def test_invalidation_reaches_other_workers():
+    async def run():
+        redis = InMemoryRedis()
+        first, second = _cache(redis), _cache(redis)
+        second.bus.start()
+        await asyncio.sleep(0.01)
+        loader = _Loader("active", "revoked")
+        assert await first.get_or_load("alice", loader) == "active"
+        # the second worker is served from Redis, then from its own tier
+        assert await second.get_or_load("alice", loader) == "active"
+        assert second.shared_hits == 1
+        await first.invalidate("alice")
+        await asyncio.sleep(0.01)
+        value = await second.get_or_load("alice", loader)
+        await second.bus.stop()
+        return second, loader, value
+
+    second, loader, value = asyncio.run(run())
+    assert value == "revoked"
+    assert loader.calls == 2
+    assert second.bus.received == 1
+
+
+def test_load_overtaken_by_invalidation_is_not_served():
+    async def run():
+        redis = InMemoryRedis()
+        first, second = _cache(redis), _cache(redis)
+        # read before the commit, lands after the invalidation
+        slow = asyncio.ensure_future(
+            first.get_or_load("alice", _Loader("active", delay=0.02))
+        )
+        await asyncio.sleep(0.01)
+        await second.invalidate("alice")
+        stale = await slow
+        fresh = await second.get_or_load("alice", _Loader("revoked"))
+        return stale, fresh, second
+
+    stale, fresh, second = asyncio.run(run())
+    assert stale == "active"
+    assert fresh == "revoked"
+    assert second.shared_hits == 0
+
+
+def test_invalidate_on_commit_waits_for_the_commit():
+    async def run():
+        cache = _cache(InMemoryRedis())
+        await cache.get_or_load("alice", _Loader("active"))
+        session = AsyncSession(create_async_engine("postgresql+asyncpg://test/test"))
+        cache.invalidate_on_commit(session, "alice")
+        await asyncio.sleep(0)
+        kept = cache.local.get("alice")
+        await session.commit()
+        await asyncio.gather(*cache._evictions)
+        value = await cache.get_or_load("alice", _Loader("revoked"))
+        await session.close()
+        return kept, value
+
+    kept, value = asyncio.run(run())
+    assert kept == "active"
+    assert value == "revoked"
+
+
+def test_falls_back_to_the_loader_when_redis_fails():
+    async def run():
+        cache = _cache(_BrokenRedis())
+        loader = _Loader("active", "revoked")
+        first = await cache.get_or_load("alice", loader)
+        again = await cache.get_or_load("alice", loader)
+        await cache.invalidate("alice")
+        after = await cache.get_or_load("alice", loader)
+        return cache, loader, (first, again, after)
+
+    cache, loader, values = asyncio.run(run())
+    assert values == ("active", "active", "revoked")
+    assert loader.calls == 2
+    assert cache.shared_errors == 3
+
+
+def test_without_redis_only_the_local_tier_is_used():
+    async def run():
+        first, second = _cache(None), _cache(None)
+        second.local.ttl = 0.01
+        loader = _Loader("active", "active", "revoked")
+        await first.get_or_load("alice", loader)
+        await second.get_or_load("alice", loader)
+        await first.invalidate("alice")
+        await asyncio.sleep(0.02)
+        # nothing shared to find a stale copy in once the local entry expires
+        return second, await second.get_or_load("alice", loader)
+
+    second, value = asyncio.run(run())
+    assert value == "revoked"
+    assert second.shared_misses == second.shared_errors == 0
+
+
+def test_generations_expire_after_their_entries():
+    async def run():
+        redis = InMemoryRedis()
+        cache = _cache(redis)
+        await cache.invalidate("alice")
+        return redis._data[cache._generation_key("alice")][0] - time.monotonic()
+
+    assert 60 < asyncio.run(run()) <= 60 + GENERATION_MARGIN
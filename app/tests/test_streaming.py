@@ -0,0 +1,61 @@
+import asyncio
+
+from src.core.streaming import RowError, aiter_csv_rows, aiter_ndjson_rows
+
+
+def _rows(rows) -> list:
+    async def collect():
+        return [row async for row in rows]
+
+    return asyncio.run(collect())
+
+
+def test_quoted_fields_span_lines(stream):
+    body = b'a,b\n1,"x\ny"\n,3\n'
+    assert _rows(aiter_csv_rows(stream(body))) == [
+        (2, {"a": "1", "b": "x\ny"}),
+        (4, {"b": "3"}),
+    ]
+
+
+def test_unterminated_quote_is_capped(stream):
+    body = b'a,b\n1,2\n3,"open\n' + b"4,5\n" * 100 + b"6,7\n"
+    rows = _rows(aiter_csv_rows(stream(body), 64))
+    assert rows[0] == (2, {"a": "1", "b": "2"})
+    line, error = rows[1]
+    assert line == 3 and isinstance(error, RowError)
+    assert "Unterminated" in str(error)
+    # reading resumed after the dropped record
+    assert rows[-1] == (104, {"a": "6", "b": "7"})
+    assert len(rows) < 100
+
+
+def test_overlong_line_is_skipped(stream):
+    body = b"a,b\n" + b"x" * 1000 + b",1\n2,3\n"
+    first, second = _rows(aiter_csv_rows(stream(body), 64))
+    assert first[0] == 2 and isinstance(first[1], RowError)
+    assert second == (3, {"a": "2", "b": "3"})
+
+
+def test_overlong_ndjson_line_is_skipped(stream):
+    body = b'{"a": "' + b"x" * 1000 + b'"}\n{"a": 1}\n'
+    first, second = _rows(aiter_ndjson_rows(stream(body), 64))
+    assert first[0] == 1 and isinstance(first[1], RowError)
+    assert second == (2, {"a": 1})
+
+
+def test_quote_inside_an_unquoted_field_is_literal(stream):
+    body = b'a,b\n1,O"Brien\n2,x\n3,y\n'
+    assert _rows(aiter_csv_rows(stream(body))) == [
+        (2, {"a": "1", "b": 'O"Brien'}),
+        (3, {"a": "2", "b": "x"}),
+        (4, {"a": "3", "b": "y"}),
+    ]
+
+
+def test_unterminated_quote_at_the_end(stream):
+    body = b'a,b\n1,2\n3,"open\n4,5\n'
+    rows = _rows(aiter_csv_rows(stream(body)))
+    assert rows[0] == (2, {"a": "1", "b": "2"})
+    assert rows[1][0] == 3 and "Unterminated" in str(rows[1][1])
+    assert len(rows) == 2
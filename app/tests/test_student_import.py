@@ -0,0 +1,94 @@
+import asyncio
+
+import pytest
+from asyncpg.exceptions import CheckViolationError
+from src.api.api_v1 import students_api
+from src.core.streaming import aiter_csv_rows
+
+from tests.conftest import FakeDAL
+
+
+class FakeStudentDAL(FakeDAL):
+    """Keeps students in memory and behaves like copy_students on Postgres:
+    taken keys are skipped, a course above 6 fails the whole call"""
+
+    def __init__(self):
+        self.students = {}
+        self.calls = 0
+
+    async def get_reference_ids(self):
+        return {1, 2}, {1}
+
+    async def copy_students(self, records):
+        self.calls += 1
+        if any(record[5] > 6 for record in records):
+            raise CheckViolationError('new row violates check constraint "course"')
+        taken = {key for student in self.students.values() for key in student}
+        inserted = set()
+        for record in records:
+            keys = {("student_id", record[2]), ("qr_code", record[6])}
+            if keys & taken:
+                continue
+            taken |= keys
+            self.students[record[0]] = keys
+            inserted.add(record[0])
+        return inserted
+
+
+@pytest.fixture
+def student_dal(monkeypatch) -> FakeStudentDAL:
+    async def refresh(session):
+        pass
+
+    dal = FakeStudentDAL()
+    monkeypatch.setattr(students_api, "StudentDAL", dal)
+    monkeypatch.setattr(students_api.student_index, "refresh", refresh)
+    return dal
+
+
+@pytest.fixture
+def import_body(student_dal, session, stream, monkeypatch):
+    """Import a CSV body in chunks of ``chunk_size`` rows, returns the report"""
+
+    def run(data: bytes, chunk_size: int = 4):
+        monkeypatch.setattr(
+            students_api.variables, "student_copy_chunk_size", chunk_size
+        )
+        report = asyncio.run(
+            students_api._bulk_create_students(aiter_csv_rows(stream(data)), session)
+        )
+        assert session.commits
+        return report
+
+    return run
+
+
+HEADER = b"fullname,student_id,gender,student_image,course,qr_code,group\n"
+
+
+def _row(number: int, course: int = 1, qr_code: str = "") -> bytes:
+    qr_code = qr_code or f"qr{number}"
+    return f"Student {number},s{number},male,s.jpg,{course},{qr_code},1\n".encode()
+
+
+def test_duplicate_keys_are_reported_per_row(import_body):
+    body = HEADER + b"".join(
+        [_row(1), _row(2), _row(1), _row(3, qr_code="qr2"), _row(4), _row(5)]
+    )
+    report = import_body(body)
+    assert report.inserted == 4
+    assert report.failed == 2
+    assert [error.line for error in report.errors] == [4, 5]
+    assert all("already exists" in error.error for error in report.errors)
+
+
+def test_rejected_row_does_not_discard_its_chunk(import_body, student_dal):
+    body = HEADER + b"".join(_row(number) for number in range(1, 10))
+    body += _row(10, course=7) + b"".join(_row(number) for number in range(11, 17))
+    report = import_body(body, chunk_size=8)
+    assert report.inserted == 15
+    assert report.failed == 1
+    assert report.errors[0].line == 11
+    assert "check constraint" in report.errors[0].error
+    # the chunk holding the bad row is halved until the row stands alone
+    assert student_dal.calls == 2 + 2 * 3
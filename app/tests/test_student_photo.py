@@ -0,0 +1,110 @@
+import asyncio
+import io
+import os
+import uuid
+
+import pytest
+from fastapi import HTTPException
+from PIL import Image
+from src.api.api_v1 import students_api
+from src.core.system import ServiceOverloadedError
+from src.db.models import AdminRole, UserSnapshot
+from src.services.photos import PhotoStore
+
+from tests.conftest import FakeDAL, FakeSession
+
+ADMIN = UserSnapshot(uuid.uuid4(), "admin", True, (AdminRole.ROLE_ADMIN,))
+
+
+def _jpeg() -> bytes:
+    data = io.BytesIO()
+    Image.new("RGB", (64, 64), "white").save(data, "JPEG")
+    return data.getvalue()
+
+
+class FakeRequest:
+    def __init__(self, body: bytes):
+        self.headers = {"content-type": "image/jpeg"}
+        self.body = body
+        self.read = False
+
+    async def stream(self):
+        self.read = True
+        yield self.body
+
+
+class FakeStudentDAL(FakeDAL):
+    def __init__(self):
+        self.students = {"s1"}
+
+    async def student_exists(self, student_id):
+        return student_id in self.students
+
+    async def set_student_image(self, student_id, student_image):
+        return student_id in self.students
+
+
+class OverloadedExecutor:
+    async def run(self, label, func, *args):
+        raise ServiceOverloadedError("recognition", 1)
+
+
+class InlineExecutor:
+    async def run(self, label, func, *args):
+        return func(*args)
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = PhotoStore(str(tmp_path), "students", max_bytes=1 << 20)
+    monkeypatch.setattr(students_api, "photo_store", store)
+    monkeypatch.setattr(students_api, "StudentDAL", FakeStudentDAL())
+    return store
+
+
+def _files(store: PhotoStore) -> list:
+    return [
+        name
+        for _, _, names in os.walk(os.path.join(store.media_root, store.directory))
+        for name in names
+    ]
+
+
+def _upload(student_id: str, request: FakeRequest, db: FakeSession):
+    return asyncio.run(
+        students_api.upload_student_photo(student_id, request, db, ADMIN)
+    )
+
+
+def test_unknown_student_is_rejected_before_the_body_is_read(store, session):
+    request = FakeRequest(_jpeg())
+    with pytest.raises(HTTPException) as raised:
+        _upload("missing", request, session)
+    assert raised.value.status_code == 404
+    assert not request.read
+    assert _files(store) == []
+
+
+def test_overloaded_pool_leaves_no_files(store, session, monkeypatch):
+    monkeypatch.setattr(
+        students_api.recognition_service, "executor", OverloadedExecutor()
+    )
+    with pytest.raises(ServiceOverloadedError):
+        _upload("s1", FakeRequest(_jpeg()), session)
+    assert _files(store) == []
+
+
+def test_unreadable_image_leaves_no_files(store, session, monkeypatch):
+    monkeypatch.setattr(students_api.recognition_service, "executor", InlineExecutor())
+    with pytest.raises(HTTPException) as raised:
+        _upload("s1", FakeRequest(b"not an image"), session)
+    assert raised.value.status_code == 415
+    assert _files(store) == []
+
+
+def test_photo_and_variants_are_stored(store, session, monkeypatch):
+    monkeypatch.setattr(students_api.recognition_service, "executor", InlineExecutor())
+    response = _upload("s1", FakeRequest(_jpeg()), session)
+    assert session.info["pinned"] and session.commits == 2
+    assert sorted(response.variants) == ["encoding", "thumb"]
+    assert len(_files(store)) == 3